@@ -18,10 +18,10 @@ import json
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
-import pytz
+from utils.market_calendar import IST
 from utils.llm_client import openrouter_client
 from store_option_data_mysql import MySQLOptionDataStore
-from oi_analysis_engine import OIAnalysisEngine
+from oi_analysis_engine import OIAnalysisEngine, HISTORY_COLUMNS
 import os
 
 class AITradeEngine:
@@ -33,7 +33,7 @@ class AITradeEngine:
             datastore: MySQL data store instance
         """
         self.datastore = datastore or MySQLOptionDataStore()
-        self.ist_tz = pytz.timezone('Asia/Kolkata')
+        self.ist_tz = IST
         self.analysis_engine = OIAnalysisEngine(self.datastore)
         
         # Setup logging
@@ -112,7 +112,10 @@ class AITradeEngine:
         """Aggregate market data from existing tables"""
         try:
             # Get historical data for analysis
-            history_df = self.analysis_engine.get_historical_data(bucket_ts, index_name, hours_back=1)
+            history_df = self.analysis_engine.get_historical_data(
+                bucket_ts, index_name, hours_back=1,
+                columns=HISTORY_COLUMNS + ['ce_ltp', 'pe_ltp', 'ce_volume', 'pe_volume']
+            )
             if history_df.empty:
                 return None
             
@@ -25,6 +25,13 @@ except ImportError:
     SmartConnect = None
     SMARTAPI_AVAILABLE = False
 
+# Keep-alive connection pool for SmartConnect's requests session, sized for
+# concurrent per-index fetches (SmartAPI allows bursts of 10 requests/second)
+HTTP_POOL = {
+    "pool_connections": 10,
+    "pool_maxsize": 20
+}
+
 class AngelOneLogin:
     def __init__(self):
         self.api_key = None
@@ -34,6 +41,7 @@ class AngelOneLogin:
         self.smart_api = None
         self.is_logged_in = False
         self.session_secret = None
+        self.refresh_token = None
     
     def load_credentials(self):
         self.api_key = os.getenv('ANGEL_API_KEY')
@@ -81,7 +89,9 @@ class AngelOneLogin:
             self.load_credentials()
             if not all([self.api_key, self.client_id, self.pwd, self.totp_key]):
                 raise ValueError("Missing credentials. Please check your configuration.")
-            self.smart_api = SmartConnect(api_key=self.api_key)
+            # pool= gives SmartConnect a shared requests.Session, so calls reuse
+            # open TLS connections instead of handshaking per request
+            self.smart_api = SmartConnect(api_key=self.api_key, pool=HTTP_POOL)
             totp = self.generate_totp()
             data = self.smart_api.generateSession(self.client_id, self.pwd, totp)
             # If data is bytes, decode and load as JSON
@@ -96,6 +106,8 @@ class AngelOneLogin:
                 if 'data' in data and 'sessionId' in data['data']:
                     self.session_secret = data['data']['sessionId']
                     print(f"🔑 Session ID: {self.session_secret}")
+                if 'data' in data:
+                    self.refresh_token = data['data'].get('refreshToken')
                 return True
             else:
                 print(f"❌ Login failed: {data.get('message', 'Unknown error') if isinstance(data, dict) else data}")
@@ -104,6 +116,32 @@ class AngelOneLogin:
             print(f"❌ Login error: {str(e)}")
             return False
     
+    def refresh_session(self):
+        """
+        Rotate the session token without a full TOTP login when possible
+        
+        Uses the refresh token from the last login; falls back to login()
+        if no refresh token is available or the refresh call fails.
+        
+        Returns:
+            bool: True if a valid session is available afterwards
+        """
+        if self.smart_api and self.refresh_token:
+            try:
+                data = self.smart_api.generateToken(self.refresh_token)
+                if isinstance(data, dict) and data.get('status'):
+                    self.is_logged_in = True
+                    if data.get('data'):
+                        self.refresh_token = data['data'].get('refreshToken', self.refresh_token)
+                    print(f"🔑 Session refreshed at {datetime.now()}")
+                    return True
+                print(f"⚠️  Session refresh failed: {data.get('message', 'Unknown error') if isinstance(data, dict) else data}")
+            except Exception as e:
+                print(f"⚠️  Session refresh error: {str(e)}")
+        
+        print("🔐 Re-logging in to Angel One...")
+        return self.login()
+    
     def logout(self):
         if self.smart_api and self.is_logged_in:
             try:
@@ -19,7 +19,7 @@ import json
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
-import pytz
+from utils.market_calendar import IST
 from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -46,7 +46,7 @@ class DashboardAPI:
         )
         
         # Initialize components
-        self.ist_tz = pytz.timezone('Asia/Kolkata')
+        self.ist_tz = IST
         self.datastore = MySQLOptionDataStore()
         self.analysis_engine = OIAnalysisEngine(self.datastore)
         self.ai_engine = AITradeEngine(self.datastore)
@@ -121,13 +121,13 @@ class DashboardAPI:
                     start_time_dt = datetime.now(self.ist_tz) - timedelta(hours=1)
                 else:
                     start_time_dt = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
-                    start_time_dt = self.ist_tz.localize(start_time_dt)
+                    start_time_dt = start_time_dt.replace(tzinfo=self.ist_tz)
                 
                 if not end_time:
                     end_time_dt = datetime.now(self.ist_tz)
                 else:
                     end_time_dt = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
-                    end_time_dt = self.ist_tz.localize(end_time_dt)
+                    end_time_dt = end_time_dt.replace(tzinfo=self.ist_tz)
                 
                 # Get pattern insights
                 insights = await self._get_pattern_insights(
@@ -157,13 +157,13 @@ class DashboardAPI:
                     start_time_dt = datetime.now(self.ist_tz) - timedelta(hours=24)
                 else:
                     start_time_dt = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
-                    start_time_dt = self.ist_tz.localize(start_time_dt)
+                    start_time_dt = start_time_dt.replace(tzinfo=self.ist_tz)
                 
                 if not end_time:
                     end_time_dt = datetime.now(self.ist_tz)
                 else:
                     end_time_dt = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
-                    end_time_dt = self.ist_tz.localize(end_time_dt)
+                    end_time_dt = end_time_dt.replace(tzinfo=self.ist_tz)
                 
                 # Get trade setups
                 setups = await self._get_trade_setups(
@@ -188,9 +188,9 @@ class DashboardAPI:
             try:
                 # Parse time parameters
                 start_time_dt = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S")
-                start_time_dt = self.ist_tz.localize(start_time_dt)
+                start_time_dt = start_time_dt.replace(tzinfo=self.ist_tz)
                 end_time_dt = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
-                end_time_dt = self.ist_tz.localize(end_time_dt)
+                end_time_dt = end_time_dt.replace(tzinfo=self.ist_tz)
                 
                 # Get playback data
                 playback_data = await self._get_playback_data(
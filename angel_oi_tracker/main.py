@@ -13,17 +13,30 @@ API Compliance:
 import os
 import sys
 import time
+import asyncio
+import logging
 from datetime import datetime, timedelta
-import pytz
 from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.triggers.cron import CronTrigger
 from angel_login import angel_login
 from option_chain_fetcher import fetch_option_chain_data, OptionChainFetcher, AdaptivePollingEngine
-from store_option_data_mysql import store_option_chain_data, MySQLOptionDataStore
+from store_option_data_mysql import store_option_chain_data, MySQLOptionDataStore, Snapshot, snapshot_symbol
 from utils.expiry_manager import get_current_expiry, get_all_expiries
-from utils.market_calendar import MarketCalendar
+from utils.market_calendar import MarketCalendar, IST
 from oi_analysis_engine import OIAnalysisEngine
 from ai_trade_engine import AITradeEngine
+from utils.async_logging import setup_queue_logging
+
+logger = logging.getLogger(__name__)
+
+# Market hours as minutes since midnight IST (9:18 AM to 3:30 PM)
+MARKET_OPEN_MINUTE = 9 * 60 + 18
+MARKET_CLOSE_MINUTE = 15 * 60 + 30
+
+# Startup backfill dispatch: timestamps fetched concurrently per batch, and
+# the pause between batches (seconds) to respect SmartAPI rate limits
+BACKFILL_BATCH_SIZE = 5
+BACKFILL_BATCH_PAUSE = 2
 
 # --- Begin BackfillSystem class (moved from backup_old_files/backfill_system.py) ---
 import time
@@ -31,7 +44,7 @@ from store_option_data_mysql import MySQLOptionDataStore
 
 class BackfillSystem:
     def __init__(self):
-        self.ist_tz = pytz.timezone('Asia/Kolkata')
+        self.ist_tz = IST
         self.store = MySQLOptionDataStore()
     def is_market_open(self):
         now = datetime.now(self.ist_tz)
@@ -144,32 +157,21 @@ class BackfillSystem:
                                     'ltp': option.get('ltp', 0)
                                 }
                             for strike, strike_data in strikes_data.items():
-                                trading_symbol = f"{index_name}{strike}"
+                                trading_symbol = snapshot_symbol(index_name, strike)
                                 if self.check_existing_data(timestamp, trading_symbol):
                                     continue
-                                snapshot_data = {
-                                    'bucket_ts': timestamp,
-                                    'trading_symbol': trading_symbol,
-                                    'option_type': 'XX',
-                                    'strike': strike,
-                                    'ce_oi': strike_data.get('CE', {}).get('oi', 0),
-                                    'ce_price_close': index_ltp,
-                                    'pe_oi': strike_data.get('PE', {}).get('oi', 0),
-                                    'pe_price_close': index_ltp
-                                }
-                                ce_snapshot = snapshot_data.copy()
-                                ce_snapshot['option_type'] = 'CE'
-                                if self.store.insert_single_snapshot(ce_snapshot):
+                                ce_oi = strike_data.get('CE', {}).get('oi', 0)
+                                pe_oi = strike_data.get('PE', {}).get('oi', 0)
+                                if self.store.insert_single_snapshot(Snapshot(timestamp, trading_symbol, 'CE', strike, ce_oi, index_ltp, pe_oi, index_ltp)):
                                     success_count += 1
-                                pe_snapshot = snapshot_data.copy()
-                                pe_snapshot['option_type'] = 'PE'
-                                if self.store.insert_single_snapshot(pe_snapshot):
+                                if self.store.insert_single_snapshot(Snapshot(timestamp, trading_symbol, 'PE', strike, ce_oi, index_ltp, pe_oi, index_ltp)):
                                     success_count += 1
                                 total_processed += 2
                     time.sleep(1)
                 except Exception as e:
                     print(f"❌ Error processing {timestamp}: {str(e)}")
                     continue
+            self.store.refresh_strike_hourly(include_current=True)
             print(f"🎉 {backfill_type} backfill completed!")
             print(f"✅ Successfully processed {success_count}/{total_processed} snapshots")
             return success_count > 0
@@ -210,7 +212,7 @@ def safe_int(val):
 
 class OptionsTracker:
     def __init__(self):
-        self.ist_tz = pytz.timezone('Asia/Kolkata')
+        self.ist_tz = IST
         self.scheduler = BlockingScheduler(timezone=self.ist_tz)
         self.calendar = MarketCalendar()
         self.datastore = MySQLOptionDataStore()
@@ -219,7 +221,12 @@ class OptionsTracker:
         self.adaptive_polling_engine = None
         
     def get_backfill_timestamps(self):
-        """Generate timestamps for backfill from yesterday and today's missed data"""
+        """
+        Generate timestamps for backfill from yesterday and today's missed data
+        
+        Returns:
+            list: IST-aware datetime objects, one per 3-minute bucket
+        """
         timestamps = []
         
         # Get yesterday's date
@@ -230,7 +237,7 @@ class OptionsTracker:
         # Generate yesterday's timestamps (every 3 minutes)
         current_time = yesterday_start
         while current_time <= yesterday_end:
-            timestamps.append(current_time.strftime('%Y-%m-%d %H:%M:%S'))
+            timestamps.append(current_time)
             current_time += timedelta(minutes=3)
         
         # Get today's missed data (from market start to current time)
@@ -245,7 +252,7 @@ class OptionsTracker:
             current_time = today_start
             
             while current_time <= today_end:
-                timestamps.append(current_time.strftime('%Y-%m-%d %H:%M:%S'))
+                timestamps.append(current_time)
                 current_time += timedelta(minutes=3)
         
         return timestamps
@@ -294,14 +301,14 @@ class OptionsTracker:
     
     def run_startup_backfill(self):
         """Run backfill on startup to fetch historical data"""
-        print("🔄 Running startup backfill to fetch historical data...")
+        logger.info("🔄 Running startup backfill to fetch historical data...")
         
         try:
             smart_api = angel_login.get_smart_api()
             
             # Get backfill timestamps
             timestamps = self.get_backfill_timestamps()
-            print(f"📅 Generated {len(timestamps)} timestamps for backfill")
+            logger.info("📅 Generated %s timestamps for backfill", len(timestamps))
             
             # Filter out timestamps that already have data
             missing_timestamps = []
@@ -309,48 +316,78 @@ class OptionsTracker:
                 if not self.check_existing_data(ts):
                     missing_timestamps.append(ts)
             
-            print(f"📊 Found {len(missing_timestamps)} missing timestamps")
+            logger.info("📊 Found %s missing timestamps", len(missing_timestamps))
             
             if not missing_timestamps:
-                print("✅ No missing data found. Historical data is up to date.")
+                logger.info("✅ No missing data found. Historical data is up to date.")
                 return True
             
             # Process each missing timestamp (limit to last 50 to avoid overwhelming)
             max_backfill = 50
             if len(missing_timestamps) > max_backfill:
-                print(f"⚠️  Limiting backfill to last {max_backfill} timestamps to avoid overwhelming the system")
+                logger.warning("⚠️  Limiting backfill to last %s timestamps to avoid overwhelming the system", max_backfill)
                 missing_timestamps = missing_timestamps[-max_backfill:]
             
-            success_count = 0
-            for i, timestamp in enumerate(missing_timestamps, 1):
-                print(f"🔄 Processing {i}/{len(missing_timestamps)}: {timestamp}")
-                
-                try:
-                    # Fetch data with timestamp override
-                    option_data = fetch_option_chain_data(smart_api, ts_override=timestamp)
-                    
-                    if option_data:
-                        # Store data with the specific timestamp
-                        if store_option_chain_data(option_data, timestamp):
-                            success_count += 1
-                            print(f"✅ Successfully backfilled data for {timestamp}")
-                        else:
-                            print(f"❌ Failed to store data for {timestamp}")
-                    else:
-                        print(f"⚠️  No data fetched for {timestamp}")
-                    
-                    # Small delay between requests
-                    time.sleep(2)
-                    
-                except Exception as e:
-                    print(f"❌ Error processing {timestamp}: {str(e)}")
-                    continue
+            # Dispatch fetches in batches; each result is stored as soon as it arrives
+            success_count = asyncio.run(self._run_backfill_batches(smart_api, missing_timestamps))
             
-            print(f"🎉 Startup backfill completed! {success_count}/{len(missing_timestamps)} timestamps processed successfully")
+            logger.info("🎉 Startup backfill completed! %s/%s timestamps processed successfully", success_count, len(missing_timestamps))
             return success_count > 0
             
         except Exception as e:
-            print(f"❌ Startup backfill error: {str(e)}")
+            logger.error("❌ Startup backfill error: %s", e)
+            return False
+    
+    async def _run_backfill_batches(self, smart_api, missing_timestamps):
+        """
+        Fetch backfill timestamps in concurrent batches of BACKFILL_BATCH_SIZE
+        
+        Results are stored in completion order, and the loop pauses between
+        batches to stay inside SmartAPI rate limits.
+        
+        Returns:
+            int: Number of timestamps backfilled successfully
+        """
+        success_count = 0
+        total = len(missing_timestamps)
+        
+        for batch_start in range(0, total, BACKFILL_BATCH_SIZE):
+            batch = missing_timestamps[batch_start:batch_start + BACKFILL_BATCH_SIZE]
+            logger.info("🔄 Processing %s-%s/%s", batch_start + 1, batch_start + len(batch), total)
+            
+            tasks = [asyncio.create_task(self._backfill_timestamp_async(smart_api, ts)) for ts in batch]
+            for completed in asyncio.as_completed(tasks):
+                if await completed:
+                    success_count += 1
+            
+            # Small delay between batches
+            if batch_start + BACKFILL_BATCH_SIZE < total:
+                await asyncio.sleep(BACKFILL_BATCH_PAUSE)
+        
+        return success_count
+    
+    async def _backfill_timestamp_async(self, smart_api, timestamp):
+        """Fetch and store one backfill timestamp on worker threads"""
+        ts_label = timestamp.strftime('%Y-%m-%d %H:%M:%S')
+        
+        try:
+            # Fetch data with timestamp override
+            option_data = await asyncio.to_thread(fetch_option_chain_data, smart_api, timestamp)
+            
+            if not option_data:
+                logger.warning("⚠️  No data fetched for %s", ts_label)
+                return False
+            
+            # Store data with the specific timestamp
+            if await asyncio.to_thread(store_option_chain_data, option_data, timestamp):
+                logger.info("✅ Successfully backfilled data for %s", ts_label)
+                return True
+            
+            logger.error("❌ Failed to store data for %s", ts_label)
+            return False
+            
+        except Exception as e:
+            logger.error("❌ Error processing %s: %s", ts_label, e)
             return False
         
     def fetch_and_store_all(self):
@@ -370,24 +407,24 @@ class OptionsTracker:
                     try:
                         self.ai_trade_engine.generate_trade_insights(bucket_ts, index_name)
                     except Exception as e:
-                        print(f"⚠️  AI trade insight generation failed for {index_name}: {str(e)}")
+                        logger.warning("⚠️  AI trade insight generation failed for %s: %s", index_name, e)
                 
                 return True
             return False
         except Exception as e:
-            print(f"❌ Error in fetch_and_store_all: {str(e)}")
+            logger.error("❌ Error in fetch_and_store_all: %s", e)
             return False
     
     def start_adaptive_polling(self):
         """Start the adaptive polling system with 20-second intervals"""
         try:
-            print("🔄 Starting adaptive polling system...")
+            logger.info("🔄 Starting adaptive polling system...")
             
             # Check if logged in, if not, login
             if not angel_login.is_authenticated():
-                print("🔐 Logging in to Angel One...")
+                logger.info("🔐 Logging in to Angel One...")
                 if not angel_login.login():
-                    print("❌ Failed to login. Cannot start polling.")
+                    logger.error("❌ Failed to login. Cannot start polling.")
                     return False
             
             # Get SmartAPI instance
@@ -400,7 +437,7 @@ class OptionsTracker:
             fetcher.start_live_poll()
                 
         except Exception as e:
-            print(f"❌ Error in adaptive polling: {str(e)}")
+            logger.error("❌ Error in adaptive polling: %s", e)
             return False
     
     def is_market_open(self):
@@ -411,14 +448,13 @@ class OptionsTracker:
         if now.weekday() >= 5:  # Saturday or Sunday
             return False
         
-        # Check market hours (9:18 AM to 3:30 PM IST)
-        market_start = now.replace(hour=9, minute=18, second=0, microsecond=0)
-        market_end = now.replace(hour=15, minute=30, second=0, microsecond=0)
-        
-        return market_start <= now <= market_end
+        # Check market hours (9:18 AM to 3:30 PM IST) as minutes since midnight
+        minute_of_day = now.hour * 60 + now.minute
+        return MARKET_OPEN_MINUTE <= minute_of_day <= MARKET_CLOSE_MINUTE
     
     def start_scheduler(self):
         """Start the APScheduler with adaptive polling and backfill"""
+        setup_queue_logging()
         try:
             print("🚀 Starting Angel One Options Analytics Tracker v3")
             print("=" * 60)
@@ -487,6 +523,7 @@ class OptionsTracker:
 
 def main():
     """Main function with Phase 2-5 integration"""
+    setup_queue_logging()
     print("🚀 Starting Angel One Options Analytics Tracker - Phase 5")
     print("=" * 60)
     
@@ -537,7 +574,7 @@ def main():
         print("✅ Angel One authentication successful")
         
         # Initialize adaptive polling engine with analysis engine
-        poller = AdaptivePollingEngine(smart_api, calendar, datastore, analysis_engine)
+        poller = AdaptivePollingEngine(smart_api, calendar, datastore, analysis_engine, login_manager=angel_login)
         
         # Phase 2 Logic: Market-aware startup
         if calendar.is_market_live_now():
@@ -633,10 +670,11 @@ def main():
         print("   ✅ Phase 5: Dashboard & API")
         print("=" * 60)
         
-        # Keep main thread alive
+        # Keep main thread alive until the API server exits; join in short
+        # slices so Ctrl+C is delivered (an untimed join blocks it on Windows)
         try:
-            while True:
-                time.sleep(1)
+            while api_thread.is_alive():
+                api_thread.join(1)
         except KeyboardInterrupt:
             print("\n🛑 Shutting down...")
         
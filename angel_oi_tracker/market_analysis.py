@@ -12,42 +12,85 @@ Features include:
 Always refer to official documentation: https://smartapi.angelone.in/docs
 """
 
+import logging
 from datetime import datetime, timedelta
-import pytz
+import numpy as np
+from utils.market_calendar import IST
 from option_chain_fetcher import OIAnalysis
-from store_option_data_mysql import MySQLOptionDataStore
+from store_option_data_mysql import MySQLOptionDataStore, snapshot_symbol
+from utils.async_logging import setup_queue_logging
+
+logger = logging.getLogger(__name__)
 
 class MarketDirectionAnalyzer:
     def __init__(self):
-        self.ist_tz = pytz.timezone('Asia/Kolkata')
+        self.ist_tz = IST
         self.analyzer = OIAnalysis()
         self.store = MySQLOptionDataStore()
+        
+        # OI summaries per (index, window), with the latest bucket they were built from
+        self._summary_cache = {}
+    
+    def _latest_bucket_ts(self, index_name):
+        """Most recent bucket_ts stored for an index, or None if unavailable"""
+        connection = self.store.get_connection()
+        if connection is None:
+            return None
+        try:
+            cursor = connection.cursor()
+            # Index-only lookup on idx_prefix_bucket (index_prefix, bucket_ts)
+            cursor.execute("SELECT MAX(bucket_ts) FROM option_snapshots WHERE index_prefix = %s", (index_name,))
+            result = cursor.fetchone()
+            return result[0] if result else None
+        except Exception as e:
+            logger.warning("⚠️  Error getting latest bucket timestamp: %s", e)
+            return None
+        finally:
+            connection.close()
+    
+    def get_oi_summary(self, index_name, hours_back=24):
+        """OI summary, shared by the analyzers until a new bucket is stored for the index"""
+        latest_bucket_ts = self._latest_bucket_ts(index_name)
+        if latest_bucket_ts is None:
+            return self.analyzer.get_oi_summary(index_name, hours_back)
+        
+        cached = self._summary_cache.get((index_name, hours_back))
+        if cached is not None and cached[0] == latest_bucket_ts:
+            return cached[1]
+        
+        summary = self.analyzer.get_oi_summary(index_name, hours_back)
+        if summary is not None:
+            self._summary_cache[(index_name, hours_back)] = (latest_bucket_ts, summary)
+        return summary
     
     def analyze_market_direction(self, index_name='NIFTY', hours_back=24):
         """Comprehensive market direction analysis"""
-        print(f"🎯 Market Direction Analysis for {index_name}")
-        print("=" * 60)
+        logger.info("🎯 Market Direction Analysis for %s", index_name)
+        logger.info("=" * 60)
         
         # Get OI summary
-        summary = self.analyzer.get_oi_summary(index_name, hours_back)
+        summary = self.get_oi_summary(index_name, hours_back)
         if not summary:
-            print(f"❌ No data available for {index_name}")
+            logger.error("❌ No data available for %s", index_name)
             return None
         
+        # Build the strike arrays once; every analyzer below reuses them
+        self._strike_arrays(summary)
+        
         # Print basic summary
-        self.analyzer.print_oi_summary(index_name, hours_back)
+        self.analyzer.print_oi_summary(index_name, hours_back, summary=summary)
         
         # Analyze market direction indicators
         direction_signals = self._get_direction_signals(summary)
         
-        print(f"\n📊 Market Direction Signals:")
-        print("-" * 40)
+        logger.info("\n📊 Market Direction Signals:")
+        logger.info("-" * 40)
         for signal, value in direction_signals.items():
-            print(f"{signal}: {value}")
+            logger.info("%s: %s", signal, value)
         
         # Get overall direction
         overall_direction = self._get_overall_direction(direction_signals)
-        print(f"\n🎯 Overall Market Direction: {overall_direction}")
+        logger.info("\n🎯 Overall Market Direction: %s", overall_direction)
         
         return {
             'summary': summary,
@@ -89,33 +132,43 @@ class MarketDirectionAnalyzer:
         
         return signals
     
+    def _strike_arrays(self, summary):
+        """
+        Parallel strike / CE OI / PE OI arrays for a summary, cached on it
+        
+        Args:
+            summary: OI summary from OIAnalysis.get_oi_summary
+            
+        Returns:
+            dict: {'strikes': list, 'ce': np.ndarray, 'pe': np.ndarray}
+        """
+        arrays = summary.get('_np')
+        if arrays is None:
+            strikes = summary['strikes']
+            arrays = {
+                'strikes': list(strikes.keys()),
+                'ce': np.fromiter((v['ce_oi'] or 0 for v in strikes.values()), dtype=np.int64, count=len(strikes)),
+                'pe': np.fromiter((v['pe_oi'] or 0 for v in strikes.values()), dtype=np.int64, count=len(strikes))
+            }
+            summary['_np'] = arrays
+        return arrays
+    
     def _analyze_atm_strikes(self, summary):
         """Analyze OI around ATM strikes"""
-        strikes = summary['strikes']
-        if not strikes:
+        if not summary['strikes']:
             return "No strike data available"
         
-        # Find ATM strikes (around current market level)
-        atm_strikes = []
-        for strike in strikes:
-            strike_data = strikes[strike]
-            ce_oi = strike_data['ce_oi']
-            pe_oi = strike_data['pe_oi']
-            
-            # If significant OI exists at this strike
-            if ce_oi > 100000 or pe_oi > 100000:
-                atm_strikes.append({
-                    'strike': strike,
-                    'ce_oi': ce_oi,
-                    'pe_oi': pe_oi
-                })
-        
-        if not atm_strikes:
+        arrays = self._strike_arrays(summary)
+        ce, pe = arrays['ce'], arrays['pe']
+        
+        # Find ATM strikes (around current market level) - significant OI at the strike
+        atm_mask = (ce > 100000) | (pe > 100000)
+        if not atm_mask.any():
             return "No significant ATM OI"
         
         # Analyze ATM OI distribution
-        total_ce_atm = sum(s['ce_oi'] for s in atm_strikes)
-        total_pe_atm = sum(s['pe_oi'] for s in atm_strikes)
+        total_ce_atm = int(ce[atm_mask].sum())
+        total_pe_atm = int(pe[atm_mask].sum())
         
         if total_pe_atm > total_ce_atm * 1.3:
             return f"BULLISH ATM (PE: {total_pe_atm:,} > CE: {total_ce_atm:,})"
@@ -126,33 +179,22 @@ class MarketDirectionAnalyzer:
     
     def _analyze_oi_concentration(self, summary):
         """Analyze OI concentration across strikes"""
-        strikes = summary['strikes']
-        if not strikes:
+        if not summary['strikes']:
             return "No strike data available"
         
-        # Find strikes with highest OI
-        high_oi_strikes = []
-        for strike in strikes:
-            strike_data = strikes[strike]
-            total_oi = strike_data['ce_oi'] + strike_data['pe_oi']
-            if total_oi > 1000000:  # 1M+ OI
-                high_oi_strikes.append({
-                    'strike': strike,
-                    'total_oi': total_oi,
-                    'ce_oi': strike_data['ce_oi'],
-                    'pe_oi': strike_data['pe_oi']
-                })
-        
-        if not high_oi_strikes:
-            return "No high OI concentration"
+        arrays = self._strike_arrays(summary)
+        ce, pe = arrays['ce'], arrays['pe']
+        total = ce + pe
         
-        # Sort by total OI
-        high_oi_strikes.sort(key=lambda x: x['total_oi'], reverse=True)
+        # Find strikes with highest OI (1M+ OI)
+        high_idx = np.flatnonzero(total > 1000000)
+        if high_idx.size == 0:
+            return "No high OI concentration"
         
-        # Analyze top 3 strikes
-        top_strikes = high_oi_strikes[:3]
-        total_ce_top = sum(s['ce_oi'] for s in top_strikes)
-        total_pe_top = sum(s['pe_oi'] for s in top_strikes)
+        # Analyze top 3 strikes by total OI
+        top_idx = high_idx[np.argsort(-total[high_idx], kind='stable')[:3]]
+        total_ce_top = int(ce[top_idx].sum())
+        total_pe_top = int(pe[top_idx].sum())
         
         if total_pe_top > total_ce_top * 1.5:
             return f"BULLISH Concentration (Top strikes PE-heavy: {total_pe_top:,} vs {total_ce_top:,})"
@@ -179,27 +221,34 @@ class MarketDirectionAnalyzer:
         else:
             return "🟡 NEUTRAL"
     
-    def analyze_oi_changes(self, trading_symbol, hours_back=6):
-        """Analyze OI changes for a specific trading symbol"""
-        print(f"\n📈 OI Changes Analysis for {trading_symbol}")
-        print("-" * 50)
-        
-        end_time = datetime.now(self.ist_tz)
-        start_time = end_time - timedelta(hours=hours_back)
-        
-        changes = self.analyzer.get_oi_changes(trading_symbol, start_time, end_time)
+    def analyze_oi_changes(self, trading_symbol, hours_back=6, changes=None):
+        """
+        Analyze OI changes for a specific trading symbol
+        
+        Args:
+            trading_symbol: Symbol to analyze
+            hours_back: Lookback window in hours
+            changes: Pre-fetched changes (e.g. from get_oi_changes_bulk); queried if None
+        """
+        logger.info("\n📈 OI Changes Analysis for %s", trading_symbol)
+        logger.info("-" * 50)
+        
+        if changes is None:
+            end_time = datetime.now(self.ist_tz)
+            start_time = end_time - timedelta(hours=hours_back)
+            changes = self.analyzer.get_oi_changes(trading_symbol, start_time, end_time)
         if not changes:
-            print(f"❌ No OI changes data for {trading_symbol}")
+            logger.error("❌ No OI changes data for %s", trading_symbol)
             return None
         
-        print(f"📊 Analyzing {len(changes)} OI changes over {hours_back} hours")
+        logger.info("📊 Analyzing %s OI changes over %s hours", len(changes), hours_back)
         
         # Calculate cumulative changes
         total_ce_change = sum(c['ce_oi_change'] for c in changes)
         total_pe_change = sum(c['pe_oi_change'] for c in changes)
         
-        print(f"📈 Total CE OI Change: {total_ce_change:+,}")
-        print(f"📉 Total PE OI Change: {total_pe_change:+,}")
+        logger.info("📈 Total CE OI Change: %s", format(total_ce_change, '+,'))
+        logger.info("📉 Total PE OI Change: %s", format(total_pe_change, '+,'))
         
         # Determine trend
         if total_pe_change > total_ce_change * 1.2:
@@ -209,15 +258,16 @@ class MarketDirectionAnalyzer:
         else:
             trend = "🟡 NEUTRAL (Balanced OI changes)"
         
-        print(f"🎯 Trend: {trend}")
+        logger.info("🎯 Trend: %s", trend)
         
         # Show recent changes
-        print(f"\n📋 Recent OI Changes:")
-        print("-" * 30)
+        logger.info("\n📋 Recent OI Changes:")
+        logger.info("-" * 30)
         for i, change in enumerate(changes[-5:], 1):  # Last 5 changes
-            print(f"{i}. {change['timestamp'].strftime('%H:%M')} - "
-                  f"CE: {change['ce_oi_change']:+,} ({change['ce_oi_pct_change']:+.1f}%), "
-                  f"PE: {change['pe_oi_change']:+,} ({change['pe_oi_pct_change']:+.1f}%)")
+            logger.info("%s. %s - CE: %s (%+.1f%%), PE: %s (%+.1f%%)",
+                        i, change['timestamp'].strftime('%H:%M'),
+                        format(change['ce_oi_change'], '+,'), change['ce_oi_pct_change'],
+                        format(change['pe_oi_change'], '+,'), change['pe_oi_pct_change'])
         
         return {
             'changes': changes,
@@ -228,47 +278,41 @@ class MarketDirectionAnalyzer:
     
     def get_strike_analysis(self, index_name, hours_back=24):
         """Get detailed strike-wise analysis"""
-        print(f"\n🎯 Strike-wise Analysis for {index_name}")
-        print("-" * 50)
+        logger.info("\n🎯 Strike-wise Analysis for %s", index_name)
+        logger.info("-" * 50)
         
         end_time = datetime.now(self.ist_tz)
         start_time = end_time - timedelta(hours=hours_back)
         
         analysis = self.analyzer.get_strike_analysis(index_name, start_time, end_time)
         if not analysis:
-            print(f"❌ No strike analysis data for {index_name}")
+            logger.error("❌ No strike analysis data for %s", index_name)
             return None
         
-        print(f"📊 Analyzing {len(analysis)} strikes over {hours_back} hours")
+        logger.info("📊 Analyzing %s strikes over %s hours", len(analysis), hours_back)
         
         # Find strikes with highest OI
-        high_oi_strikes = []
-        for strike, data in analysis.items():
-            total_oi = data['ce']['avg_oi'] + data['pe']['avg_oi']
-            if total_oi > 500000:  # 500K+ average OI
-                high_oi_strikes.append({
-                    'strike': strike,
-                    'total_oi': total_oi,
-                    'ce_avg': data['ce']['avg_oi'],
-                    'pe_avg': data['pe']['avg_oi'],
-                    'data_points': data['data_points']
-                })
-        
-        if high_oi_strikes:
-            high_oi_strikes.sort(key=lambda x: x['total_oi'], reverse=True)
-            print(f"\n🏆 Top High OI Strikes:")
-            print("-" * 30)
-            for i, strike_data in enumerate(high_oi_strikes[:5], 1):
-                print(f"{i}. Strike {strike_data['strike']}: "
-                      f"Total OI: {strike_data['total_oi']:,} "
-                      f"(CE: {strike_data['ce_avg']:,}, PE: {strike_data['pe_avg']:,})")
+        strikes = list(analysis.keys())
+        ce_avg = np.fromiter((float(d['ce']['avg_oi'] or 0) for d in analysis.values()), dtype=np.float64, count=len(strikes))
+        pe_avg = np.fromiter((float(d['pe']['avg_oi'] or 0) for d in analysis.values()), dtype=np.float64, count=len(strikes))
+        total_oi = ce_avg + pe_avg
+        
+        high_idx = np.flatnonzero(total_oi > 500000)  # 500K+ average OI
+        if high_idx.size:
+            top_idx = high_idx[np.argsort(-total_oi[high_idx], kind='stable')[:5]]
+            logger.info("\n🏆 Top High OI Strikes:")
+            logger.info("-" * 30)
+            for i, idx in enumerate(top_idx, 1):
+                logger.info("%s. Strike %s: Total OI: %s (CE: %s, PE: %s)",
+                            i, strikes[idx], format(total_oi[idx], ',.0f'),
+                            format(ce_avg[idx], ',.0f'), format(pe_avg[idx], ',.0f'))
         
         return analysis
     
     def run_complete_analysis(self, index_name='NIFTY'):
         """Run complete market analysis"""
-        print("🚀 Complete Market Analysis")
-        print("=" * 60)
+        logger.info("🚀 Complete Market Analysis")
+        logger.info("=" * 60)
         
         # 1. Market Direction Analysis
         direction_result = self.analyze_market_direction(index_name, 24)
@@ -276,14 +320,19 @@ class MarketDirectionAnalyzer:
         # 2. Strike Analysis
         strike_result = self.get_strike_analysis(index_name, 24)
         
-        # 3. OI Changes for top strikes
+        # 3. OI Changes for top strikes - one query for all symbols
         if direction_result and direction_result['summary']['strikes']:
             top_strikes = list(direction_result['summary']['strikes'].keys())[:3]
-            for strike in top_strikes:
-                symbol = f"{index_name}{strike}"
-                self.analyze_oi_changes(symbol, 6)
+            symbols = [snapshot_symbol(index_name, strike) for strike in top_strikes]
+            
+            end_time = datetime.now(self.ist_tz)
+            start_time = end_time - timedelta(hours=6)
+            bulk_changes = self.analyzer.get_oi_changes_bulk(symbols, start_time, end_time) or {}
+            
+            for symbol in symbols:
+                self.analyze_oi_changes(symbol, 6, changes=bulk_changes.get(symbol, []))
         
-        print(f"\n✅ Complete analysis finished!")
+        logger.info("\n✅ Complete analysis finished!")
         return {
             'direction': direction_result,
             'strikes': strike_result
@@ -291,18 +340,19 @@ class MarketDirectionAnalyzer:
 
 def main():
     """Main function for testing market analysis"""
+    setup_queue_logging()
     analyzer = MarketDirectionAnalyzer()
     
     # Run complete analysis
     result = analyzer.run_complete_analysis('NIFTY')
     
-    print(f"\n📋 Analysis Summary:")
-    print("-" * 30)
+    logger.info("\n📋 Analysis Summary:")
+    logger.info("-" * 30)
     if result['direction']:
-        print(f"Market Direction: {result['direction']['direction']}")
-        print(f"PCR: {result['direction']['summary']['pcr']:.2f}")
-        print(f"Total CE OI: {result['direction']['summary']['total_ce_oi']:,}")
-        print(f"Total PE OI: {result['direction']['summary']['total_pe_oi']:,}")
+        logger.info("Market Direction: %s", result['direction']['direction'])
+        logger.info("PCR: %.2f", result['direction']['summary']['pcr'])
+        logger.info("Total CE OI: %s", format(result['direction']['summary']['total_ce_oi'], ','))
+        logger.info("Total PE OI: %s", format(result['direction']['summary']['total_pe_oi'], ','))
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -18,15 +18,57 @@ API Compliance:
 - Terms of Service: Follow Angel One's terms and conditions
 """
 
+import atexit
 import pandas as pd
 import numpy as np
 import logging
 import os
+import re
 import json
+import threading
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
-import pytz
 from sqlalchemy import create_engine, text
+from sqlalchemy.engine import URL
+
+# orjson is optional: JSON log lines fall back to the stdlib encoder
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Columns the analytics read from historical_oi_tracking (covered by idx_index_bucket_cover)
+HISTORY_COLUMNS = [
+    'bucket_ts', 'strike', 'ce_oi', 'pe_oi',
+    'ce_oi_change', 'pe_oi_change', 'ce_oi_pct_change', 'pe_oi_pct_change',
+    'ce_ltp_change_pct', 'pe_ltp_change_pct'
+]
+
+# Narrow dtypes for history frames: OI counts fit in int32, percentages in float32
+HISTORY_DTYPES = {
+    'strike': 'int32', 'ce_oi': 'int32', 'pe_oi': 'int32',
+    'ce_oi_change': 'int32', 'pe_oi_change': 'int32',
+    'ce_oi_pct_change': 'float32', 'pe_oi_pct_change': 'float32',
+    'ce_ltp_change_pct': 'float32', 'pe_ltp_change_pct': 'float32'
+}
+
+# Confidence bands as (exclusive lower bounds, points per band), lowest band first
+OI_CHANGE_THRESHOLDS = np.array([100, 1000, 5000, 10000], dtype=np.float64)
+OI_CHANGE_POINTS = np.array([0, 10, 20, 30, 40], dtype=np.int32)
+OI_PCT_THRESHOLDS = np.array([5, 10, 25, 50], dtype=np.float64)
+OI_PCT_POINTS = np.array([0, 10, 15, 20, 30], dtype=np.int32)
+TOTAL_OI_THRESHOLDS = np.array([5000, 10000, 20000, 50000], dtype=np.float64)
+TOTAL_OI_POINTS = np.array([0, 3, 5, 7, 10], dtype=np.int32)
+
+# Price alignment points: OI and price rising on the same side, or mixed signals
+ALIGNED_POINTS = 20
+MIXED_POINTS = 10
+
+def _band_points(thresholds, points, values):
+    """Points for the band each value falls in (scalar or array)"""
+    # side='left' counts edges strictly below the value, i.e. a '>' ladder
+    return points[np.searchsorted(thresholds, values, side='left')]
 
 class OIAnalysisEngine:
     """
@@ -40,6 +82,15 @@ class OIAnalysisEngine:
     - Real-time alerts and trend detection
     """
     
+    # Arrow shown next to a support/resistance level that shifted
+    _SHIFT_ARROWS = {'UP': '↗', 'DOWN': '↘'}
+    
+    # Fields read by calculate_confidence, in unpack order
+    _CONFIDENCE_COLUMNS = (
+        'ce_oi_change', 'pe_oi_change', 'ce_oi_pct_change', 'pe_oi_pct_change',
+        'ce_ltp_change_pct', 'pe_ltp_change_pct', 'ce_oi', 'pe_oi'
+    )
+    
     def __init__(self, datastore):
         self.datastore = datastore
         self.ist_tz = datastore.ist_tz
@@ -52,6 +103,22 @@ class OIAnalysisEngine:
         # Setup logging
         self.setup_logging()
         
+        # Pooled engine for analytics reads (None falls back to datastore connections)
+        self.engine = self._create_engine()
+        
+        # Incremental history windows keyed by (index_name, hours_back, columns)
+        self._history_cache = {}
+        self._history_lock = threading.Lock()
+        
+        # Last live summary per index, keyed to the bucket it was built for and
+        # how many rows that bucket had
+        self._summary_cache = {}
+        
+        # Analytics log file, reopened only when the date changes
+        self._log_date = None
+        self._log_fp = None
+        atexit.register(self._close_log_file)
+        
         self.logger.info("OI Analysis Engine initialized")
     
     def setup_logging(self):
@@ -61,25 +128,44 @@ class OIAnalysisEngine:
             if not os.path.exists(log_dir):
                 os.makedirs(log_dir)
             
-            today = datetime.now(self.ist_tz).strftime('%Y-%m-%d')
-            log_file = f"{log_dir}/oi_analytics_{today}.log"
-            
-            # Configure JSON logging
-            logging.basicConfig(
-                level=logging.INFO,
-                format='%(message)s',
-                handlers=[
-                    logging.FileHandler(log_file),
-                    logging.StreamHandler()
-                ]
-            )
-            
             self.logger = logging.getLogger('oi_analytics')
             
+            # Handlers are attached once per process; later engines reuse them
+            # instead of reconfiguring the root logger
+            if not self.logger.handlers:
+                today = datetime.now(self.ist_tz).strftime('%Y-%m-%d')
+                log_file = f"{log_dir}/oi_analytics_{today}.log"
+                
+                formatter = logging.Formatter('%(message)s')
+                file_handler = logging.FileHandler(log_file, encoding='utf-8')
+                file_handler.setFormatter(formatter)
+                stream_handler = logging.StreamHandler()
+                stream_handler.setFormatter(formatter)
+                
+                self.logger.addHandler(file_handler)
+                self.logger.addHandler(stream_handler)
+                self.logger.setLevel(logging.INFO)
+                self.logger.propagate = False
+            
         except Exception as e:
             print(f"Error setting up logging: {str(e)}")
             self.logger = logging.getLogger('oi_analytics')
     
+    def _create_engine(self):
+        """Create a small pooled SQLAlchemy engine from the datastore's MySQL settings"""
+        try:
+            url = URL.create(
+                "mysql+mysqlconnector",
+                username=self.datastore.user,
+                password=self.datastore.password,
+                host=self.datastore.host,
+                database=self.datastore.database
+            )
+            return create_engine(url, pool_size=2, pool_pre_ping=True)
+        except Exception as e:
+            self.logger.error(f"Error creating SQLAlchemy engine: {str(e)}")
+            return None
+    
     def calculate_confidence(self, strike_row: pd.Series) -> int:
         """
         Calculate confidence score for OI changes (0-100)
@@ -93,61 +179,40 @@ class OIAnalysisEngine:
         try:
             confidence = 0
             
-            # Base confidence from OI change magnitude
-            ce_oi_change = abs(float(strike_row.get('ce_oi_change', 0) or 0))
-            pe_oi_change = abs(float(strike_row.get('pe_oi_change', 0) or 0))
+            # Read and coerce every field once; missing/None/NaN count as 0
+            (ce_oi_change, pe_oi_change, ce_pct, pe_pct,
+             ce_ltp_pct, pe_ltp_pct, ce_oi, pe_oi) = (
+                float(value) if value is not None and value == value else 0.0
+                for value in (strike_row.get(column, 0) for column in self._CONFIDENCE_COLUMNS)
+            )
             
             # OI change scoring (0-40 points)
-            max_oi_change = max(ce_oi_change, pe_oi_change)
-            if max_oi_change > 10000:
-                confidence += 40
-            elif max_oi_change > 5000:
-                confidence += 30
-            elif max_oi_change > 1000:
-                confidence += 20
-            elif max_oi_change > 100:
-                confidence += 10
+            max_oi_change = max(abs(ce_oi_change), abs(pe_oi_change))
+            confidence += int(_band_points(OI_CHANGE_THRESHOLDS, OI_CHANGE_POINTS, max_oi_change))
             
             # Percentage change scoring (0-30 points)
-            ce_pct = abs(float(strike_row.get('ce_oi_pct_change', 0) or 0))
-            pe_pct = abs(float(strike_row.get('pe_oi_pct_change', 0) or 0))
-            max_pct = max(ce_pct, pe_pct)
-            
-            if max_pct > 50:
-                confidence += 30
-            elif max_pct > 25:
-                confidence += 20
-            elif max_pct > 10:
-                confidence += 15
-            elif max_pct > 5:
-                confidence += 10
+            max_pct = max(abs(ce_pct), abs(pe_pct))
+            confidence += int(_band_points(OI_PCT_THRESHOLDS, OI_PCT_POINTS, max_pct))
             
             # Price alignment scoring (0-20 points)
-            ce_oi_up = float(strike_row.get('ce_oi_change', 0) or 0) > 0
-            pe_oi_up = float(strike_row.get('pe_oi_change', 0) or 0) > 0
-            ce_price_up = float(strike_row.get('ce_ltp_change_pct', 0) or 0) > 0
-            pe_price_up = float(strike_row.get('pe_ltp_change_pct', 0) or 0) > 0
+            ce_oi_up = ce_oi_change > 0
+            pe_oi_up = pe_oi_change > 0
+            ce_price_up = ce_ltp_pct > 0
+            pe_price_up = pe_ltp_pct > 0
             
             # CE OI up + CE price up = bearish signal (selling pressure)
             if ce_oi_up and ce_price_up:
-                confidence += 20
+                confidence += ALIGNED_POINTS
             # PE OI up + PE price up = bullish signal (buying pressure)
             elif pe_oi_up and pe_price_up:
-                confidence += 20
+                confidence += ALIGNED_POINTS
             # Mixed signals reduce confidence
             elif (ce_oi_up and pe_oi_up) or (ce_price_up and pe_price_up):
-                confidence += 10
+                confidence += MIXED_POINTS
             
             # Volume/activity scoring (0-10 points)
-            total_oi = float(strike_row.get('ce_oi', 0) or 0) + float(strike_row.get('pe_oi', 0) or 0)
-            if total_oi > 50000:
-                confidence += 10
-            elif total_oi > 20000:
-                confidence += 7
-            elif total_oi > 10000:
-                confidence += 5
-            elif total_oi > 5000:
-                confidence += 3
+            total_oi = ce_oi + pe_oi
+            confidence += int(_band_points(TOTAL_OI_THRESHOLDS, TOTAL_OI_POINTS, total_oi))
             
             return min(confidence, 100)
             
@@ -155,10 +220,64 @@ class OIAnalysisEngine:
             self.logger.error(f"Error calculating confidence: {str(e)}")
             return 0
     
-    def detect_support_resistance_shift(self, history_df: pd.DataFrame) -> Dict:
+    def _column_array(self, df: pd.DataFrame, column: str) -> np.ndarray:
+        """Numeric column as a float64 array with missing values as 0"""
+        if column not in df.columns:
+            return np.zeros(len(df), dtype=np.float64)
+        return pd.to_numeric(df[column], errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+    
+    def calculate_confidence_vec(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Vectorized calculate_confidence over every row of a DataFrame
+        
+        Uses the same scoring bands as calculate_confidence, evaluated on whole
+        columns at once instead of one row at a time.
+        
+        Returns:
+            np.ndarray: int32 confidence scores (0-100), one per row
+        """
+        ce_oi_change = self._column_array(df, 'ce_oi_change')
+        pe_oi_change = self._column_array(df, 'pe_oi_change')
+        ce_pct = self._column_array(df, 'ce_oi_pct_change')
+        pe_pct = self._column_array(df, 'pe_oi_pct_change')
+        ce_ltp_pct = self._column_array(df, 'ce_ltp_change_pct')
+        pe_ltp_pct = self._column_array(df, 'pe_ltp_change_pct')
+        ce_oi = self._column_array(df, 'ce_oi')
+        pe_oi = self._column_array(df, 'pe_oi')
+        total_oi = ce_oi + pe_oi
+        
+        # OI change scoring (0-40 points)
+        max_oi_change = np.maximum(np.abs(ce_oi_change), np.abs(pe_oi_change))
+        oi_points = _band_points(OI_CHANGE_THRESHOLDS, OI_CHANGE_POINTS, max_oi_change)
+        
+        # Percentage change scoring (0-30 points)
+        max_pct = np.maximum(np.abs(ce_pct), np.abs(pe_pct))
+        pct_points = _band_points(OI_PCT_THRESHOLDS, OI_PCT_POINTS, max_pct)
+        
+        # Price alignment scoring (0-20 points)
+        ce_oi_up = ce_oi_change > 0
+        pe_oi_up = pe_oi_change > 0
+        ce_price_up = ce_ltp_pct > 0
+        pe_price_up = pe_ltp_pct > 0
+        alignment_points = np.select(
+            [ce_oi_up & ce_price_up, pe_oi_up & pe_price_up, (ce_oi_up & pe_oi_up) | (ce_price_up & pe_price_up)],
+            [ALIGNED_POINTS, ALIGNED_POINTS, MIXED_POINTS], default=0
+        )
+        
+        # Volume/activity scoring (0-10 points)
+        activity_points = _band_points(TOTAL_OI_THRESHOLDS, TOTAL_OI_POINTS, total_oi)
+        
+        confidence = oi_points + pct_points + alignment_points + activity_points
+        return np.minimum(confidence, 100).astype(np.int32)
+    
+    def detect_support_resistance_shift(self, history_df: pd.DataFrame,
+                                        bucket_aggregates: Optional[pd.DataFrame] = None) -> Dict:
         """
         Detect support and resistance levels and their shifts
         
+        If bucket_aggregates (from get_bucket_aggregates) is given, the per-bucket
+        levels resolved in SQL are used instead of scanning history_df.
+        
         Returns:
         - support_level: Current support level (strike with max PE OI)
         - resistance_level: Current resistance level (strike with max CE OI)
@@ -166,22 +285,45 @@ class OIAnalysisEngine:
         - resistance_shift: Direction of resistance shift (UP/DOWN/NEUTRAL)
         """
         try:
-            if history_df.empty:
+            if bucket_aggregates is not None and not bucket_aggregates.empty:
+                # Levels already resolved per bucket in SQL; keep the last two
+                recent = bucket_aggregates.tail(2)
+                levels = [
+                    (int(support), int(resistance))
+                    for support, resistance in zip(recent['support_strike'], recent['resistance_strike'])
+                ]
+            elif history_df.empty:
                 return {
                     'support_level': None,
                     'resistance_level': None,
                     'support_shift': 'NEUTRAL',
                     'resistance_shift': 'NEUTRAL'
                 }
+            else:
+                # SQL returns rows ordered by bucket_ts; only sort frames built elsewhere
+                if not history_df['bucket_ts'].is_monotonic_increasing:
+                    history_df = history_df.sort_values('bucket_ts', kind='stable')
+                
+                # Pull the columns out once instead of re-casting per bucket
+                buckets = history_df['bucket_ts'].to_numpy()
+                strikes = history_df['strike'].to_numpy()
+                pe_oi = self._column_array(history_df, 'pe_oi')
+                ce_oi = self._column_array(history_df, 'ce_oi')
+                
+                # Row offsets where a new bucket starts; the last two runs are the
+                # previous and current buckets
+                bounds = np.concatenate(([0], np.flatnonzero(buckets[1:] != buckets[:-1]) + 1, [len(buckets)]))
+                
+                def bucket_levels(start, end):
+                    """(support, resistance) for rows [start, end): strikes with max PE / CE OI"""
+                    return (int(strikes[start + pe_oi[start:end].argmax()]),
+                            int(strikes[start + ce_oi[start:end].argmax()]))
+                
+                levels = [bucket_levels(start, end) for start, end in zip(bounds[:-1][-2:], bounds[1:][-2:])]
             
-            # Get unique sorted buckets
-            buckets = sorted(history_df['bucket_ts'].unique())
-            if len(buckets) < 2:
+            if len(levels) < 2:
                 # Not enough data to detect shift
-                latest_bucket = buckets[-1]
-                latest_data = history_df[history_df['bucket_ts'] == latest_bucket]
-                support_level = int(latest_data.loc[latest_data['pe_oi'].astype(float).idxmax(), 'strike']) if not latest_data.empty else None
-                resistance_level = int(latest_data.loc[latest_data['ce_oi'].astype(float).idxmax(), 'strike']) if not latest_data.empty else None
+                support_level, resistance_level = levels[-1]
                 return {
                     'support_level': support_level,
                     'resistance_level': resistance_level,
@@ -189,21 +331,7 @@ class OIAnalysisEngine:
                     'resistance_shift': 'NEUTRAL'
                 }
             # Previous and current buckets
-            prev_bucket = buckets[-2]
-            curr_bucket = buckets[-1]
-            prev_data = history_df[history_df['bucket_ts'] == prev_bucket]
-            curr_data = history_df[history_df['bucket_ts'] == curr_bucket]
-            # Ensure DataFrame type
-            if not isinstance(prev_data, pd.DataFrame):
-                prev_data = pd.DataFrame(prev_data)
-            if not isinstance(curr_data, pd.DataFrame):
-                curr_data = pd.DataFrame(curr_data)
-            # Support: max PE OI
-            prev_support = int(prev_data.loc[prev_data['pe_oi'].astype(float).idxmax(), 'strike']) if not prev_data.empty else None
-            curr_support = int(curr_data.loc[curr_data['pe_oi'].astype(float).idxmax(), 'strike']) if not curr_data.empty else None
-            # Resistance: max CE OI
-            prev_resist = int(prev_data.loc[prev_data['ce_oi'].astype(float).idxmax(), 'strike']) if not prev_data.empty else None
-            curr_resist = int(curr_data.loc[curr_data['ce_oi'].astype(float).idxmax(), 'strike']) if not curr_data.empty else None
+            (prev_support, prev_resist), (curr_support, curr_resist) = levels
             # Detect shift
             support_shift = 'NEUTRAL'
             if prev_support is not None and curr_support is not None:
@@ -232,31 +360,84 @@ class OIAnalysisEngine:
                 'resistance_shift': 'NEUTRAL'
             }
     
-    def get_historical_data(self, bucket_ts: datetime, index_name: str, hours_back: int = 2) -> pd.DataFrame:
-        """Get historical OI data for analysis"""
+    def _read_sql(self, query: str, params: Dict) -> pd.DataFrame:
+        """
+        Run a read query with named (:name) parameters
+        
+        Uses the pooled engine when available, otherwise a one-off datastore
+        connection with the same parameters in pyformat style.
+        """
+        if self.engine is not None:
+            # Pooled connection: no TCP/auth handshake per dashboard refresh
+            with self.engine.connect() as conn:
+                return pd.read_sql(text(query), conn, params=params)
+        
+        connection = self.datastore.get_connection()
+        if connection is None:
+            return pd.DataFrame()
+        
+        # Use pandas read_sql with connection (suppress warning)
+        import warnings
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            df = pd.read_sql(re.sub(r':(\w+)', r'%(\1)s', query), connection, params=params)
+        
+        connection.close()
+        
+        return df
+    
+    def get_historical_data(self, bucket_ts: datetime, index_name: str, hours_back: int = 2,
+                            columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Get historical OI data for analysis
+        
+        Only HISTORY_COLUMNS are selected unless a different column list is given.
+        The window is cached per index: when it slides forward, only buckets from
+        the last cached one onwards are re-read (that bucket may still be updating)
+        and buckets that fell out of the window are dropped.
+        """
         try:
-            connection = self.datastore.get_connection()
-            if connection is None:
-                return pd.DataFrame()
-            
-            # Calculate time range
-            end_time = bucket_ts
+            # Calculate time range (naive IST, matching the TIMESTAMP column values)
+            end_time = self._naive(bucket_ts)
             start_time = end_time - timedelta(hours=hours_back)
             
-            query = """
-                SELECT * FROM historical_oi_tracking 
-                WHERE index_name = %s 
-                AND bucket_ts BETWEEN %s AND %s
+            select_columns = list(columns or HISTORY_COLUMNS)
+            cache_key = (index_name, hours_back, tuple(select_columns))
+            with self._history_lock:
+                cached = self._history_cache.get(cache_key)
+            
+            fetch_from = start_time
+            cached_df = None
+            if (cached is not None and 'bucket_ts' in select_columns
+                    and cached['start_time'] <= start_time <= cached['last_bucket'] <= end_time):
+                fetch_from = cached['last_bucket']
+                cached_df = cached['df'][cached['df']['bucket_ts'] < fetch_from]
+            
+            query = f"""
+                SELECT {", ".join(select_columns)} FROM historical_oi_tracking 
+                WHERE index_name = :index_name 
+                AND bucket_ts BETWEEN :start_time AND :end_time
                 ORDER BY bucket_ts ASC, strike ASC
             """
             
-            # Use pandas read_sql with connection (suppress warning)
-            import warnings
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore", UserWarning)
-                df = pd.read_sql(query, connection, params=(index_name, start_time, end_time))
-            
-            connection.close()
+            df = self._read_sql(query, {
+                'index_name': index_name,
+                'start_time': fetch_from,
+                'end_time': end_time
+            })
+            df = self._downcast_history(df)
+            
+            if cached_df is not None:
+                df = pd.concat([cached_df, df], ignore_index=True)
+                df = df[df['bucket_ts'] >= start_time].reset_index(drop=True)
+            
+            if 'bucket_ts' in select_columns and not df.empty:
+                with self._history_lock:
+                    self._history_cache[cache_key] = {
+                        'start_time': start_time,
+                        'last_bucket': self._naive(df['bucket_ts'].iloc[-1]),
+                        'df': df
+                    }
             
             return df
             
@@ -264,95 +445,212 @@ class OIAnalysisEngine:
             self.logger.error(f"Error getting historical data: {str(e)}")
             return pd.DataFrame()
     
-    def analyze_bullish_bearish_strikes(self, history_df: pd.DataFrame) -> Tuple[List[Dict], List[Dict]]:
-        """Analyze and rank bullish and bearish strikes"""
+    @staticmethod
+    def _downcast_history(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Cast history columns to HISTORY_DTYPES
+        
+        Integer columns that contain NULLs are stored as float32 instead, so
+        missing values stay NaN rather than failing the cast.
+        """
+        dtypes = {}
+        for column, dtype in HISTORY_DTYPES.items():
+            if column not in df.columns:
+                continue
+            if dtype == 'int32' and df[column].isna().any():
+                dtype = 'float32'
+            dtypes[column] = dtype
+        return df.astype(dtypes) if dtypes else df
+    
+    @staticmethod
+    def _naive(ts):
+        """
+        Plain naive datetime for comparing with TIMESTAMP values and binding
+        
+        Drops tzinfo from aware IST times and unwraps pandas Timestamps, which
+        the MySQL driver cannot bind.
+        """
+        if isinstance(ts, pd.Timestamp):
+            ts = ts.to_pydatetime()
+        return ts.replace(tzinfo=None) if ts.tzinfo is not None else ts
+    
+    def _bucket_row_count(self, bucket_ts: datetime, index_name: str) -> Optional[int]:
+        """Rows stored for an index in one bucket (idx_index_bucket_cover lookup), or None on error"""
         try:
-            if history_df.empty:
-                return [], []
+            df = self._read_sql("""
+                SELECT COUNT(*) AS row_count FROM historical_oi_tracking
+                WHERE index_name = :index_name AND bucket_ts = :bucket_ts
+            """, {'index_name': index_name, 'bucket_ts': self._naive(bucket_ts)})
+            return int(df['row_count'].iloc[0]) if not df.empty else None
+        except Exception as e:
+            self.logger.error(f"Error counting bucket rows: {str(e)}")
+            return None
+    
+    def get_bucket_aggregates(self, bucket_ts: datetime, index_name: str, hours_back: int = 2) -> pd.DataFrame:
+        """
+        Per-bucket totals and support/resistance computed in MySQL
+        
+        Returns one row per bucket instead of one per strike, with columns:
+        bucket_ts, total_ce_oi, total_pe_oi, pcr, support_strike, resistance_strike
+        """
+        try:
+            # Calculate time range (naive IST, matching the TIMESTAMP column values)
+            end_time = self._naive(bucket_ts)
+            start_time = end_time - timedelta(hours=hours_back)
             
-            # Get latest bucket data
-            latest_bucket = history_df.iloc[-1]['bucket_ts']
-            latest_data = history_df[history_df['bucket_ts'] == latest_bucket].copy()
+            # Support = strike with max PE OI, resistance = strike with max CE OI;
+            # ties go to the lowest strike
+            query = """
+                WITH ranked AS (
+                    SELECT bucket_ts, strike, ce_oi, pe_oi,
+                           ROW_NUMBER() OVER (PARTITION BY bucket_ts ORDER BY pe_oi DESC, strike ASC) AS pe_rank,
+                           ROW_NUMBER() OVER (PARTITION BY bucket_ts ORDER BY ce_oi DESC, strike ASC) AS ce_rank
+                    FROM historical_oi_tracking
+                    WHERE index_name = :index_name
+                    AND bucket_ts BETWEEN :start_time AND :end_time
+                )
+                SELECT bucket_ts,
+                       SUM(ce_oi) AS total_ce_oi,
+                       SUM(pe_oi) AS total_pe_oi,
+                       MAX(CASE WHEN pe_rank = 1 THEN strike END) AS support_strike,
+                       MAX(CASE WHEN ce_rank = 1 THEN strike END) AS resistance_strike
+                FROM ranked
+                GROUP BY bucket_ts
+                ORDER BY bucket_ts ASC
+            """
+            
+            agg_df = self._read_sql(query, {
+                'index_name': index_name,
+                'start_time': start_time,
+                'end_time': end_time
+            })
+            if agg_df.empty:
+                return agg_df
+            
+            total_ce = self._column_array(agg_df, 'total_ce_oi')
+            total_pe = self._column_array(agg_df, 'total_pe_oi')
+            agg_df['pcr'] = np.divide(total_pe, total_ce, out=np.zeros_like(total_pe), where=total_ce > 0)
+            return agg_df
+            
+        except Exception as e:
+            self.logger.error(f"Error getting bucket aggregates: {str(e)}")
+            return pd.DataFrame()
+    
+    def aggregate_history(self, history_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Client-side equivalent of get_bucket_aggregates for an in-memory history frame
+        
+        One groupby pass yields per-bucket totals, PCR and the support/resistance
+        strikes (ties go to the lowest strike, as in the SQL version).
+        """
+        frame = pd.DataFrame({
+            'bucket_ts': history_df['bucket_ts'].to_numpy(),
+            'strike': history_df['strike'].to_numpy(),
+            'ce_oi': self._column_array(history_df, 'ce_oi'),
+            'pe_oi': self._column_array(history_df, 'pe_oi')
+        }).sort_values(['bucket_ts', 'strike'], kind='stable', ignore_index=True)
+        
+        grouped = frame.groupby('bucket_ts', sort=True)
+        agg_df = grouped.agg(total_ce_oi=('ce_oi', 'sum'), total_pe_oi=('pe_oi', 'sum')).reset_index()
+        agg_df['support_strike'] = frame['strike'].to_numpy()[grouped['pe_oi'].idxmax().to_numpy()]
+        agg_df['resistance_strike'] = frame['strike'].to_numpy()[grouped['ce_oi'].idxmax().to_numpy()]
+        
+        total_ce = agg_df['total_ce_oi'].to_numpy()
+        total_pe = agg_df['total_pe_oi'].to_numpy()
+        agg_df['pcr'] = np.divide(total_pe, total_ce, out=np.zeros_like(total_pe), where=total_ce > 0)
+        return agg_df
+    
+    def _latest_bucket_data(self, history_df: pd.DataFrame) -> pd.DataFrame:
+        """Rows of the most recent bucket in history_df (empty frame if none)"""
+        if history_df.empty:
+            return history_df
+        buckets = history_df['bucket_ts'].to_numpy()
+        return history_df[buckets == buckets[-1]]
+    
+    def analyze_bullish_bearish_strikes(self, history_df: pd.DataFrame,
+                                        latest_data: Optional[pd.DataFrame] = None) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Analyze and rank bullish and bearish strikes
+        
+        latest_data may be passed in when the caller already sliced the latest
+        bucket out of history_df (see _latest_bucket_data).
+        """
+        try:
+            if latest_data is None:
+                latest_data = self._latest_bucket_data(history_df)
             
             if latest_data.empty:
                 return [], []
             
             # Calculate confidence scores
-            latest_data['confidence'] = latest_data.apply(self.calculate_confidence, axis=1)
+            latest_data = latest_data.assign(confidence=self.calculate_confidence_vec(latest_data))
             
             # Filter strikes with significant OI changes
-            significant_data = latest_data[
-                (latest_data['ce_oi_change'] > 0) | 
-                (latest_data['pe_oi_change'] > 0)
-            ].copy()
+            ce_oi_change = self._column_array(latest_data, 'ce_oi_change')
+            pe_oi_change = self._column_array(latest_data, 'pe_oi_change')
+            significant_mask = (ce_oi_change > 0) | (pe_oi_change > 0)
             
-            if significant_data.empty:
+            if not significant_mask.any():
                 return [], []
             
-            # Classify strikes as bullish or bearish
-            bullish_strikes = []
-            bearish_strikes = []
-            
-            for _, row in significant_data.iterrows():
-                strike_info = {
-                    'strike': int(row['strike']),
-                    'ce_oi_change': int(row['ce_oi_change']),
-                    'pe_oi_change': int(row['pe_oi_change']),
-                    'ce_oi_pct': float(row['ce_oi_pct_change']),
-                    'pe_oi_pct': float(row['pe_oi_pct_change']),
-                    'ce_ltp_pct': float(row['ce_ltp_change_pct']),
-                    'pe_ltp_pct': float(row['pe_ltp_change_pct']),
-                    'confidence': int(row['confidence'])
-                }
-                
-                # Determine if bullish or bearish based on OI and price patterns
-                ce_dominant = float(row['ce_oi_change']) > float(row['pe_oi_change'])
-                price_aligned = False
-                
-                if ce_dominant:
-                    # CE OI up + CE price up = bearish (selling pressure)
-                    price_aligned = float(row['ce_ltp_pct']) > 0
-                    if price_aligned:
-                        bearish_strikes.append(strike_info)
-                    else:
-                        bullish_strikes.append(strike_info)
-                else:
-                    # PE OI up + PE price up = bullish (buying pressure)
-                    price_aligned = float(row['pe_ltp_pct']) > 0
-                    if price_aligned:
-                        bullish_strikes.append(strike_info)
-                    else:
-                        bearish_strikes.append(strike_info)
-            
-            # Sort by confidence and limit to top N
-            bullish_strikes.sort(key=lambda x: x['confidence'], reverse=True)
-            bearish_strikes.sort(key=lambda x: x['confidence'], reverse=True)
+            significant_data = latest_data[significant_mask]
+            strike_info = pd.DataFrame({
+                'strike': self._column_array(significant_data, 'strike').astype(np.int64),
+                'ce_oi_change': ce_oi_change[significant_mask].astype(np.int64),
+                'pe_oi_change': pe_oi_change[significant_mask].astype(np.int64),
+                'ce_oi_pct': self._column_array(significant_data, 'ce_oi_pct_change'),
+                'pe_oi_pct': self._column_array(significant_data, 'pe_oi_pct_change'),
+                'ce_ltp_pct': self._column_array(significant_data, 'ce_ltp_change_pct'),
+                'pe_ltp_pct': self._column_array(significant_data, 'pe_ltp_change_pct'),
+                'confidence': significant_data['confidence'].to_numpy(dtype=np.int64)
+            })
+            
+            # Classify strikes as bullish or bearish based on OI and price patterns:
+            # CE-dominant OI with CE price up = bearish (selling pressure),
+            # PE-dominant OI with PE price up = bullish (buying pressure)
+            ce_dominant = strike_info['ce_oi_change'].to_numpy() > strike_info['pe_oi_change'].to_numpy()
+            ce_price_up = strike_info['ce_ltp_pct'].to_numpy() > 0
+            pe_price_up = strike_info['pe_ltp_pct'].to_numpy() > 0
+            bearish_mask = (ce_dominant & ce_price_up) | (~ce_dominant & ~pe_price_up)
+            
+            # Top N by confidence (partial selection, ties keep strike order)
+            def top_strikes(frame):
+                return frame.nlargest(self.max_strikes_display, 'confidence', keep='first').to_dict('records')
             
             return (
-                bullish_strikes[:self.max_strikes_display],
-                bearish_strikes[:self.max_strikes_display]
+                top_strikes(strike_info[~bearish_mask]),
+                top_strikes(strike_info[bearish_mask])
             )
             
         except Exception as e:
             self.logger.error(f"Error analyzing bullish/bearish strikes: {str(e)}")
             return [], []
     
-    def calculate_pcr_and_bias(self, history_df: pd.DataFrame) -> Tuple[float, str]:
-        """Calculate PCR and determine market bias"""
+    def calculate_pcr_and_bias(self, history_df: pd.DataFrame,
+                               bucket_aggregates: Optional[pd.DataFrame] = None,
+                               latest_data: Optional[pd.DataFrame] = None) -> Tuple[float, str]:
+        """
+        Calculate PCR and determine market bias
+        
+        If bucket_aggregates (from get_bucket_aggregates) is given, the latest
+        bucket's SQL totals are used instead of summing history_df. Otherwise
+        latest_data (the latest bucket's rows) is summed, sliced here if not given.
+        """
         try:
-            if history_df.empty:
-                return 0.0, "NEUTRAL"
-            
-            # Get latest bucket data
-            latest_bucket = history_df.iloc[-1]['bucket_ts']
-            latest_data = history_df[history_df['bucket_ts'] == latest_bucket]
-            
-            if latest_data.empty:
-                return 0.0, "NEUTRAL"
-            
-            # Calculate total CE and PE OI
-            total_ce_oi = float(latest_data['ce_oi'].sum() or 0)
-            total_pe_oi = float(latest_data['pe_oi'].sum() or 0)
+            if bucket_aggregates is not None and not bucket_aggregates.empty:
+                latest = bucket_aggregates.iloc[-1]
+                total_ce_oi = float(latest['total_ce_oi'] or 0)
+                total_pe_oi = float(latest['total_pe_oi'] or 0)
+            else:
+                if latest_data is None:
+                    latest_data = self._latest_bucket_data(history_df)
+                
+                if latest_data.empty:
+                    return 0.0, "NEUTRAL"
+                
+                # Calculate total CE and PE OI
+                total_ce_oi = float(latest_data['ce_oi'].sum() or 0)
+                total_pe_oi = float(latest_data['pe_oi'].sum() or 0)
             
             # Calculate PCR
             if total_ce_oi > 0:
@@ -390,10 +688,23 @@ class OIAnalysisEngine:
         - support_shift: Support shift direction
         - resistance_shift: Resistance shift direction
         - alerts: List of trend alerts
+        
+        Repeated calls for the same index and bucket_ts return the cached summary
+        without reading history or logging again, until more rows for that
+        bucket are stored (by any process).
         """
         try:
-            # Get historical data for analysis
+            row_count = self._bucket_row_count(bucket_ts, index_name)
+            cache_key = (bucket_ts, row_count)
+            cached = self._summary_cache.get(index_name)
+            if row_count is not None and cached is not None and cached[0] == cache_key:
+                return cached[1]
+            
+            # The history window is cached per index and only re-read from its
+            # newest bucket on, so each refresh fetches one or two buckets; the
+            # per-bucket totals and S/R levels are aggregated from it client-side
             history_df = self.get_historical_data(bucket_ts, index_name)
+            bucket_aggregates = self.aggregate_history(history_df) if not history_df.empty else None
             
             if history_df.empty:
                 return {
@@ -410,17 +721,20 @@ class OIAnalysisEngine:
                     'alerts': []
                 }
             
+            # Slice the latest bucket once and share it between the analyzers
+            latest_data = self._latest_bucket_data(history_df)
+            
             # Calculate PCR and bias
-            pcr, bias = self.calculate_pcr_and_bias(history_df)
+            pcr, bias = self.calculate_pcr_and_bias(history_df, bucket_aggregates, latest_data)
             
             # Analyze bullish/bearish strikes
-            bullish_strikes, bearish_strikes = self.analyze_bullish_bearish_strikes(history_df)
+            bullish_strikes, bearish_strikes = self.analyze_bullish_bearish_strikes(history_df, latest_data)
             
             # Detect support/resistance shifts
-            sr_analysis = self.detect_support_resistance_shift(history_df)
+            sr_analysis = self.detect_support_resistance_shift(history_df, bucket_aggregates)
             
             # Generate alerts
-            alerts = self.generate_alerts(history_df, sr_analysis, pcr)
+            alerts = self.generate_alerts(history_df, sr_analysis, pcr, bucket_aggregates)
             
             # Create summary
             summary = {
@@ -440,6 +754,7 @@ class OIAnalysisEngine:
             # Log summary as JSON
             self.log_summary(summary)
             
+            self._summary_cache[index_name] = (cache_key, summary)
             return summary
             
         except Exception as e:
@@ -458,8 +773,14 @@ class OIAnalysisEngine:
                 'alerts': []
             }
     
-    def generate_alerts(self, history_df: pd.DataFrame, sr_analysis: Dict, pcr: float) -> List[str]:
-        """Generate trend alerts based on analysis"""
+    def generate_alerts(self, history_df: pd.DataFrame, sr_analysis: Dict, pcr: float,
+                        bucket_aggregates: Optional[pd.DataFrame] = None) -> List[str]:
+        """
+        Generate trend alerts based on analysis
+        
+        The PCR trend is read per bucket, oldest to newest, from bucket_aggregates
+        (get_bucket_aggregates) or, if not given, from aggregate_history(history_df).
+        """
         alerts = []
         
         try:
@@ -475,16 +796,13 @@ class OIAnalysisEngine:
             elif sr_analysis['resistance_shift'] == 'DOWN':
                 alerts.append(f"Resistance shifted DOWN to {sr_analysis['resistance_level']}")
             
-            # PCR trend alert
-            if len(history_df) >= self.trend_buckets:
-                recent_pcrs = []
-                for i in range(self.trend_buckets):
-                    bucket_data = history_df.iloc[-(i+1)]
-                    bucket_ce_oi = float(bucket_data['ce_oi'] or 0)
-                    bucket_pe_oi = float(bucket_data['pe_oi'] or 0)
-                    if bucket_ce_oi > 0:
-                        bucket_pcr = bucket_pe_oi / bucket_ce_oi
-                        recent_pcrs.append(bucket_pcr)
+            # PCR trend alert (history_df is strike-level, so trend over bucket totals)
+            if (bucket_aggregates is None or bucket_aggregates.empty) and not history_df.empty:
+                bucket_aggregates = self.aggregate_history(history_df)
+            
+            if bucket_aggregates is not None and not bucket_aggregates.empty:
+                recent = bucket_aggregates.tail(self.trend_buckets)
+                recent_pcrs = recent.loc[recent['total_ce_oi'] > 0, 'pcr'].tolist()
                 
                 if len(recent_pcrs) >= 2:
                     pcr_trend = recent_pcrs[-1] - recent_pcrs[0]
@@ -521,60 +839,80 @@ class OIAnalysisEngine:
             }
             
             # Write to dedicated analytics log file
-            today = datetime.now(self.ist_tz).strftime('%Y-%m-%d')
-            log_dir = f"logs/{today}"
-            os.makedirs(log_dir, exist_ok=True)
-            
-            log_filename = f"{log_dir}/oi_analytics.log"
-            with open(log_filename, 'a') as f:
-                json_str = json.dumps(log_entry, default=str)
-                f.write(json_str + '\n')
+            log_fp = self._get_log_file()
+            if ORJSON_AVAILABLE:
+                # Native datetime/numpy encoding; bytes go straight to the file
+                log_fp.write(orjson.dumps(
+                    log_entry, default=str,
+                    option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE
+                ))
+            else:
+                log_fp.write((json.dumps(log_entry, default=str) + '\n').encode('utf-8'))
                 
         except Exception as e:
             self.logger.error(f"JSON logging error: {str(e)}")
     
+    def _get_log_file(self):
+        """Unbuffered binary handle to today's analytics log, rolled over at midnight"""
+        today = datetime.now(self.ist_tz).date()
+        if today != self._log_date or self._log_fp is None:
+            self._close_log_file()
+            log_dir = f"logs/{today.strftime('%Y-%m-%d')}"
+            os.makedirs(log_dir, exist_ok=True)
+            # One write() per JSON line, so each entry lands on disk as a whole line
+            self._log_fp = open(f"{log_dir}/oi_analytics.log", 'ab', buffering=0)
+            self._log_date = today
+        return self._log_fp
+    
+    def _close_log_file(self):
+        """Close the cached analytics log handle"""
+        if self._log_fp is not None:
+            self._log_fp.close()
+            self._log_fp = None
+    
     def format_cli_display(self, summary: Dict) -> str:
         """Format summary for CLI dashboard display"""
         try:
-            output = []
+            # Read every summary field once
             index_name = summary.get('index_name', 'NIFTY')
             timestamp = summary.get('timestamp', 'N/A')
             pcr = summary.get('pcr', 0)
             bias = summary.get('bias', 'N/A')
+            support_level = summary.get('support_level')
+            resistance_level = summary.get('resistance_level')
+            bullish_strikes = summary.get('bullish_strikes')
+            bearish_strikes = summary.get('bearish_strikes')
+            alerts = summary.get('alerts')
+            
             # Ensure PCR is always shown as 'PCR: xx.xx'
-            output.append(f"\n📊 OI Analytics Dashboard - {index_name}")
-            output.append("=" * 60)
-            output.append(f"⏰ {timestamp} | PCR {pcr:.2f} | Bias: {bias}")
+            output = [
+                f"\n📊 OI Analytics Dashboard - {index_name}",
+                "=" * 60,
+                f"⏰ {timestamp} | PCR {pcr:.2f} | Bias: {bias}"
+            ]
             
             # Support/Resistance
-            if summary.get('support_level'):
-                shift = summary.get('support_shift', 'NEUTRAL')
-                arrow = "↗" if shift == "UP" else "↘" if shift == "DOWN" else ""
-                output.append(f"📉 Support{arrow}: {summary.get('support_level')}")
-            if summary.get('resistance_level'):
-                shift = summary.get('resistance_shift', 'NEUTRAL')
-                arrow = "↗" if shift == "UP" else "↘" if shift == "DOWN" else ""
-                output.append(f"📈 Resistance{arrow}: {summary.get('resistance_level')}")
+            if support_level:
+                arrow = self._SHIFT_ARROWS.get(summary.get('support_shift'), "")
+                output.append(f"📉 Support{arrow}: {support_level}")
+            if resistance_level:
+                arrow = self._SHIFT_ARROWS.get(summary.get('resistance_shift'), "")
+                output.append(f"📈 Resistance{arrow}: {resistance_level}")
             
             # Bullish strikes
-            if summary.get('bullish_strikes'):
+            if bullish_strikes:
                 output.append("\n🟢 Top Bullish Strikes:")
-                for strike in summary['bullish_strikes']:
-                    strike_val = strike.get('strike', 'N/A')
-                    output.append(f"   {strike_val}PE")
+                output.extend(f"   {strike.get('strike', 'N/A')}PE" for strike in bullish_strikes)
             
             # Bearish strikes
-            if summary.get('bearish_strikes'):
+            if bearish_strikes:
                 output.append("\n🔴 Top Bearish Strikes:")
-                for strike in summary['bearish_strikes']:
-                    strike_val = strike.get('strike', 'N/A')
-                    output.append(f"   {strike_val}CE")
+                output.extend(f"   {strike.get('strike', 'N/A')}CE" for strike in bearish_strikes)
             
             # Alerts
-            if summary.get('alerts'):
+            if alerts:
                 output.append("\n🚨 Alerts:")
-                for alert in summary['alerts']:
-                    output.append(f"   • {alert}")
+                output.extend(f"   • {alert}" for alert in alerts)
             
             return "\n".join(output)
             
@@ -19,28 +19,187 @@ API Compliance:
 - Terms of Service: Follow Angel One's terms and conditions
 """
 
+import asyncio
+import functools
+import logging
+import signal
+import threading
 import time
 import math
+import queue
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import pytz
+from itertools import groupby
+from operator import itemgetter
+import numpy as np
 from utils.symbols import get_index_token, INDEX_TOKENS
 from utils.strike_range import get_filtered_strikes, filter_option_chain_by_strikes
-from utils.scrip_master import get_token_for_symbol, search_symbols
+from utils.scrip_master import get_tokens_with_prefix, search_symbols
 from utils.expiry_manager import get_current_expiry, get_all_expiries
+from utils.market_calendar import IST
+from utils.rate_limiter import CANDLE_LIMITER, LTP_LIMITER, MARKET_DATA_LIMITER, OPTION_GREEK_LIMITER
+from utils.retry import retry
+
+logger = logging.getLogger(__name__)
 
 # Constants for adaptive polling
 REFRESH_WINDOW = 30   # seconds
 POLL_FREQUENCY = 20   # seconds
+BUCKET_SECONDS = 180  # 3-minute storage buckets; POLL_FREQUENCY divides it
+
+# getMarketData accepts at most this many tokens per request
+MARKET_DATA_BATCH_SIZE = 50
+
+# Seconds a resolved contract list is reused while the strike set is unchanged
+CONTRACT_CACHE_TTL = 5 * 60
+
+# Seconds fetched Greeks/IV are reused; they move far slower than LTP/OI
+# (capped at the end of the current 3-minute bucket, so Greeks are fetched
+# at most once per bucket)
+GREEKS_CACHE_TTL = 3 * 60
+
+# Index candles kept by the live poll loop (least recently used evicted first)
+CANDLE_CACHE_SIZE = 20
+
+# Seconds an index spot from the previous option request may pick this
+# poll's strikes (it only chooses the strike window; the stored spot is fresh)
+SPOT_REUSE_SECONDS = 60
+
+# Field defaults for contracts missing from the market-data / Greeks responses
+MARKET_DATA_DEFAULTS = {
+    'ltp': 0, 'open': 0, 'high': 0, 'low': 0, 'close': 0,
+    'change': 0, 'change_percent': 0, 'volume': 0, 'oi': 0
+}
+GREEK_DEFAULTS = {'delta': 0, 'gamma': 0, 'theta': 0, 'vega': 0, 'iv': 0}
+
+# (field, cast, response keys) for getMarketData FULL rows; the canonical
+# Angel key comes first and the rest are fallbacks for older payloads
+MARKET_DATA_FIELDS = (
+    ('ltp', float, ('ltp',)),
+    ('volume', int, ('tradeVolume', 'volume')),
+    ('oi', int, ('opnInterest', 'oi', 'openInterest')),
+    ('change', float, ('netChange', 'change')),
+    ('change_percent', float, ('pChange', 'percentChange')),
+    ('open', float, ('open',)),
+    ('high', float, ('high',)),
+    ('low', float, ('low',)),
+    ('close', float, ('close',)),
+)
+
+# Pending poll requests kept when fetches fall behind; newer ones are dropped
+POLL_QUEUE_DEPTH = 5
+
+# Polled snapshot batches waiting for the MySQL writer thread; when full, the
+# poll loop waits, so a slow database throttles fetching instead of losing rows
+WRITE_QUEUE_DEPTH = 4
+
+# Snapshot (oi, ltp) keys filled by each option type
+OPTION_SNAPSHOT_KEYS = {'CE': ('ce_oi', 'ce_ltp'), 'PE': ('pe_oi', 'pe_ltp')}
+
+# Bounds for the adaptive poll interval, and how many recent OI changes it
+# is estimated from
+MIN_POLL_INTERVAL = 5    # seconds
+MAX_POLL_INTERVAL = 60   # seconds
+CHANGE_HISTORY = 20
+
+# Session rotation for long-running polling
+SESSION_TTL = 6 * 60 * 60        # seconds a session is trusted for
+SESSION_REFRESH_MARGIN = 30 * 60  # rotate this many seconds before expiry
+
+def _first_present(row, keys, default=0):
+    """Value of the first key in keys that is set in row, else default"""
+    for key in keys:
+        value = row.get(key)
+        if value is not None:
+            return value
+    return default
+
+_MONTHS = ('JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC')
+
+@functools.lru_cache(maxsize=64)
+def _fmt_expiry(expiry_date, full_year=False):
+    """
+    Reformat a 'YYYY-MM-DD' expiry as DDMMMYY, or DDMMMYYYY with full_year,
+    e.g. '2024-07-25' -> '25JUL24'. Sliced directly rather than via
+    strptime/strftime, whose %b also depends on the process locale.
+    """
+    year, month, day = expiry_date[0:4], int(expiry_date[5:7]), expiry_date[8:10]
+    return f"{day}{_MONTHS[month - 1]}{year if full_year else year[2:]}"
+
+@functools.lru_cache(maxsize=32)
+def _symbol_prefix(index_name, expiry_date):
+    """Option symbol prefix, e.g. ('NIFTY', '2024-07-25') -> 'NIFTY25JUL24'"""
+    return index_name + _fmt_expiry(expiry_date)
+
+@functools.lru_cache(maxsize=32)
+def _strike_table(index_name, expiry_date):
+    """
+    (strike, 'CE'/'PE') -> (symbol, token) for every listed contract of one
+    index expiry, built with a single scrip-master pass. Contracts don't change
+    within an expiry and a new expiry is a new cache key.
+    """
+    prefix = _symbol_prefix(index_name, expiry_date)
+    table = {}
+    for symbol, token in get_tokens_with_prefix(prefix, "NFO").items():
+        strike, option_type = symbol[len(prefix):-2], symbol[-2:]
+        if option_type in ('CE', 'PE') and strike.isdigit():
+            table[(int(strike), option_type)] = (symbol, token)
+    return table
 
 class OptionChainFetcher:
-    def __init__(self, smart_api):
+    def __init__(self, smart_api, greeks_ttl=GREEKS_CACHE_TTL):
         self.smart_api = smart_api
-        self.ist_tz = pytz.timezone('Asia/Kolkata')
+        self.ist_tz = IST
+        self.greeks_ttl = greeks_ttl
         
         # In-memory storage for adaptive polling
         self.last_saved_bucket = {}  # key: trading_symbol, value: last 3-min bucket timestamp
         self.last_snapshot = {}      # key: trading_symbol, value: last snapshot data
         
+        # key: (index_name, expiry_date, strikes), value: (contracts, expires_at)
+        self._contract_cache = {}
+        
+        # key: index_name, value: (expiry_date string, epoch seconds it is valid until)
+        self._expiry_cache = {}
+        
+        # key: (index_name, expiry_date), value: (greeks_data, expires_at)
+        self._greeks_cache = {}
+        
+        # key: (index_name, bucket epoch seconds), value: candle data
+        self._candle_cache = OrderedDict()
+        
+        # key: index_name, value: {strike: trading_symbol}, grown as the ATM window moves
+        self._strike_symbols = {}
+        
+        # (field, cast, response key) resolved from the first getMarketData row,
+        # and an itemgetter for symbolToken plus those keys
+        self._market_data_schema = None
+        self._market_data_getter = None
+        
+        # Index spots returned alongside the last option request, and when
+        self._spot_ltps = {}
+        self._spot_fetched_at = 0.0
+        
+    # Raw SmartAPI calls, retried on transient network/JSON errors. Each one
+    # waits for a slot on its endpoint's shared limiter, including retries,
+    # and a rate-limit rejection pauses that endpoint with back-off.
+    @retry()
+    def _ltp_data(self, exchange, trading_symbol, token):
+        return LTP_LIMITER.call(self.smart_api.ltpData, exchange, trading_symbol, token)
+    
+    @retry()
+    def _get_market_data(self, mode, exchange_tokens):
+        return MARKET_DATA_LIMITER.call(self.smart_api.getMarketData, mode, exchange_tokens)
+    
+    @retry()
+    def _option_greek(self, greek_params):
+        return OPTION_GREEK_LIMITER.call(self.smart_api.optionGreek, greek_params)
+    
+    @retry()
+    def _get_candle_data(self, candle_params):
+        return CANDLE_LIMITER.call(self.smart_api.getCandleData, candle_params)
+    
     def get_index_ltp(self, index_name):
         """Get current LTP for the given index"""
         try:
@@ -49,7 +208,7 @@ class OptionChainFetcher:
                 raise ValueError(f"Invalid index name: {index_name}")
             
             # Get LTP for the index using the correct API method
-            ltp_data = self.smart_api.ltpData("NSE", index_name, str(token))
+            ltp_data = self._ltp_data("NSE", index_name, str(token))
             
             if ltp_data['status'] and ltp_data['data']:
                 return float(ltp_data['data']['ltp'])
@@ -57,114 +216,200 @@ class OptionChainFetcher:
                 raise Exception(f"Failed to get LTP for {index_name}: {ltp_data.get('message', 'Unknown error')}")
                 
         except Exception as e:
-            print(f"❌ Error getting LTP for {index_name}: {str(e)}")
+            logger.error("❌ Error getting LTP for %s: %s", index_name, e)
             return None
     
+    def get_index_ltps_bulk(self, index_names):
+        """
+        Get current LTPs for several indices in one getMarketData("LTP") call
+        
+        Returns:
+            dict: index_name -> LTP for every index the API returned
+        """
+        try:
+            token_to_index = {}
+            for index_name in index_names:
+                token = get_index_token(index_name)
+                if token:
+                    token_to_index[str(token)] = index_name
+            
+            if not token_to_index:
+                return {}
+            
+            response = self._get_market_data("LTP", {"NSE": list(token_to_index)})
+            
+            ltps = {}
+            if response['status'] and 'data' in response and 'fetched' in response['data']:
+                for item in response['data']['fetched']:
+                    index_name = token_to_index.get(str(item.get('symbolToken')))
+                    if index_name and item.get('ltp') is not None:
+                        ltps[index_name] = float(item['ltp'])
+            else:
+                logger.warning("⚠️  No index LTPs received: %s", response.get('message', 'Unknown error'))
+            
+            return ltps
+            
+        except Exception as e:
+            logger.error("❌ Error getting index LTPs: %s", e)
+            return {}
+    
     def get_expiry_date(self, index_name):
-        """Get current expiry date for an index"""
+        """
+        Get current expiry date for an index
+        
+        The result is cached until that expiry passes, so steady-state polls
+        skip the expiry lookup (and its log line) entirely.
+        """
         try:
+            cached = self._expiry_cache.get(index_name)
+            if cached and time.time() < cached[1]:
+                return cached[0]
+            
             # Use the new expiry manager to get current expiry
             current_expiry = get_current_expiry(index_name)
             
             if current_expiry:
                 expiry_date = current_expiry.strftime('%Y-%m-%d')
-                print(f"📅 Using current expiry for {index_name}: {expiry_date}")
+                logger.info("📅 Using current expiry for %s: %s", index_name, expiry_date)
+                self._expiry_cache[index_name] = (expiry_date, current_expiry.timestamp())
                 return expiry_date
             else:
-                print(f"❌ No valid expiry found for {index_name}")
+                logger.error("❌ No valid expiry found for %s", index_name)
                 return None
             
         except Exception as e:
-            print(f"❌ Error getting expiry date for {index_name}: {str(e)}")
+            logger.error("❌ Error getting expiry date for %s: %s", index_name, e)
             return None
     
     def get_option_contracts_for_strikes(self, index_name, expiry_date, strikes):
-        """Get actual option contract symbols and tokens for given strikes"""
+        """
+        Get actual option contract symbols and tokens for given strikes
+        
+        The result is reused for CONTRACT_CACHE_TTL seconds while the index,
+        expiry and strike set stay the same (i.e. until the ATM strike moves).
+        """
+        cache_key = (index_name, expiry_date, tuple(strikes))
+        cached = self._contract_cache.get(cache_key)
+        if cached and time.monotonic() < cached[1]:
+            return cached[0]
+        
         contracts = []
         
-        # Convert expiry date to required format (DDMMMYY)
-        expiry_obj = datetime.strptime(expiry_date, '%Y-%m-%d')
-        expiry_str = expiry_obj.strftime('%d%b%y').upper()
+        # Symbols and tokens for every strike of this expiry, built once per expiry
+        strike_table = _strike_table(index_name, expiry_date)
         
         for strike in strikes:
-            # Generate CE and PE symbol names
-            ce_symbol = f"{index_name}{expiry_str}{strike}CE"
-            pe_symbol = f"{index_name}{expiry_str}{strike}PE"
-            
-            # Get tokens from scrip master
-            ce_token = get_token_for_symbol(ce_symbol, "NFO")
-            pe_token = get_token_for_symbol(pe_symbol, "NFO")
-            
-            if ce_token:
-                contracts.append({
-                    'symbol': ce_symbol,
-                    'token': ce_token,
-                    'strike': strike,
-                    'type': 'CE'
-                })
-            
-            if pe_token:
-                contracts.append({
-                    'symbol': pe_symbol,
-                    'token': pe_token,
-                    'strike': strike,
-                    'type': 'PE'
-                })
+            for option_type in ('CE', 'PE'):
+                entry = strike_table.get((strike, option_type))
+                if entry and entry[1]:
+                    contracts.append({
+                        'symbol': entry[0],
+                        'token': entry[1],
+                        'strike': strike,
+                        'type': option_type
+                    })
         
+        # Keep only the current strike set per index/expiry
+        self._contract_cache = {
+            key: value for key, value in self._contract_cache.items() if key[:2] != cache_key[:2]
+        }
+        self._contract_cache[cache_key] = (contracts, time.monotonic() + CONTRACT_CACHE_TTL)
         return contracts
     
-    def get_market_data_for_options(self, option_contracts):
-        """Get market data (LTP, OI, Volume) for option contracts using getMarketData"""
+    def get_market_data_for_options(self, option_contracts, index_tokens=()):
+        """
+        Get market data (LTP, OI, Volume) for option contracts using getMarketData
+        
+        Contracts may span several indices; tokens are sent in as few requests
+        as the MARKET_DATA_BATCH_SIZE cap allows. NSE index_tokens ride along
+        in the same requests so their spot comes back without an extra call.
+        """
         try:
             if not option_contracts:
                 return {}
             
-            # Prepare exchange tokens for getMarketData
-            exchange_tokens = {
-                "NFO": [str(contract['token']) for contract in option_contracts]
-            }
-            
-            print(f"📊 Fetching market data for {len(option_contracts)} option contracts...")
+            tokens = [("NFO", str(contract['token'])) for contract in option_contracts]
+            tokens += [("NSE", str(token)) for token in index_tokens]
             
-            # Get market data using getMarketData API
-            response = self.smart_api.getMarketData("FULL", exchange_tokens)
+            logger.debug("📊 Fetching market data for %s option contracts...", len(option_contracts))
             
             market_data = {}
             
-            if response['status'] and 'data' in response and 'fetched' in response['data']:
-                for item in response['data']['fetched']:
-                    symbol_token = item.get('symbolToken')
+            for start in range(0, len(tokens), MARKET_DATA_BATCH_SIZE):
+                # Prepare exchange tokens for getMarketData
+                exchange_tokens = {}
+                for exchange, token in tokens[start:start + MARKET_DATA_BATCH_SIZE]:
+                    exchange_tokens.setdefault(exchange, []).append(token)
+                
+                # Get market data using getMarketData API
+                response = self._get_market_data("FULL", exchange_tokens)
+                
+                if not (response['status'] and 'data' in response and 'fetched' in response['data']):
+                    logger.warning("⚠️  No market data received: %s", response.get('message', 'Unknown error'))
+                    continue
+                
+                fetched = response['data']['fetched']
+                schema, getter = self._resolve_market_data_schema(fetched)
+                for item in fetched:
+                    try:
+                        symbol_token, *values = getter(item)
+                    except KeyError:
+                        # Row missing a field: read what is there
+                        symbol_token = item.get('symbolToken')
+                        values = [item.get(key) for _, _, key in schema]
                     if symbol_token:
                         market_data[symbol_token] = {
-                            'ltp': float(item.get('ltp', 0)),
-                            'volume': int(item.get('tradeVolume', item.get('volume', 0))),
-                            'oi': int(item.get('opnInterest', item.get('oi', item.get('openInterest', 0)))),
-                            'change': float(item.get('netChange', item.get('change', 0))),
-                            'change_percent': float(item.get('pChange', item.get('percentChange', 0))),
-                            'open': float(item.get('open', 0)),
-                            'high': float(item.get('high', 0)),
-                            'low': float(item.get('low', 0)),
-                            'close': float(item.get('close', 0))
+                            field: cast(value or 0) for (field, cast, _), value in zip(schema, values)
                         }
-                
-                print(f"✅ Successfully fetched market data for {len(market_data)} contracts")
-            else:
-                print(f"⚠️  No market data received: {response.get('message', 'Unknown error')}")
+            
+            if market_data:
+                logger.debug("✅ Successfully fetched market data for %s contracts", len(market_data))
             
             return market_data
             
         except Exception as e:
-            print(f"❌ Error fetching market data: {str(e)}")
+            logger.error("❌ Error fetching market data: %s", e)
             return {}
     
+    def _resolve_market_data_schema(self, fetched):
+        """
+        Pick, once, which response key carries each MARKET_DATA_FIELDS field
+        
+        The response shape is fixed for a session, so the fallback keys are
+        checked against the first row only and rows are then read with one
+        itemgetter call each.
+        
+        Returns:
+            tuple: ((field, cast, key), ...) and the matching itemgetter
+        """
+        if self._market_data_schema is None and fetched:
+            first = fetched[0]
+            self._market_data_schema = tuple(
+                (field, cast, next((key for key in keys if key in first), keys[0]))
+                for field, cast, keys in MARKET_DATA_FIELDS
+            )
+            self._market_data_getter = itemgetter(
+                'symbolToken', *(key for _, _, key in self._market_data_schema)
+            )
+        return self._market_data_schema or (), self._market_data_getter
+    
     def get_option_greeks(self, index_name, expiry_date):
-        """Get Greeks and IV for options using optionGreek API"""
+        """
+        Get Greeks and IV for options using optionGreek API
+        
+        Results are reused per (index, expiry) until the current 3-minute
+        bucket ends, or for greeks_ttl seconds if that is sooner.
+        """
+        cache_key = (index_name, expiry_date)
+        cached = self._greeks_cache.get(cache_key)
+        if cached and time.monotonic() < cached[1]:
+            return cached[0]
+        
         try:
             # Convert expiry date to required format (DDMMMYYYY)
-            expiry_obj = datetime.strptime(expiry_date, '%Y-%m-%d')
-            expiry_str = expiry_obj.strftime('%d%b%Y').upper()
+            expiry_str = _fmt_expiry(expiry_date, full_year=True)
             
-            print(f"📊 Fetching Greeks for {index_name} {expiry_str}...")
+            logger.debug("📊 Fetching Greeks for %s %s...", index_name, expiry_str)
             
             greek_params = {
                 "name": index_name,
@@ -172,14 +417,14 @@ class OptionChainFetcher:
             }
             
             # Get Greeks using optionGreek API
-            response = self.smart_api.optionGreek(greek_params)
+            response = self._option_greek(greek_params)
             
             greeks_data = {}
             
             if response['status'] and 'data' in response:
                 for row in response['data']:
-                    strike = float(row.get('strikePrice', row.get('strike', 0)))
-                    option_type = row.get('optionType', row.get('type', ''))
+                    strike = int(float(_first_present(row, ('strikePrice', 'strike'))))
+                    option_type = _first_present(row, ('optionType', 'type'), '')
                     
                     # Create key for easy lookup
                     key = f"{strike}_{option_type}"
@@ -189,152 +434,249 @@ class OptionChainFetcher:
                         'gamma': float(row.get('gamma', 0)),
                         'theta': float(row.get('theta', 0)),
                         'vega': float(row.get('vega', 0)),
-                        'iv': float(row.get('impliedVolatility', row.get('iv', 0)))
+                        'iv': float(_first_present(row, ('impliedVolatility', 'iv')))
                     }
                 
-                print(f"✅ Successfully fetched Greeks for {len(greeks_data)} option types")
+                logger.debug("✅ Successfully fetched Greeks for %s option types", len(greeks_data))
+                if greeks_data:
+                    bucket_left = BUCKET_SECONDS - time.time() % BUCKET_SECONDS
+                    self._greeks_cache[cache_key] = (
+                        greeks_data, time.monotonic() + min(self.greeks_ttl, bucket_left)
+                    )
             else:
-                print(f"⚠️  No Greeks data received: {response.get('message', 'Unknown error')}")
+                logger.warning("⚠️  No Greeks data received: %s", response.get('message', 'Unknown error'))
             
             return greeks_data
             
         except Exception as e:
-            print(f"❌ Error fetching Greeks: {str(e)}")
+            logger.error("❌ Error fetching Greeks: %s", e)
             return {}
     
-    def fetch_option_chain_data(self, index_name, expiry_date, range_strikes=5):
-        """Fetch complete option chain data including OI and Greeks"""
-        try:
-            # Get index LTP first
+    def prepare_option_chain(self, index_name, expiry_date, range_strikes=5, index_ltp=None):
+        """
+        Resolve the LTP, ATM strike and option contracts for one index
+        
+        Returns:
+            dict: index_name, index_ltp, atm_strike, expiry_date and contracts,
+                  or None if the index cannot be fetched this cycle
+        """
+        # Get index LTP first
+        if not index_ltp:
             index_ltp = self.get_index_ltp(index_name)
-            if not index_ltp:
-                return None
-            
-            print(f"📈 {index_name} LTP: {index_ltp}")
-            
-            # Get filtered strikes around ATM
-            strike_info = get_filtered_strikes(index_ltp, index_name, range_strikes)
-            atm_strike = strike_info['atm_strike']
-            target_strikes = strike_info['strikes']
-            
-            print(f"🎯 ATM Strike: {atm_strike}")
-            print(f"📋 Target Strikes: {target_strikes}")
-            
-            # Get actual option contracts for these strikes
-            option_contracts = self.get_option_contracts_for_strikes(index_name, expiry_date, target_strikes)
-            
-            if not option_contracts:
-                print(f"⚠️  No option contracts found for {index_name}")
-                return None
-            
-            print(f"📊 Found {len(option_contracts)} option contracts")
-            
-            # Get market data (LTP, OI, Volume) for all contracts
-            market_data = self.get_market_data_for_options(option_contracts)
-            
-            # Get Greeks data for the index and expiry
-            greeks_data = self.get_option_greeks(index_name, expiry_date)
+        if not index_ltp:
+            return None
+        
+        logger.info("📈 %s LTP: %s", index_name, index_ltp)
+        
+        # Get filtered strikes around ATM
+        strike_info = get_filtered_strikes(index_ltp, index_name, range_strikes)
+        atm_strike = strike_info['atm_strike']
+        target_strikes = strike_info['strikes']
+        
+        logger.debug("🎯 ATM Strike: %s", atm_strike)
+        logger.debug("📋 Target Strikes: %s", target_strikes)
+        
+        # Get actual option contracts for these strikes
+        option_contracts = self.get_option_contracts_for_strikes(index_name, expiry_date, target_strikes)
+        
+        if not option_contracts:
+            logger.warning("⚠️  No option contracts found for %s", index_name)
+            return None
+        
+        logger.debug("📊 Found %s option contracts", len(option_contracts))
+        
+        return {
+            'index_name': index_name,
+            'index_ltp': index_ltp,
+            'atm_strike': atm_strike,
+            'expiry_date': expiry_date,
+            'contracts': option_contracts
+        }
+    
+    def assemble_option_chain(self, chain, market_data, greeks_data, fetched_at=None):
+        """
+        Merge fetched market data and Greeks into a prepared option chain
+        
+        fetched_at is the cycle timestamp shared by every index in one fetch;
+        the current time is used if it is not given.
+        """
+        option_data = []
+        for contract in chain['contracts']:
+            token = str(contract['token'])
+            strike = int(contract['strike'])
+            option_type = contract['type']
+            
+            # Market data and Greeks are merged over their defaults in one step
+            # each instead of reading every field individually
+            option_info = {
+                'symbol': contract['symbol'],
+                'token': token,
+                'strike': strike,
+                'type': option_type,
+                **MARKET_DATA_DEFAULTS,
+                **market_data.get(token, {}),
+                **GREEK_DEFAULTS,
+                **greeks_data.get(f"{strike}_{option_type}", {})
+            }
             
-            # Prepare option data using DataFrame mapping
-            option_data = []
-            for contract in option_contracts:
-                symbol = contract['symbol']
-                token = str(contract['token'])
-                strike = float(contract['strike'])
-                option_type = contract['type']
-                
-                # Get market data
-                contract_market_data = market_data.get(token, {})
-                
-                # Compute percentChange if not present
-                ltp = contract_market_data.get('ltp', 0)
-                close = contract_market_data.get('close', 0)
-                percent_change = contract_market_data.get('percentChange')
-                if percent_change is None:
-                    percent_change = ((ltp - close) / close * 100) if close else 0
-                
-                # Merge Greeks data
-                greek_key = f"{strike}_{option_type}"
-                contract_greeks = greeks_data.get(greek_key, {})
-                
-                option_info = {
-                    'symbol': symbol,
-                    'token': token,
-                    'strike': strike,
-                    'type': option_type,
-                    'ltp': ltp,
-                    'open': contract_market_data.get('open', 0),
-                    'high': contract_market_data.get('high', 0),
-                    'low': contract_market_data.get('low', 0),
-                    'close': close,
-                    'change': contract_market_data.get('change', 0),
-                    'change_percent': percent_change,
-                    'volume': contract_market_data.get('volume', 0),
-                    'oi': contract_market_data.get('oi', 0),
-                    'depth': contract_market_data.get('depth', {}),
-                    'delta': contract_greeks.get('delta', 0),
-                    'gamma': contract_greeks.get('gamma', 0),
-                    'theta': contract_greeks.get('theta', 0),
-                    'vega': contract_greeks.get('vega', 0),
-                    'iv': contract_greeks.get('iv', 0)
-                }
-                option_data.append(option_info)
-                time.sleep(0.05)
+            # Percent change from LTP vs previous close
+            ltp = option_info['ltp']
+            close = option_info['close']
+            option_info['change_percent'] = ((ltp - close) / close * 100) if close else 0
+            option_info.setdefault('depth', {})
             
-            if not option_data:
-                print(f"⚠️  No option data fetched for {index_name}")
+            option_data.append(option_info)
+        
+        if not option_data:
+            logger.warning("⚠️  No option data fetched for %s", chain['index_name'])
+            return None
+        
+        logger.debug("✅ Fetched complete data for %s options", len(option_data))
+        
+        return {
+            'index_name': chain['index_name'],
+            'index_ltp': chain['index_ltp'],
+            'atm_strike': chain['atm_strike'],
+            'expiry_date': chain['expiry_date'],
+            'options': option_data,
+            'timestamp': fetched_at or datetime.now(self.ist_tz)
+        }
+    
+    def fetch_option_chain_data(self, index_name, expiry_date, range_strikes=5, index_ltp=None):
+        """
+        Fetch complete option chain data including OI and Greeks
+        
+        index_ltp may be passed in when it was already fetched in bulk
+        (see get_index_ltps_bulk); otherwise it is requested here.
+        """
+        try:
+            chain = self.prepare_option_chain(index_name, expiry_date, range_strikes, index_ltp)
+            if not chain:
                 return None
             
-            print(f"✅ Fetched complete data for {len(option_data)} options")
+            # Market data (LTP, OI, Volume) and Greeks are independent requests,
+            # so they are in flight at the same time
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                market_future = executor.submit(self.get_market_data_for_options, chain['contracts'])
+                greeks_future = executor.submit(self.get_option_greeks, index_name, expiry_date)
+                market_data = market_future.result()
+                greeks_data = greeks_future.result()
             
-            return {
-                'index_name': index_name,
-                'index_ltp': index_ltp,
-                'atm_strike': atm_strike,
-                'expiry_date': expiry_date,
-                'options': option_data,
-                'timestamp': datetime.now(self.ist_tz)
-            }
+            return self.assemble_option_chain(chain, market_data, greeks_data)
         except Exception as e:
-            print(f"❌ Error fetching option chain data for {index_name}: {str(e)}")
+            logger.error("❌ Error fetching option chain data for %s: %s", index_name, e)
             return None
     
-    def fetch_index_data(self, index_name, range_strikes=5):
-        """Fetch complete data for a single index"""
+    def fetch_index_data(self, index_name, range_strikes=5, index_ltp=None):
+        """Fetch complete data for a single index (index_ltp as in fetch_option_chain_data)"""
         try:
-            print(f"📊 Fetching data for {index_name}...")
+            logger.debug("📊 Fetching data for %s...", index_name)
             
             # Get expiry date
             expiry_date = self.get_expiry_date(index_name)
             if not expiry_date:
-                print(f"❌ Failed to get expiry for {index_name}")
+                logger.error("❌ Failed to get expiry for %s", index_name)
                 return None
             
             # Fetch option chain data
-            option_chain_data = self.fetch_option_chain_data(index_name, expiry_date, range_strikes)
+            option_chain_data = self.fetch_option_chain_data(index_name, expiry_date, range_strikes, index_ltp)
             if not option_chain_data:
-                print(f"⚠️  No option chain data available for {index_name}")
+                logger.warning("⚠️  No option chain data available for %s", index_name)
                 return None
             
             return option_chain_data
             
         except Exception as e:
-            print(f"❌ Error fetching data for {index_name}: {str(e)}")
+            logger.error("❌ Error fetching data for %s: %s", index_name, e)
             return None
     
-    def fetch_all_indices_data(self, range_strikes=5):
-        """Fetch data for all supported indices"""
+    def _prepare_index(self, index_name, range_strikes, index_ltp):
+        """Expiry lookup plus prepare_option_chain for one index (None on failure)"""
+        try:
+            logger.debug("📊 Fetching data for %s...", index_name)
+            
+            expiry_date = self.get_expiry_date(index_name)
+            if not expiry_date:
+                logger.error("❌ Failed to get expiry for %s", index_name)
+                return None
+            
+            return self.prepare_option_chain(index_name, expiry_date, range_strikes, index_ltp)
+            
+        except Exception as e:
+            logger.error("❌ Error fetching data for %s: %s", index_name, e)
+            return None
+    
+    def fetch_all_indices_data(self, range_strikes=5, fetched_at=None):
+        """
+        Fetch data for all supported indices
+        
+        Each cycle makes 1 + N API calls for N indices: one getMarketData
+        request covering every index's option contracts plus the index spots,
+        and the per-index optionGreek calls (fetched once per 3-minute bucket),
+        which run concurrently on worker threads. The spots from the previous
+        cycle pick the strikes; a bulk LTP request is only made when they are
+        missing or older than SPOT_REUSE_SECONDS. Results keep INDEX_TOKENS order.
+        
+        fetched_at is the poll's timestamp, passed in by polling loops so every
+        record of a tick shares it; it defaults to now.
+        """
         all_data = []
+        index_names = list(INDEX_TOKENS.keys())
+        fetched_at = fetched_at or datetime.now(self.ist_tz)
+        
+        index_ltps = self._spot_ltps
+        if (time.monotonic() - self._spot_fetched_at > SPOT_REUSE_SECONDS or
+                any(index_name not in index_ltps for index_name in index_names)):
+            index_ltps = self.get_index_ltps_bulk(index_names)
         
-        for index_name in INDEX_TOKENS.keys():
-            data = self.fetch_index_data(index_name, range_strikes)
+        # Strikes and contracts for every index (option tokens depend on the LTP)
+        chains = {}
+        for index_name in index_names:
+            chain = self._prepare_index(index_name, range_strikes, index_ltps.get(index_name))
+            if chain:
+                chains[index_name] = chain
+        
+        if chains:
+            all_contracts = [contract for chain in chains.values() for contract in chain['contracts']]
+            
+            index_tokens = [INDEX_TOKENS[index_name] for index_name in index_names]
+            
+            with ThreadPoolExecutor(max_workers=len(chains) + 1) as executor:
+                market_future = executor.submit(self.get_market_data_for_options, all_contracts, index_tokens)
+                greek_futures = {
+                    index_name: executor.submit(self.get_option_greeks, index_name, chain['expiry_date'])
+                    for index_name, chain in chains.items()
+                }
+                market_data = market_future.result()
+                greeks_by_index = {index_name: future.result() for index_name, future in greek_futures.items()}
+            
+            # Fresh spots from the same response: stored with this cycle's data
+            # and used to pick the next cycle's strikes
+            spot_ltps = {}
+            for index_name in index_names:
+                spot = market_data.get(str(INDEX_TOKENS[index_name]), {}).get('ltp')
+                if spot:
+                    spot_ltps[index_name] = spot
+                    if index_name in chains:
+                        chains[index_name]['index_ltp'] = spot
+            if spot_ltps:
+                self._spot_ltps = spot_ltps
+                self._spot_fetched_at = time.monotonic()
+        
+        for index_name in index_names:
+            data = None
+            if index_name in chains:
+                try:
+                    data = self.assemble_option_chain(
+                        chains[index_name], market_data, greeks_by_index[index_name], fetched_at
+                    )
+                except Exception as e:
+                    logger.error("❌ Error fetching option chain data for %s: %s", index_name, e)
+            
             if data:
                 all_data.append(data)
             else:
-                print(f"⚠️  Failed to fetch data for {index_name}")
-            
-            # Small delay between indices
-            time.sleep(1)
+                logger.warning("⚠️  Failed to fetch data for %s", index_name)
         
         return all_data
 
@@ -346,17 +688,36 @@ class OptionChainFetcher:
             dict: Complete snapshot with raw data ready for Phase 1 tables
         """
         try:
-            print("📊 Fetching complete snapshot for Phase 1 schema...")
+            logger.info("📊 Fetching complete snapshot for Phase 1 schema...")
             
             # Get current timestamp and floor to 3-minute bucket
             current_time = datetime.now(self.ist_tz)
             bucket_ts = self.floor_to_3min(current_time)
             
             # Fetch data for all indices
-            all_indices_data = self.fetch_all_indices_data(range_strikes)
+            all_indices_data = self.fetch_all_indices_data(range_strikes, current_time)
             
+            return self.build_complete_snapshot(all_indices_data, bucket_ts, current_time)
+            
+        except Exception as e:
+            logger.error("❌ Error fetching complete snapshot: %s", e)
+            return None
+    
+    def build_complete_snapshot(self, all_indices_data, bucket_ts, current_time):
+        """
+        Assemble already-fetched index data into the Phase 1 snapshot format
+        
+        Args:
+            all_indices_data: List of per-index results from fetch_index_data
+            bucket_ts: 3-minute bucket timestamp for the snapshot
+            current_time: Time the data was fetched
+            
+        Returns:
+            dict: Complete snapshot with raw data ready for Phase 1 tables
+        """
+        try:
             if not all_indices_data:
-                print("⚠️  No data fetched for any index")
+                logger.warning("⚠️  No data fetched for any index")
                 return None
             
             # Prepare raw data for options_raw_data table
@@ -407,35 +768,36 @@ class OptionChainFetcher:
                     }
                     raw_data_list.append(raw_data)
                     
-                    # Group by strike for historical/live data
-                    if strike not in strikes_data:
-                        strikes_data[strike] = {'CE': {}, 'PE': {}}
-                    
-                    strikes_data[strike][option_type] = {
-                        'oi': option['oi'],
-                        'ltp': option['ltp'],
-                        'volume': option['volume'],
-                        'change_percent': option['change_percent']
-                    }
+                    # Group by strike for historical/live data (the option dict
+                    # already has the oi/ltp/volume/change_percent fields needed)
+                    legs = strikes_data.get(strike)
+                    if legs is None:
+                        legs = strikes_data[strike] = {'CE': {}, 'PE': {}}
+                    legs[option_type] = option
                 
-                # Process strikes data for historical and live tables
-                for strike, strike_data in strikes_data.items():
-                    ce_data = strike_data.get('CE', {})
-                    pe_data = strike_data.get('PE', {})
-                    
-                    # Calculate basic metrics
-                    ce_oi = ce_data.get('oi', 0)
-                    pe_oi = pe_data.get('oi', 0)
-                    total_oi = ce_oi + pe_oi
-                    
-                    # Calculate PCR
-                    pcr = (pe_oi / (ce_oi + 1e-5))
-                    ce_pe_ratio = (ce_oi / (pe_oi + 1e-5))
+                # Per-strike totals and ratios for the whole index in one pass;
+                # a ratio is 0 when its denominator OI is 0
+                strikes = list(strikes_data)
+                ce_oi_arr = np.fromiter((strikes_data[s]['CE'].get('oi', 0) for s in strikes), dtype=np.int64, count=len(strikes))
+                pe_oi_arr = np.fromiter((strikes_data[s]['PE'].get('oi', 0) for s in strikes), dtype=np.int64, count=len(strikes))
+                total_oi_arr = ce_oi_arr + pe_oi_arr
+                pcr_arr = np.divide(pe_oi_arr, ce_oi_arr, out=np.zeros(len(strikes)), where=ce_oi_arr > 0)
+                ce_pe_ratio_arr = np.divide(ce_oi_arr, pe_oi_arr, out=np.zeros(len(strikes)), where=pe_oi_arr > 0)
+                
+                # Process strikes data for historical and live tables (tolist()
+                # hands plain Python numbers to the DB driver)
+                for strike, ce_oi, pe_oi, total_oi, pcr, ce_pe_ratio in zip(
+                    strikes, ce_oi_arr.tolist(), pe_oi_arr.tolist(), total_oi_arr.tolist(),
+                    pcr_arr.tolist(), ce_pe_ratio_arr.tolist()
+                ):
+                    ce_data = strikes_data[strike]['CE']
+                    pe_data = strikes_data[strike]['PE']
+                    strike_symbol = f"{index_name}{strike}"
                     
                     # Prepare historical data record
                     historical_data = {
                         'bucket_ts': bucket_ts,
-                        'trading_symbol': f"{index_name}{strike}",
+                        'trading_symbol': strike_symbol,
                         'strike': strike,
                         'ce_oi': ce_oi,
                         'pe_oi': pe_oi,
@@ -467,7 +829,7 @@ class OptionChainFetcher:
                     # Prepare live data record (simplified version)
                     live_data = {
                         'bucket_ts': bucket_ts,
-                        'trading_symbol': f"{index_name}{strike}",
+                        'trading_symbol': strike_symbol,
                         'strike': strike,
                         'ce_oi': ce_oi,
                         'pe_oi': pe_oi,
@@ -482,36 +844,33 @@ class OptionChainFetcher:
             complete_snapshot = {
                 'bucket_ts': bucket_ts,
                 'raw_data': raw_data_list,
+                # Contract order and OI as an array, for should_store_snapshot's compare
+                # (uint32, the width of the option_snapshots OI columns)
+                'symbols': tuple(raw_data['trading_symbol'] for raw_data in raw_data_list),
+                'oi_vector': np.fromiter((raw_data['oi'] for raw_data in raw_data_list), dtype=np.uint32, count=len(raw_data_list)),
                 'historical_data': historical_data_list,
                 'live_data': live_data_list,
                 'timestamp': current_time
             }
             
-            print(f"✅ Complete snapshot prepared:")
-            print(f"   - Raw data records: {len(raw_data_list)}")
-            print(f"   - Historical data records: {len(historical_data_list)}")
-            print(f"   - Live data records: {len(live_data_list)}")
+            logger.info("✅ Complete snapshot prepared:")
+            logger.info("   - Raw data records: %s", len(raw_data_list))
+            logger.info("   - Historical data records: %s", len(historical_data_list))
+            logger.info("   - Live data records: %s", len(live_data_list))
             
             return complete_snapshot
             
         except Exception as e:
-            print(f"❌ Error fetching complete snapshot: {str(e)}")
+            logger.error("❌ Error building complete snapshot: %s", e)
             return None
     
     def floor_to_3min(self, timestamp):
-        """Floor timestamp to the nearest 3-minute bucket"""
-        # Convert to minutes since midnight, floor to 3-minute intervals
-        minutes_since_midnight = timestamp.hour * 60 + timestamp.minute
-        floored_minutes = (minutes_since_midnight // 3) * 3
-        
-        # Ensure floored_minutes is within valid range (0-59)
-        if floored_minutes >= 60:
-            # Handle edge case where floored_minutes could be 60
-            floored_minutes = 57  # Last valid 3-minute interval
-        
-        # Create new timestamp with floored minutes
-        floored_time = timestamp.replace(minute=floored_minutes, second=0, microsecond=0)
-        return floored_time
+        """Floor timestamp to the start of its 3-minute bucket"""
+        # 3 divides 60, so buckets align with the hour and only the minute
+        # remainder (plus seconds) needs subtracting
+        return timestamp - timedelta(
+            minutes=timestamp.minute % 3, seconds=timestamp.second, microseconds=timestamp.microsecond
+        )
     
     def get_index_candle_data(self, index_name, bucket_time):
         """Get 3-minute candle data for the index using getCandleData"""
@@ -524,7 +883,7 @@ class OptionChainFetcher:
             from_time = bucket_time.strftime('%d-%m-%Y %H:%M')
             to_time = (bucket_time + timedelta(minutes=3)).strftime('%d-%m-%Y %H:%M')
             
-            print(f"📊 Fetching candle data for {index_name} from {from_time} to {to_time}")
+            logger.debug("📊 Fetching candle data for %s from %s to %s", index_name, from_time, to_time)
             
             # Get candle data using getCandleData API
             candle_params = {
@@ -535,7 +894,7 @@ class OptionChainFetcher:
                 "todate": to_time
             }
             
-            response = self.smart_api.getCandleData(candle_params)
+            response = self._get_candle_data(candle_params)
             
             if response['status'] and 'data' in response and response['data']:
                 # Get the first (and should be only) candle for this 3-minute period
@@ -549,16 +908,48 @@ class OptionChainFetcher:
                     'volume': int(candle.get('volume', 0))
                 }
                 
-                print(f"✅ Candle data for {index_name}: O={candle_data['open']}, H={candle_data['high']}, L={candle_data['low']}, C={candle_data['close']}")
+                logger.debug("✅ Candle data for %s: O=%s, H=%s, L=%s, C=%s", index_name,
+                             candle_data['open'], candle_data['high'], candle_data['low'], candle_data['close'])
                 return candle_data
             else:
-                print(f"⚠️  No candle data received for {index_name}: {response.get('message', 'Unknown error')}")
+                logger.warning("⚠️  No candle data received for %s: %s", index_name, response.get('message', 'Unknown error'))
                 return None
                 
         except Exception as e:
-            print(f"❌ Error getting candle data for {index_name}: {str(e)}")
+            logger.error("❌ Error getting candle data for %s: %s", index_name, e)
             return None
     
+    def get_index_candles_bulk(self, index_names, bucket_time):
+        """
+        Fetch 3-minute candles for several indices concurrently
+        
+        Returns {index_name: candle_data or None}; CANDLE_LIMITER keeps the
+        parallel requests within Angel's getCandleData cap.
+        """
+        if not index_names:
+            return {}
+        
+        with ThreadPoolExecutor(max_workers=len(index_names)) as executor:
+            futures = {
+                index_name: executor.submit(self.get_index_candle_data, index_name, bucket_time)
+                for index_name in index_names
+            }
+            return {index_name: future.result() for index_name, future in futures.items()}
+    
+    def _cached_candle(self, key):
+        """Candle for (index_name, bucket epoch) if cached, marking it recently used"""
+        candle_data = self._candle_cache.get(key)
+        if candle_data is not None:
+            self._candle_cache.move_to_end(key)
+        return candle_data
+    
+    def _cache_candle(self, key, candle_data):
+        """Cache a candle, evicting the least recently used beyond CANDLE_CACHE_SIZE"""
+        self._candle_cache[key] = candle_data
+        self._candle_cache.move_to_end(key)
+        if len(self._candle_cache) > CANDLE_CACHE_SIZE:
+            self._candle_cache.popitem(last=False)
+    
     def detect_oi_changes(self, current_data, trading_symbol):
         """Detect OI changes compared to previous snapshot"""
         if trading_symbol not in self.last_snapshot:
@@ -578,10 +969,8 @@ class OptionChainFetcher:
         """Update in-memory last snapshot"""
         self.last_snapshot[trading_symbol] = snapshot_data
     
-    def should_save_snapshot(self, trading_symbol, current_time):
-        """Determine if we should save a snapshot based on OI changes and bucket time"""
-        bucket_time = self.floor_to_3min(current_time)
-        
+    def should_save_snapshot(self, trading_symbol, bucket_time):
+        """Determine if we should save a snapshot based on the 3-minute bucket (already floored)"""
         # Check if bucket has changed
         if trading_symbol not in self.last_saved_bucket:
             self.last_saved_bucket[trading_symbol] = bucket_time
@@ -595,129 +984,128 @@ class OptionChainFetcher:
     
     def start_live_poll(self):
         """Start the adaptive polling loop with 20-second intervals"""
-        print(f"🔄 Starting adaptive polling loop (20-second intervals)")
-        print(f"📊 Refresh window: {REFRESH_WINDOW}s, Poll frequency: {POLL_FREQUENCY}s")
+        logger.info("🔄 Starting adaptive polling loop (20-second intervals)")
+        logger.info("📊 Refresh window: %ss, Poll frequency: %ss", REFRESH_WINDOW, POLL_FREQUENCY)
         
-        candle_cache = {}  # Cache candle data to avoid repeated API calls
         last_candle_fetch = {}  # Track last candle fetch time per index
         
+        # Inserts run on a writer thread so the next fetch overlaps the DB write
+        write_queue = queue.Queue(maxsize=WRITE_QUEUE_DEPTH)
+        writer = threading.Thread(target=self._snapshot_writer, args=(write_queue,), name='snapshot-writer', daemon=True)
+        writer.start()
+        
         while True:
             try:
                 current_time = datetime.now(self.ist_tz)
                 bucket_time = self.floor_to_3min(current_time)
-                print(f"\n🔄 Polling at {current_time.strftime('%H:%M:%S')} (bucket: {bucket_time.strftime('%H:%M:%S')})")
+                logger.info("\n🔄 Polling at %s (bucket: %s)", current_time.strftime('%H:%M:%S'), bucket_time.strftime('%H:%M:%S'))
                 
                 # Fetch data for all indices
-                all_data = self.fetch_all_indices_data(range_strikes=5)
+                all_data = self.fetch_all_indices_data(range_strikes=5, fetched_at=current_time)
                 
                 if all_data:
+                    # Get candle data once per index per 3-minute bucket (with rate limiting).
+                    # Only fetch candle data if we haven't cached it and it's been at least
+                    # 30 seconds; the due indices are fetched concurrently.
+                    bucket_epoch = int(bucket_time.timestamp())
+                    due_indices = [
+                        index_data['index_name'] for index_data in all_data
+                        if (index_data['index_name'], bucket_epoch) not in self._candle_cache and
+                        (index_data['index_name'] not in last_candle_fetch or
+                         (current_time - last_candle_fetch[index_data['index_name']]).total_seconds() > 30)
+                    ]
+                    fetched_candles = self.get_index_candles_bulk(due_indices, bucket_time)
+                    
+                    pending_snapshots = []
+                    
                     # Process each index data
                     for index_data in all_data:
                         index_name = index_data['index_name']
                         index_ltp = index_data['index_ltp']  # Use index LTP as fallback
                         options = index_data['options']
                         
-                        # Get candle data once per index per 3-minute bucket (with rate limiting)
                         candle_data = None
-                        candle_cache_key = f"{index_name}_{bucket_time.strftime('%H:%M')}"
-                        
-                        # Only fetch candle data if we haven't cached it and it's been at least 30 seconds
-                        should_fetch_candle = (
-                            candle_cache_key not in candle_cache and 
-                            (index_name not in last_candle_fetch or 
-                             (current_time - last_candle_fetch[index_name]).total_seconds() > 30)
-                        )
+                        candle_cache_key = (index_name, bucket_epoch)
                         
-                        if should_fetch_candle:
+                        if index_name in fetched_candles:
                             try:
-                                candle_data = self.get_index_candle_data(index_name, bucket_time)
+                                candle_data = fetched_candles[index_name]
                                 if candle_data:
-                                    candle_cache[candle_cache_key] = candle_data
                                     last_candle_fetch[index_name] = current_time
-                                    # Keep cache size manageable
-                                    if len(candle_cache) > 20:
-                                        # Remove oldest entries
-                                        oldest_key = next(iter(candle_cache))
-                                        del candle_cache[oldest_key]
                                 else:
                                     # If candle data fails, use index LTP as fallback
                                     candle_data = {'close': index_ltp}
-                                    candle_cache[candle_cache_key] = candle_data
                             except Exception as e:
-                                print(f"⚠️  Candle data fetch failed for {index_name}: {str(e)}")
+                                logger.warning("⚠️  Candle data fetch failed for %s: %s", index_name, e)
                                 # Use index LTP as fallback
                                 candle_data = {'close': index_ltp}
-                                candle_cache[candle_cache_key] = candle_data
+                            self._cache_candle(candle_cache_key, candle_data)
                         else:
-                            candle_data = candle_cache.get(candle_cache_key, {'close': index_ltp})
+                            candle_data = self._cached_candle(candle_cache_key) or {'close': index_ltp}
                         
-                        # Group options by strike for processing
+                        # Group options into one snapshot dict per strike
                         strikes_data = {}
                         for option in options:
                             strike = option['strike']
-                            option_type = option['type']
-                            
-                            if strike not in strikes_data:
-                                strikes_data[strike] = {'CE': {}, 'PE': {}}
-                            
-                            strikes_data[strike][option_type] = {
-                                'oi': option.get('oi', 0),
-                                'ltp': option.get('ltp', 0)
-                            }
+                            current_snapshot = strikes_data.get(strike)
+                            if current_snapshot is None:
+                                current_snapshot = strikes_data[strike] = {'ce_oi': 0, 'pe_oi': 0, 'ce_ltp': 0, 'pe_ltp': 0}
+                            oi_key, ltp_key = OPTION_SNAPSHOT_KEYS[option['type']]
+                            current_snapshot[oi_key] = option.get('oi', 0)
+                            current_snapshot[ltp_key] = option.get('ltp', 0)
+                        
+                        # Use candle close price or index LTP as fallback
+                        close_price = candle_data.get('close', index_ltp)
+                        symbols = self._strike_symbols.setdefault(index_name, {})
                         
                         # Process each strike
-                        for strike, strike_data in strikes_data.items():
-                            trading_symbol = f"{index_name}{strike}"
-                            
-                            # Prepare current snapshot data
-                            current_snapshot = {
-                                'ce_oi': strike_data.get('CE', {}).get('oi', 0),
-                                'pe_oi': strike_data.get('PE', {}).get('oi', 0),
-                                'ce_ltp': strike_data.get('CE', {}).get('ltp', 0),
-                                'pe_ltp': strike_data.get('PE', {}).get('ltp', 0)
-                            }
+                        for strike, current_snapshot in strikes_data.items():
+                            trading_symbol = symbols.get(strike)
+                            if trading_symbol is None:
+                                trading_symbol = symbols[strike] = snapshot_symbol(index_name, strike)
                             
                             # Check if we should save snapshot
-                            if self.should_save_snapshot(trading_symbol, current_time):
-                                # Use candle close price or index LTP as fallback
-                                close_price = candle_data.get('close', index_ltp)
-                                
-                                # Prepare snapshot for storage
-                                snapshot_data = {
-                                    'bucket_ts': bucket_time,
-                                    'trading_symbol': trading_symbol,
-                                    'option_type': 'XX',  # Placeholder, will be set per option
-                                    'strike': strike,
-                                    'ce_oi': current_snapshot['ce_oi'],
-                                    'ce_price_close': close_price,
-                                    'pe_oi': current_snapshot['pe_oi'],
-                                    'pe_price_close': close_price
-                                }
-                                
-                                # Store CE option
-                                ce_snapshot = snapshot_data.copy()
-                                ce_snapshot['option_type'] = 'CE'
-                                if self.insert_snapshot(ce_snapshot):
-                                    print(f"✅ Saved CE snapshot for {trading_symbol} at {bucket_time.strftime('%H:%M:%S')}")
-                                
-                                # Store PE option
-                                pe_snapshot = snapshot_data.copy()
-                                pe_snapshot['option_type'] = 'PE'
-                                if self.insert_snapshot(pe_snapshot):
-                                    print(f"✅ Saved PE snapshot for {trading_symbol} at {bucket_time.strftime('%H:%M:%S')}")
+                            if self.should_save_snapshot(trading_symbol, bucket_time):
+                                # Queue CE and PE rows; written together after all indices
+                                ce_oi, pe_oi = current_snapshot['ce_oi'], current_snapshot['pe_oi']
+                                pending_snapshots.append(Snapshot(bucket_time, trading_symbol, 'CE', strike, ce_oi, close_price, pe_oi, close_price))
+                                pending_snapshots.append(Snapshot(bucket_time, trading_symbol, 'PE', strike, ce_oi, close_price, pe_oi, close_price))
                                 
                                 # Update last snapshot
                                 self.update_last_snapshot(trading_symbol, current_snapshot)
+                    
+                    # One batched insert per poll, handed to the writer thread
+                    if pending_snapshots:
+                        write_queue.put((bucket_time, pending_snapshots))
                 
-                # Wait for next polling interval
-                time.sleep(POLL_FREQUENCY)
+                # Wake on the next POLL_FREQUENCY boundary of the clock rather than a
+                # fixed sleep after variable-length work, so polls don't drift and
+                # each 3-minute bucket is polled right as it opens
+                time.sleep(POLL_FREQUENCY - time.time() % POLL_FREQUENCY)
                 
             except KeyboardInterrupt:
-                print("\n🛑 Polling stopped by user")
+                logger.info("\n🛑 Polling stopped by user")
                 break
             except Exception as e:
-                print(f"❌ Error in polling loop: {str(e)}")
+                logger.error("❌ Error in polling loop: %s", e)
                 time.sleep(5)  # Short delay on error
+        
+        # Let the writer finish queued batches before returning
+        write_queue.put(None)
+        writer.join()
+    
+    def _snapshot_writer(self, write_queue):
+        """Insert queued (bucket_time, snapshots) batches until a None sentinel arrives"""
+        while True:
+            batch = write_queue.get()
+            if batch is None:
+                break
+            bucket_time, snapshots = batch
+            if self.insert_snapshots(snapshots):
+                logger.info("✅ Saved %s snapshots at %s", len(snapshots), bucket_time.strftime('%H:%M:%S'))
+        
+        # Aggregate the hour that was still open when polling stopped
+        refresh_strike_hourly(include_current=True)
     
     def insert_snapshot(self, snapshot_data):
         """Insert a single snapshot into the database"""
@@ -726,153 +1114,172 @@ class OptionChainFetcher:
             from store_option_data_mysql import insert_snapshot
             return insert_snapshot(snapshot_data)
         except Exception as e:
-            print(f"❌ Error inserting snapshot: {str(e)}")
+            logger.error("❌ Error inserting snapshot: %s", e)
+            return False
+    
+    def insert_snapshots(self, snapshot_list):
+        """Insert several snapshots into the database in one batch"""
+        try:
+            # Import here to avoid circular imports
+            from store_option_data_mysql import insert_snapshots
+            return insert_snapshots(snapshot_list)
+        except Exception as e:
+            logger.error("❌ Error inserting snapshots: %s", e)
             return False
 
 # --- Begin OIAnalysis class (moved from backup_old_files/oi_analysis.py) ---
 from datetime import datetime, timedelta
-import pytz
-from store_option_data_mysql import MySQLOptionDataStore
+from store_option_data_mysql import MySQLOptionDataStore, Snapshot, oi_vector_changed, snapshot_symbol, refresh_strike_hourly
 
-def safe_float(val):
-    try:
-        if isinstance(val, (int, float)):
-            return float(val)
-        if isinstance(val, str):
-            return float(val)
-        if hasattr(val, '__float__'):
-            return float(val)
-    except Exception:
-        pass
-    return 0.0
+# Bucket-to-bucket changes per symbol, computed by MySQL 8 window functions.
+# NULL columns count as 0 and each symbol's first bucket in the range has no
+# previous row, so it is skipped; pct changes are 0 when the previous OI is 0.
+# OI is cast to SIGNED first: the columns are INT UNSIGNED, and an unsigned
+# subtraction that goes negative (falling OI) is an out-of-range error
+OI_CHANGES_SQL = '''SELECT trading_symbol, bucket_ts, ce_oi - prev_ce_oi, pe_oi - prev_pe_oi, CASE WHEN prev_ce_oi > 0 THEN 100.0 * (ce_oi - prev_ce_oi) / prev_ce_oi ELSE 0 END, CASE WHEN prev_pe_oi > 0 THEN 100.0 * (pe_oi - prev_pe_oi) / prev_pe_oi ELSE 0 END, ce_price - prev_ce_price, pe_price - prev_pe_price, ce_oi, pe_oi, ce_price, pe_price FROM (SELECT trading_symbol, bucket_ts, CAST(COALESCE(ce_oi, 0) AS SIGNED) AS ce_oi, CAST(COALESCE(pe_oi, 0) AS SIGNED) AS pe_oi, COALESCE(ce_price_close, 0) AS ce_price, COALESCE(pe_price_close, 0) AS pe_price, LAG(CAST(COALESCE(ce_oi, 0) AS SIGNED)) OVER w AS prev_ce_oi, LAG(CAST(COALESCE(pe_oi, 0) AS SIGNED)) OVER w AS prev_pe_oi, LAG(COALESCE(ce_price_close, 0)) OVER w AS prev_ce_price, LAG(COALESCE(pe_price_close, 0)) OVER w AS prev_pe_price FROM option_snapshots WHERE {where} AND bucket_ts BETWEEN %s AND %s WINDOW w AS (PARTITION BY trading_symbol ORDER BY bucket_ts)) AS changes WHERE prev_ce_oi IS NOT NULL ORDER BY trading_symbol, bucket_ts'''
+SYMBOL_OI_CHANGES_SQL = OI_CHANGES_SQL.format(where="trading_symbol = %s")
+# Whole hours come from the option_strike_hourly aggregates; the partial hours at
+# either end of the window, and whole hours not aggregated yet ({raw_ranges}),
+# come from option_snapshots
+STRIKE_HOURS_SQL = '''SELECT DISTINCT hour_ts FROM option_strike_hourly WHERE index_prefix = %s AND hour_ts >= %s AND hour_ts < %s'''
+STRIKE_RAW_RANGE_SQL = "(bucket_ts >= %s AND bucket_ts < %s)"
+STRIKE_ANALYSIS_SQL = '''SELECT trading_symbol, option_type, strike, MAX(max_ce_oi) as max_ce_oi, MIN(min_ce_oi) as min_ce_oi, MAX(max_pe_oi) as max_pe_oi, MIN(min_pe_oi) as min_pe_oi, SUM(sum_ce_oi) / SUM(data_points) as avg_ce_oi, SUM(sum_pe_oi) / SUM(data_points) as avg_pe_oi, SUM(data_points) as data_points FROM (SELECT trading_symbol, option_type, strike, max_ce_oi, min_ce_oi, max_pe_oi, min_pe_oi, sum_ce_oi, sum_pe_oi, data_points FROM option_strike_hourly WHERE index_prefix = %s AND hour_ts >= %s AND hour_ts < %s UNION ALL SELECT trading_symbol, option_type, strike, ce_oi, ce_oi, pe_oi, pe_oi, ce_oi, pe_oi, 1 FROM option_snapshots WHERE index_prefix = %s AND ({raw_ranges} OR (bucket_ts >= %s AND bucket_ts <= %s))) AS parts GROUP BY trading_symbol, option_type, strike ORDER BY strike'''
+CE_PE_RATIO_SQL = '''SELECT bucket_ts, trading_symbol, strike, ce_oi, pe_oi, CASE WHEN pe_oi > 0 THEN ce_oi / pe_oi ELSE NULL END as ce_pe_ratio, CASE WHEN ce_oi > 0 THEN pe_oi / ce_oi ELSE NULL END as pe_ce_ratio FROM option_snapshots WHERE index_prefix = %s AND bucket_ts BETWEEN %s AND %s ORDER BY bucket_ts, strike'''
+# Latest bucket per symbol in one pass over the (trading_symbol, bucket_ts) key
+OI_SUMMARY_SQL = '''SELECT trading_symbol, option_type, strike, ce_oi, pe_oi, ce_price_close, pe_price_close FROM (SELECT trading_symbol, option_type, strike, ce_oi, pe_oi, ce_price_close, pe_price_close, ROW_NUMBER() OVER (PARTITION BY trading_symbol ORDER BY bucket_ts DESC) AS rn FROM option_snapshots WHERE index_prefix = %s AND bucket_ts >= %s) AS latest WHERE rn = 1 ORDER BY strike, option_type'''
+OI_CHANGE_FIELDS = ('ce_oi_change', 'pe_oi_change', 'ce_oi_pct_change', 'pe_oi_pct_change', 'ce_price_change', 'pe_price_change', 'ce_oi', 'pe_oi', 'ce_price', 'pe_price')
 
 class OIAnalysis:
     def __init__(self):
-        self.ist_tz = pytz.timezone('Asia/Kolkata')
+        self.ist_tz = IST
         self.store = MySQLOptionDataStore()
-    def get_oi_changes(self, trading_symbol, start_time=None, end_time=None):
+    def _query(self, sql, params):
+        """Rows for a SELECT, or None without a connection; the connection is always returned to the pool"""
+        connection = self.store.get_connection()
+        if connection is None:
+            return None
         try:
-            connection = self.store.get_connection()
-            if connection is None:
-                return None
-            if start_time is None:
-                start_time = datetime.now(self.ist_tz) - timedelta(days=1)
-            if end_time is None:
-                end_time = datetime.now(self.ist_tz)
-            cursor = connection.cursor()
-            cursor.execute('''SELECT bucket_ts, ce_oi, pe_oi, ce_price_close, pe_price_close FROM option_snapshots WHERE trading_symbol = %s AND bucket_ts BETWEEN %s AND %s ORDER BY bucket_ts''', (trading_symbol, start_time, end_time))
-            records = cursor.fetchall()
+            # Server-side prepared: the constant SQL is sent once and params go over the binary protocol
+            cursor = connection.cursor(prepared=True)
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+        finally:
+            connection.close()
+    def _stream(self, sql, params):
+        """Yield a SELECT's rows one at a time from an unbuffered cursor; nothing without a connection"""
+        connection = self.store.get_connection()
+        if connection is None:
+            return
+        try:
+            cursor = connection.cursor(prepared=True)
+            cursor.execute(sql, params)
+            yield from iter(cursor.fetchone, None)
+        finally:
             connection.close()
+    def _whole_hours(self, start_time, end_time):
+        """[first, last) span of whole hours inside the window; (end, end) if there are none"""
+        first_hour = start_time.replace(minute=0, second=0, microsecond=0)
+        if first_hour < start_time:
+            first_hour += timedelta(hours=1)
+        last_hour = end_time.replace(minute=0, second=0, microsecond=0)
+        if first_hour >= last_hour:
+            return end_time, end_time
+        return first_hour, last_hour
+    def _window(self, start_time, end_time):
+        """(start, end) defaulting to the last day up to now"""
+        now = datetime.now(self.ist_tz)
+        return (now - timedelta(days=1) if start_time is None else start_time,
+                now if end_time is None else end_time)
+    def get_oi_changes(self, trading_symbol, start_time=None, end_time=None):
+        try:
+            start_time, end_time = self._window(start_time, end_time)
+            records = self._query(SYMBOL_OI_CHANGES_SQL, (trading_symbol, start_time, end_time))
             if not records:
                 return None
-            changes = []
-            for i in range(1, len(records)):
-                prev_record = records[i-1]
-                curr_record = records[i]
-                try:
-                    # Unpack tuples for clarity and type safety
-                    (_, prev_ce_oi, prev_pe_oi, prev_ce_price, prev_pe_price, *_) = prev_record
-                    (_, curr_ce_oi, curr_pe_oi, curr_ce_price, curr_pe_price, *_) = curr_record
-                    ce_oi_change = safe_float(curr_ce_oi) - safe_float(prev_ce_oi)
-                    pe_oi_change = safe_float(curr_pe_oi) - safe_float(prev_pe_oi)
-                    ce_price_change = safe_float(curr_ce_price) - safe_float(prev_ce_price)
-                    pe_price_change = safe_float(curr_pe_price) - safe_float(prev_pe_price)
-                    ce_oi_pct_change = (ce_oi_change / safe_float(prev_ce_oi) * 100) if safe_float(prev_ce_oi) > 0 else 0
-                    pe_oi_pct_change = (pe_oi_change / safe_float(prev_pe_oi) * 100) if safe_float(prev_pe_oi) > 0 else 0
-                    changes.append({
-                        'timestamp': curr_record[0],
-                        'ce_oi_change': ce_oi_change,
-                        'pe_oi_change': pe_oi_change,
-                        'ce_oi_pct_change': ce_oi_pct_change,
-                        'pe_oi_pct_change': pe_oi_pct_change,
-                        'ce_price_change': ce_price_change,
-                        'pe_price_change': pe_price_change,
-                        'ce_oi': safe_float(curr_ce_oi),
-                        'pe_oi': safe_float(curr_pe_oi),
-                        'ce_price': safe_float(curr_ce_price),
-                        'pe_price': safe_float(curr_pe_price)
-                    })
-                except Exception as e:
-                    print(f"⚠️  Error processing record {i}: {str(e)}")
-                    continue
-            return changes
+            return [self._change_row(record) for record in records]
         except Exception as e:
-            print(f"❌ Error getting OI changes: {str(e)}")
+            logger.error("❌ Error getting OI changes: %s", e)
             return None
-    def get_strike_analysis(self, index_name, start_time=None, end_time=None):
+    def get_oi_changes_bulk(self, trading_symbols, start_time=None, end_time=None):
+        """OI changes for several symbols with one query; returns {trading_symbol: changes}"""
         try:
-            connection = self.store.get_connection()
-            if connection is None:
+            if not trading_symbols:
+                return {}
+            start_time, end_time = self._window(start_time, end_time)
+            format_strings = ",".join(["%s"] * len(trading_symbols))
+            records = self._query(OI_CHANGES_SQL.format(where=f"trading_symbol IN ({format_strings})"), (*trading_symbols, start_time, end_time))
+            if records is None:
                 return None
-            if start_time is None:
-                start_time = datetime.now(self.ist_tz) - timedelta(days=1)
-            if end_time is None:
-                end_time = datetime.now(self.ist_tz)
-            cursor = connection.cursor()
-            cursor.execute('''SELECT trading_symbol, option_type, strike, MAX(ce_oi) as max_ce_oi, MIN(ce_oi) as min_ce_oi, MAX(pe_oi) as max_pe_oi, MIN(pe_oi) as min_pe_oi, AVG(ce_oi) as avg_ce_oi, AVG(pe_oi) as avg_pe_oi, COUNT(*) as data_points FROM option_snapshots WHERE trading_symbol LIKE %s AND bucket_ts BETWEEN %s AND %s GROUP BY trading_symbol, option_type, strike ORDER BY strike''', (f"{index_name}%", start_time, end_time))
-            records = cursor.fetchall()
-            connection.close()
+            bulk_changes = {}
+            for trading_symbol, symbol_records in groupby(records, key=itemgetter(0)):
+                bulk_changes[trading_symbol] = [self._change_row(record) for record in symbol_records]
+            return bulk_changes
+        except Exception as e:
+            logger.error("❌ Error getting bulk OI changes: %s", e)
+            return None
+    def _change_row(self, record):
+        """Change dict from an OI_CHANGES_SQL row (trading_symbol, bucket_ts, *OI_CHANGE_FIELDS)"""
+        _, timestamp, *values = record
+        return {'timestamp': timestamp, **dict(zip(OI_CHANGE_FIELDS, map(float, values)))}
+    def _raw_ranges(self, index_name, start_time, first_hour, last_hour):
+        """[start, end) option_snapshots ranges before last_hour that option_strike_hourly doesn't cover, adjacent ones merged"""
+        covered_hours = {row[0] for row in self._query(STRIKE_HOURS_SQL, (index_name, first_hour, last_hour)) or ()}
+        ranges = [[start_time, first_hour]]
+        hour = first_hour
+        while hour < last_hour:
+            next_hour = hour + timedelta(hours=1)
+            if hour.replace(tzinfo=None) not in covered_hours:
+                if ranges[-1][1] == hour:
+                    ranges[-1][1] = next_hour
+                else:
+                    ranges.append([hour, next_hour])
+            hour = next_hour
+        return ranges
+    def get_strike_analysis(self, index_name, start_time=None, end_time=None):
+        try:
+            start_time, end_time = self._window(start_time, end_time)
+            first_hour, last_hour = self._whole_hours(start_time, end_time)
+            raw_ranges = self._raw_ranges(index_name, start_time, first_hour, last_hour)
+            sql = STRIKE_ANALYSIS_SQL.format(raw_ranges=" OR ".join([STRIKE_RAW_RANGE_SQL] * len(raw_ranges)))
+            params = (index_name, first_hour, last_hour, index_name, *(bound for raw_range in raw_ranges for bound in raw_range), last_hour, end_time)
+            records = self._query(sql, params)
             if not records:
                 return None
             analysis = {}
-            for record in records:
-                trading_symbol, option_type, strike = record[0], record[1], record[2]
+            for (trading_symbol, option_type, strike, max_ce_oi, min_ce_oi, max_pe_oi, min_pe_oi,
+                 avg_ce_oi, avg_pe_oi, data_points) in records:
                 if strike not in analysis:
                     analysis[strike] = {'strike': strike,'ce': {'max_oi': 0, 'min_oi': 0, 'avg_oi': 0,'current_oi': 0, 'oi_change': 0},'pe': {'max_oi': 0, 'min_oi': 0, 'avg_oi': 0,'current_oi': 0, 'oi_change': 0},'data_points': 0}
                 if option_type == 'CE':
-                    analysis[strike]['ce'].update({'max_oi': record[3],'min_oi': record[4],'avg_oi': record[7]})
+                    analysis[strike]['ce'].update({'max_oi': max_ce_oi,'min_oi': min_ce_oi,'avg_oi': avg_ce_oi})
                 elif option_type == 'PE':
-                    analysis[strike]['pe'].update({'max_oi': record[5],'min_oi': record[6],'avg_oi': record[8]})
-                analysis[strike]['data_points'] = record[9]
+                    analysis[strike]['pe'].update({'max_oi': max_pe_oi,'min_oi': min_pe_oi,'avg_oi': avg_pe_oi})
+                analysis[strike]['data_points'] = data_points
             return analysis
         except Exception as e:
-            print(f"❌ Error getting strike analysis: {str(e)}")
+            logger.error("❌ Error getting strike analysis: %s", e)
             return None
     def get_ce_pe_ratio_analysis(self, index_name, start_time=None, end_time=None):
         try:
-            connection = self.store.get_connection()
-            if connection is None:
-                return None
-            if start_time is None:
-                start_time = datetime.now(self.ist_tz) - timedelta(days=1)
-            if end_time is None:
-                end_time = datetime.now(self.ist_tz)
-            cursor = connection.cursor()
-            cursor.execute('''SELECT bucket_ts, trading_symbol, strike, ce_oi, pe_oi, CASE WHEN pe_oi > 0 THEN ce_oi / pe_oi ELSE NULL END as ce_pe_ratio, CASE WHEN ce_oi > 0 THEN pe_oi / ce_oi ELSE NULL END as pe_ce_ratio FROM option_snapshots WHERE trading_symbol LIKE %s AND bucket_ts BETWEEN %s AND %s ORDER BY bucket_ts, strike''', (f"{index_name}%", start_time, end_time))
-            records = cursor.fetchall()
-            connection.close()
-            if not records:
-                return None
+            start_time, end_time = self._window(start_time, end_time)
+            # One row per bucket per strike; streamed so multi-day windows aren't held twice
             ratio_analysis = {}
-            for record in records:
-                timestamp, trading_symbol, strike = record[0], record[1], record[2]
-                ce_oi, pe_oi = record[3], record[4]
-                ce_pe_ratio, pe_ce_ratio = record[5], record[6]
-                if strike not in ratio_analysis:
-                    ratio_analysis[strike] = []
-                ratio_analysis[strike].append({'timestamp': timestamp,'ce_oi': ce_oi,'pe_oi': pe_oi,'ce_pe_ratio': ce_pe_ratio,'pe_ce_ratio': pe_ce_ratio})
-            return ratio_analysis
+            rows = self._stream(CE_PE_RATIO_SQL, (index_name, start_time, end_time))
+            for timestamp, trading_symbol, strike, ce_oi, pe_oi, ce_pe_ratio, pe_ce_ratio in rows:
+                ratio_analysis.setdefault(strike, []).append({'timestamp': timestamp,'ce_oi': ce_oi,'pe_oi': pe_oi,'ce_pe_ratio': ce_pe_ratio,'pe_ce_ratio': pe_ce_ratio})
+            return ratio_analysis or None
         except Exception as e:
-            print(f"❌ Error getting CE/PE ratio analysis: {str(e)}")
+            logger.error("❌ Error getting CE/PE ratio analysis: %s", e)
             return None
     def get_oi_summary(self, index_name, hours_back=24):
         try:
             end_time = datetime.now(self.ist_tz)
             start_time = end_time - timedelta(hours=hours_back)
-            connection = self.store.get_connection()
-            if connection is None:
-                return None
-            cursor = connection.cursor()
-            cursor.execute('''SELECT trading_symbol, option_type, strike, ce_oi, pe_oi, ce_price_close, pe_price_close FROM option_snapshots WHERE trading_symbol LIKE %s AND bucket_ts >= %s AND bucket_ts = (SELECT MAX(bucket_ts) FROM option_snapshots s2 WHERE s2.trading_symbol = option_snapshots.trading_symbol) ORDER BY strike, option_type''', (f"{index_name}%", start_time))
-            records = cursor.fetchall()
-            connection.close()
+            records = self._query(OI_SUMMARY_SQL, (index_name, start_time))
             if not records:
                 return None
             summary = {'index_name': index_name,'analysis_time': end_time,'hours_back': hours_back,'strikes': {},'total_ce_oi': 0,'total_pe_oi': 0,'pcr': 0}
-            for record in records:
-                trading_symbol, option_type, strike = record[0], record[1], record[2]
-                ce_oi, pe_oi = record[3], record[4]
-                ce_price, pe_price = record[5], record[6]
+            for trading_symbol, option_type, strike, ce_oi, pe_oi, ce_price, pe_price in records:
                 if strike not in summary['strikes']:
                     summary['strikes'][strike] = {'strike': strike,'ce_oi': 0,'pe_oi': 0,'ce_price': 0,'pe_price': 0}
                 if option_type == 'CE':
@@ -887,28 +1294,31 @@ class OIAnalysis:
                 summary['pcr'] = summary['total_pe_oi'] / summary['total_ce_oi']
             return summary
         except Exception as e:
-            print(f"❌ Error getting OI summary: {str(e)}")
+            logger.error("❌ Error getting OI summary: %s", e)
             return None
-    def print_oi_summary(self, index_name, hours_back=24):
-        summary = self.get_oi_summary(index_name, hours_back)
+    def print_oi_summary(self, index_name, hours_back=24, summary=None):
+        """Report the OI summary at INFO; CLI entry points call setup_queue_logging() so it reaches stdout"""
+        if summary is None:
+            summary = self.get_oi_summary(index_name, hours_back)
         if not summary:
-            print(f"❌ No OI summary available for {index_name}")
+            logger.error("❌ No OI summary available for %s", index_name)
             return
-        print(f"\n📊 OI Summary for {index_name}")
-        print("=" * 50)
-        print(f"⏰ Analysis Time: {summary['analysis_time'].strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"📅 Period: Last {summary['hours_back']} hours")
-        print(f"📈 Total CE OI: {summary['total_ce_oi']:,}")
-        print(f"📉 Total PE OI: {summary['total_pe_oi']:,}")
-        print(f"🔄 Put-Call Ratio: {summary['pcr']:.2f}")
-        print(f"\n📋 Strike-wise Analysis:")
-        print("-" * 50)
-        print(f"{'Strike':<8} {'CE OI':<12} {'PE OI':<12} {'CE Price':<10} {'PE Price':<10}")
-        print("-" * 50)
+        logger.info("\n📊 OI Summary for %s", index_name)
+        logger.info("=" * 50)
+        logger.info("⏰ Analysis Time: %s", summary['analysis_time'].strftime('%Y-%m-%d %H:%M:%S'))
+        logger.info("📅 Period: Last %s hours", summary['hours_back'])
+        logger.info("📈 Total CE OI: %s", format(summary['total_ce_oi'], ','))
+        logger.info("📉 Total PE OI: %s", format(summary['total_pe_oi'], ','))
+        logger.info("🔄 Put-Call Ratio: %.2f", summary['pcr'])
+        logger.info("\n📋 Strike-wise Analysis:")
+        logger.info("-" * 50)
+        logger.info("%-8s %-12s %-12s %-10s %-10s", 'Strike', 'CE OI', 'PE OI', 'CE Price', 'PE Price')
+        logger.info("-" * 50)
         for strike in sorted(summary['strikes'].keys()):
             strike_data = summary['strikes'][strike]
-            print(f"{strike:<8} {strike_data['ce_oi']:<12,} {strike_data['pe_oi']:<12,} "
-                  f"{strike_data['ce_price']:<10.2f} {strike_data['pe_price']:<10.2f}")
+            logger.info("%-8s %-12s %-12s %-10.2f %-10.2f",
+                        strike, format(strike_data['ce_oi'], ','), format(strike_data['pe_oi'], ','),
+                        strike_data['ce_price'], strike_data['pe_price'])
 # --- End OIAnalysis class ---
 
 class AdaptivePollingEngine:
@@ -919,13 +1329,14 @@ class AdaptivePollingEngine:
     Now includes real-time CLI dashboard with OI analytics.
     """
     
-    def __init__(self, smart_api, calendar, datastore, analysis_engine=None):
+    def __init__(self, smart_api, calendar, datastore, analysis_engine=None, login_manager=None):
         self.smart_api = smart_api
         self.calendar = calendar
         self.datastore = datastore
         self.analysis_engine = analysis_engine
+        self.login_manager = login_manager
         self.fetcher = OptionChainFetcher(smart_api)
-        self.ist_tz = pytz.timezone('Asia/Kolkata')
+        self.ist_tz = IST
         
         # Polling state
         self.last_poll_time = None
@@ -933,9 +1344,25 @@ class AdaptivePollingEngine:
         self.last_saved_bucket_ts = None
         self.is_running = False
         
+        # Per-index OI fingerprint of the last stored poll
+        self._last_hash = {}
+        
+        # Per-contract (oi, volume, ltp, change) fingerprint of the last raw write
+        self._raw_fingerprints = {}
+        
+        # Adaptive interval: fingerprints of the previous poll and the
+        # loop times of recent polls that saw OI move
+        self._prev_fingerprints = {}
+        self._change_times = deque(maxlen=CHANGE_HISTORY)
+        
+        # Session refresh state; the lock is held while the session is swapped
+        self._session_lock = threading.Lock()
+        self._refresh_timer = None
+        
         # Polling constants
-        self.POLL_FREQ = 20  # seconds
+        self.POLL_FREQ = 20  # seconds, starting interval before it adapts
         self.REFRESH_WINDOW = 30  # seconds
+        self.poll_interval = self.POLL_FREQ
         
         # CLI Dashboard state
         self.last_dashboard_time = None
@@ -963,6 +1390,11 @@ class AdaptivePollingEngine:
             if prev_bucket_ts != bucket_ts:
                 return True
             
+            # Same contracts in the same order: one vectorized OI compare
+            oi_changed = oi_vector_changed(prev_snapshot, new_snapshot)
+            if oi_changed is not None:
+                return oi_changed
+            
             # Check for OI changes in any option
             if 'raw_data' in new_snapshot and 'raw_data' in prev_snapshot:
                 new_raw_data = {item['trading_symbol']: item for item in new_snapshot['raw_data']}
@@ -977,7 +1409,7 @@ class AdaptivePollingEngine:
             return False
             
         except Exception as e:
-            print(f"❌ Error in should_store_snapshot: {str(e)}")
+            logger.error("❌ Error in should_store_snapshot: %s", e)
             return True  # Store on error to be safe
     
     def start_live_poll(self):
@@ -989,86 +1421,304 @@ class AdaptivePollingEngine:
         2. Checks for OI changes and new 3-minute buckets
         3. Stores data only when changes are detected
         4. Updates live tracking table
+        
+        The loop is driven by an asyncio event loop which sleeps until the
+        next scheduled poll instead of waking every second to check.
         """
-        print("🚀 Starting adaptive live polling...")
+        logger.info("🚀 Starting adaptive live polling...")
         self.is_running = True
         
         # Check if it's a new market day and clear live table if needed
         if self.datastore.is_new_market_day():
-            print("📅 New market day detected - clearing live tracking table")
+            logger.info("📅 New market day detected - clearing live tracking table")
             self.datastore.clear_live_tracking()
         
+        # Rotate the session ahead of expiry so no poll stalls on a re-login
+        self._schedule_session_refresh()
+        
         try:
-            while self.is_running and self.calendar.is_market_live_now():
-                current_time = datetime.now(self.ist_tz)
+            asyncio.run(self.polling_loop_async())
+            logger.info("🛑 Adaptive polling stopped")
+            
+        except KeyboardInterrupt:
+            logger.info("🛑 Adaptive polling interrupted by user")
+        except Exception as e:
+            logger.error("❌ Error in adaptive polling: %s", e)
+        finally:
+            self.is_running = False
+            self._cancel_session_refresh()
+    
+    def _schedule_session_refresh(self):
+        """Arm a timer that rotates the session shortly before it expires"""
+        if self.login_manager is None:
+            return
+        
+        self._cancel_session_refresh()
+        self._refresh_timer = threading.Timer(SESSION_TTL - SESSION_REFRESH_MARGIN, self._refresh_session)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+    
+    def _cancel_session_refresh(self):
+        """Cancel a pending session refresh timer"""
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+    
+    def _refresh_session(self):
+        """Refresh the Angel One session and swap it into the fetcher"""
+        if not self.is_running:
+            return
+        
+        with self._session_lock:
+            try:
+                if self.login_manager.refresh_session():
+                    smart_api = self.login_manager.get_smart_api()
+                    self.smart_api = smart_api
+                    self.fetcher.smart_api = smart_api
+                    logger.info("🔑 Polling session refreshed")
+                else:
+                    logger.error("❌ Session refresh failed - keeping current session")
+            except Exception as e:
+                logger.error("❌ Error refreshing session: %s", e)
+        
+        self._schedule_session_refresh()
+    
+    def _wait_for_session(self):
+        """Block while a session refresh is swapping the SmartAPI instance"""
+        with self._session_lock:
+            return self.fetcher.smart_api
+    
+    async def polling_loop_async(self):
+        """
+        Event-loop driven polling, cancellable with Ctrl+C
+        
+        A scheduler task enqueues one poll request per poll_interval into a
+        bounded queue and this loop works through them. If polls fall behind, new
+        requests are dropped once the queue is full and requests that waited
+        past their deadline are skipped, so a slow API never builds a backlog.
+        """
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        
+        # add_signal_handler is not available on Windows event loops; there
+        # KeyboardInterrupt is raised from asyncio.run() instead
+        signal_handler_installed = False
+        try:
+            loop.add_signal_handler(signal.SIGINT, task.cancel)
+            signal_handler_installed = True
+        except (NotImplementedError, RuntimeError):
+            pass
+        
+        poll_queue = asyncio.Queue(maxsize=POLL_QUEUE_DEPTH)
+        scheduler = asyncio.create_task(self._schedule_polls(poll_queue))
+        
+        try:
+            while True:
+                request = await poll_queue.get()
+                if request is None:
+                    break
                 
-                # Check if we should poll now
-                if not self.calendar.should_poll_now(self.last_poll_time):
-                    time.sleep(1)
+                current_time, deadline = request
+                if loop.time() > deadline:
+                    logger.warning("⏭️  Skipping stale poll scheduled at %s", current_time.strftime('%H:%M:%S'))
                     continue
                 
-                print(f"📊 Polling at {current_time.strftime('%H:%M:%S')}")
+                await self._poll_once(current_time)
                 
-                try:
-                    # Fetch complete snapshot
-                    new_snapshot = self.fetcher.fetch_complete_snapshot(range_strikes=5)
-                    
-                    if new_snapshot:
-                        # Get current bucket timestamp
-                        bucket_ts = self.calendar.floor_to_3min(current_time)
-                        
-                        # Check if we should store this snapshot
-                        if self.should_store_snapshot(self.last_snapshot, new_snapshot, bucket_ts):
-                            print(f"💾 Storing snapshot for bucket {bucket_ts.strftime('%H:%M:%S')}")
-                            
-                            # Store raw data
-                            if new_snapshot.get('raw_data'):
-                                self.datastore.insert_raw_data(new_snapshot['raw_data'])
-                            
-                            # Store historical data
-                            if new_snapshot.get('historical_data'):
-                                self.datastore.insert_historical_data(new_snapshot['historical_data'])
-                            
-                            # Store live data (only during live market)
-                            if new_snapshot.get('live_data'):
-                                self.datastore.insert_live_data(new_snapshot['live_data'])
-                            
-                            # Update state
-                            self.last_snapshot = new_snapshot
-                            self.last_saved_bucket_ts = bucket_ts
-                            
-                            print(f"✅ Snapshot stored successfully")
-                            
-                            # Phase 3: Generate and display CLI dashboard
-                            if self.analysis_engine and self.should_update_dashboard(current_time):
-                                self.update_cli_dashboard(bucket_ts)
-                        else:
-                            print(f"⏭️  Skipping snapshot - no significant changes")
-                    else:
-                        print(f"⚠️  No data fetched")
-                    
-                    # Update last poll time
-                    self.last_poll_time = current_time
-                    
-                except Exception as e:
-                    print(f"❌ Error during polling: {str(e)}")
+        except asyncio.CancelledError:
+            logger.info("🛑 Adaptive polling interrupted by user")
+        finally:
+            scheduler.cancel()
+            if signal_handler_installed:
+                loop.remove_signal_handler(signal.SIGINT)
+    
+    async def _schedule_polls(self, poll_queue):
+        """Enqueue a (poll time, deadline) request every poll_interval seconds; None ends polling"""
+        loop = asyncio.get_running_loop()
+        
+        while self.is_running:
+            tick_started = loop.time()
+            current_time = datetime.now(self.ist_tz)
+            if not self.calendar.is_market_live_now(current_time):
+                break
+            
+            # A request not started within one interval is stale
+            try:
+                poll_queue.put_nowait((current_time, tick_started + self.poll_interval))
+            except asyncio.QueueFull:
+                logger.warning("⚠️  Poll queue full - dropping poll at %s", current_time.strftime('%H:%M:%S'))
+            
+            await asyncio.sleep(self._next_wake_delta(tick_started, loop.time()))
+        
+        await poll_queue.put(None)
+    
+    async def _poll_once(self, current_time):
+        """Fetch, filter and store one poll's snapshot"""
+        logger.info("📊 Polling at %s", current_time.strftime('%H:%M:%S'))
+        
+        try:
+            # Don't start a fetch on a session that is being swapped
+            await asyncio.to_thread(self._wait_for_session)
+            
+            # Bulk LTP + one option market-data request + concurrent Greeks,
+            # run off the event loop (SmartAPI calls are blocking)
+            all_indices_data = await asyncio.to_thread(self.fetcher.fetch_all_indices_data, 5, current_time)
+            
+            bucket_ts = self.calendar.floor_to_3min(current_time)
+            
+            # Drop indices whose OI hasn't moved since the last stored poll
+            changed_indices, fingerprints = self._drop_unchanged_indices(all_indices_data, bucket_ts)
+            self._adapt_poll_interval(fingerprints, asyncio.get_running_loop().time())
+            if all_indices_data and not changed_indices:
+                logger.info("⏭️  Skipping snapshot - OI unchanged since last poll")
+            else:
+                new_snapshot = self.fetcher.build_complete_snapshot(changed_indices, bucket_ts, current_time)
                 
-                # Sleep for polling interval
-                time.sleep(self.POLL_FREQ)
+                if new_snapshot:
+                    stored = await asyncio.to_thread(self.process_snapshot, new_snapshot, bucket_ts, current_time)
+                    if stored:
+                        self._last_hash.update(fingerprints)
+                else:
+                    logger.warning("⚠️  No data fetched")
             
-            print("🛑 Adaptive polling stopped")
+            # Update last poll time
+            self.last_poll_time = current_time
             
-        except KeyboardInterrupt:
-            print("🛑 Adaptive polling interrupted by user")
         except Exception as e:
-            print(f"❌ Error in adaptive polling: {str(e)}")
-        finally:
-            self.is_running = False
+            logger.error("❌ Error during polling: %s", e)
+    
+    def _oi_fingerprint(self, index_data):
+        """Hash of (strike, type, oi) across an index's options"""
+        return hash(tuple(
+            (option['strike'], option['type'], option['oi']) for option in index_data['options']
+        ))
+    
+    def _drop_unchanged_indices(self, all_indices_data, bucket_ts):
+        """
+        Filter out indices whose OI fingerprint matches the last stored poll
+        
+        Unchanged indices are only dropped inside the bucket that was last
+        saved, so every new 3-minute bucket is still written once.
+        
+        Returns:
+            tuple: (changed index data list, {index_name: fingerprint})
+        """
+        fingerprints = {}
+        changed_indices = []
+        same_bucket = bucket_ts == self.last_saved_bucket_ts
+        
+        for index_data in all_indices_data:
+            index_name = index_data['index_name']
+            fingerprint = self._oi_fingerprint(index_data)
+            fingerprints[index_name] = fingerprint
+            
+            if same_bucket and self._last_hash.get(index_name) == fingerprint:
+                continue
+            changed_indices.append(index_data)
+        
+        return changed_indices, fingerprints
+    
+    def _adapt_poll_interval(self, fingerprints, now):
+        """
+        Retune poll_interval from how often OI has been changing
+        
+        The expected gap between changes is the mean gap over the last
+        CHANGE_HISTORY changes, or the time since the last change if that is
+        longer (a lull). Polling every half gap keeps detection latency low
+        when OI moves fast and saves API calls when it doesn't.
+        """
+        if not fingerprints:
+            return
+        
+        if self._prev_fingerprints and fingerprints != self._prev_fingerprints:
+            self._change_times.append(now)
+        self._prev_fingerprints = fingerprints
+        
+        if len(self._change_times) < 2:
+            return
+        
+        mean_gap = (self._change_times[-1] - self._change_times[0]) / (len(self._change_times) - 1)
+        expected_gap = max(mean_gap, now - self._change_times[-1])
+        self.poll_interval = min(MAX_POLL_INTERVAL, max(MIN_POLL_INTERVAL, expected_gap / 2))
+    
+    def _next_wake_delta(self, poll_started, now):
+        """
+        Seconds to sleep so polls start poll_interval apart regardless of fetch time
+        
+        The wakeup is pulled in to the next 3-minute bucket boundary when that
+        comes first, so every bucket is polled as it opens whatever the interval.
+        """
+        bucket_left = BUCKET_SECONDS - time.time() % BUCKET_SECONDS
+        return max(0.0, min(self.poll_interval - (now - poll_started), bucket_left))
+    
+    def process_snapshot(self, new_snapshot, bucket_ts, current_time):
+        """
+        Store a fetched snapshot if it changed and refresh the CLI dashboard
+        
+        Returns:
+            bool: True if the snapshot was stored, False if it was skipped
+        """
+        # Check if we should store this snapshot
+        if self.should_store_snapshot(self.last_snapshot, new_snapshot, bucket_ts):
+            logger.info("💾 Storing snapshot for bucket %s", bucket_ts.strftime('%H:%M:%S'))
+            
+            # Store raw data (only contracts that moved, within the same bucket)
+            if new_snapshot.get('raw_data'):
+                raw_rows, raw_fingerprints = self._changed_raw_rows(new_snapshot['raw_data'], bucket_ts)
+                if raw_rows and self.datastore.insert_raw_data(raw_rows):
+                    if bucket_ts != self.last_saved_bucket_ts:
+                        self._raw_fingerprints = {}
+                    self._raw_fingerprints.update(raw_fingerprints)
+            
+            # Store historical data
+            if new_snapshot.get('historical_data'):
+                self.datastore.insert_historical_data(new_snapshot['historical_data'])
+            
+            # Store live data (only during live market)
+            if new_snapshot.get('live_data'):
+                self.datastore.insert_live_data(new_snapshot['live_data'])
+            
+            # Update state
+            self.last_snapshot = new_snapshot
+            self.last_saved_bucket_ts = bucket_ts
+            
+            logger.info("✅ Snapshot stored successfully")
+            
+            # Phase 3: Generate and display CLI dashboard
+            if self.analysis_engine and self.should_update_dashboard(current_time):
+                self.update_cli_dashboard(bucket_ts)
+            return True
+        
+        logger.info("⏭️  Skipping snapshot - no significant changes")
+        return False
+    
+    def _changed_raw_rows(self, raw_data, bucket_ts):
+        """
+        Raw rows whose (oi, volume, ltp, change) moved since the last raw write
+        
+        Every row is kept on a new bucket so each bucket has a full set.
+        
+        Returns:
+            tuple: (rows to insert, {trading_symbol: fingerprint} for those rows)
+        """
+        new_bucket = bucket_ts != self.last_saved_bucket_ts
+        rows = []
+        fingerprints = {}
+        
+        for row in raw_data:
+            symbol = row['trading_symbol']
+            fingerprint = hash((row['oi'], row['volume'], row['ltp'], row['price_change']))
+            if new_bucket or self._raw_fingerprints.get(symbol) != fingerprint:
+                rows.append(row)
+                fingerprints[symbol] = fingerprint
+        
+        return rows, fingerprints
     
     def stop_polling(self):
         """Stop the adaptive polling"""
         self.is_running = False
-        print("🛑 Stopping adaptive polling...")
+        self._cancel_session_refresh()
+        logger.info("🛑 Stopping adaptive polling...")
     
     def get_polling_status(self):
         """Get current polling status"""
@@ -1076,6 +1726,7 @@ class AdaptivePollingEngine:
             'is_running': self.is_running,
             'last_poll_time': self.last_poll_time,
             'last_saved_bucket_ts': self.last_saved_bucket_ts,
+            'poll_interval': self.poll_interval,
             'market_live': self.calendar.is_market_live_now()
         }
     
@@ -1112,16 +1763,16 @@ class AdaptivePollingEngine:
                     
                     # Format and display CLI dashboard
                     dashboard_text = self.analysis_engine.format_cli_display(summary)
-                    print(f"\n{dashboard_text}")
+                    logger.info("\n%s", dashboard_text)
                     
                 except Exception as e:
-                    print(f"❌ Error generating dashboard for {index_name}: {str(e)}")
+                    logger.error("❌ Error generating dashboard for %s: %s", index_name, e)
             
             # Update dashboard time
             self.last_dashboard_time = datetime.now(self.ist_tz)
             
         except Exception as e:
-            print(f"❌ Error updating CLI dashboard: {str(e)}")
+            logger.error("❌ Error updating CLI dashboard: %s", e)
 
 def fetch_option_chain_data(smart_api, ts_override=None):
     """
@@ -1138,14 +1789,14 @@ def fetch_option_chain_data(smart_api, ts_override=None):
     
     # Use override timestamp if provided (for backfill)
     if ts_override:
-        print(f"🕐 Using override timestamp: {ts_override}")
+        logger.info("🕐 Using override timestamp: %s", ts_override)
     
     # Fetch data for all indices
     all_data = fetcher.fetch_all_indices_data(range_strikes=5)
     
     if not all_data:
-        print("❌ No data fetched for any index")
+        logger.error("❌ No data fetched for any index")
         return None
     
-    print(f"✅ Successfully fetched data for {len(all_data)} indices")
+    logger.info("✅ Successfully fetched data for %s indices", len(all_data))
     return all_data 
\ No newline at end of file
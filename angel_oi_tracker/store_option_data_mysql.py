@@ -9,13 +9,130 @@ API Compliance:
 - Terms of Service: Follow Angel One's terms and conditions
 """
 
+import logging
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, pooling
+from mysql.connector.errors import PoolError
 import os
-from datetime import datetime
-import pytz
+import threading
+from datetime import datetime, timedelta
 import time
-from typing import Dict
+from typing import Dict, NamedTuple
+import numpy as np
+from utils.market_calendar import IST
+
+logger = logging.getLogger(__name__)
+
+# Connections kept open per (host, user, database); stores are created per
+# call in many places, so the pools are shared at module level
+POOL_SIZE = 8
+_pools = {}
+_pool_lock = threading.Lock()
+
+# option_snapshots.trading_symbol is index name + integer strike (NIFTY19500,
+# see snapshot_symbol); the generated prefix strips the strike's digits, so
+# per-index reads can use (index_prefix, bucket_ts) as a key
+INDEX_PREFIX_COLUMN = (
+    "index_prefix VARCHAR(20) AS "
+    "(LEFT(trading_symbol, CHAR_LENGTH(trading_symbol) - CHAR_LENGTH(strike))) STORED INVISIBLE"
+)
+
+# Hourly per-strike OI aggregates of option_snapshots (max/min/sum/count, so
+# any run of whole hours can be re-aggregated). get_strike_analysis reads whole
+# hours that have ended from here instead of scanning every bucket in its
+# window; the hour in progress, and any hour not aggregated yet, come from
+# option_snapshots.
+STRIKE_HOURLY_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS option_strike_hourly (
+    hour_ts TIMESTAMP NOT NULL,
+    trading_symbol VARCHAR(25) NOT NULL,
+    option_type CHAR(2) NOT NULL,
+    strike INT NOT NULL,
+    max_ce_oi INT UNSIGNED DEFAULT 0,
+    min_ce_oi INT UNSIGNED DEFAULT 0,
+    sum_ce_oi DECIMAL(30,0) DEFAULT 0,
+    max_pe_oi INT UNSIGNED DEFAULT 0,
+    min_pe_oi INT UNSIGNED DEFAULT 0,
+    sum_pe_oi DECIMAL(30,0) DEFAULT 0,
+    data_points INT NOT NULL DEFAULT 0,
+    {INDEX_PREFIX_COLUMN},
+    PRIMARY KEY (hour_ts, trading_symbol, option_type),
+    INDEX idx_hourly_prefix (index_prefix, hour_ts)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+STRIKE_HOURLY_REFRESH_SQL = """
+REPLACE INTO option_strike_hourly (
+    hour_ts, trading_symbol, option_type, strike,
+    max_ce_oi, min_ce_oi, sum_ce_oi, max_pe_oi, min_pe_oi, sum_pe_oi, data_points
+)
+SELECT TIMESTAMP(DATE(bucket_ts), MAKETIME(HOUR(bucket_ts), 0, 0)) AS hour_ts,
+    trading_symbol, option_type, strike,
+    MAX(ce_oi), MIN(ce_oi), SUM(ce_oi), MAX(pe_oi), MIN(pe_oi), SUM(pe_oi), COUNT(*)
+FROM option_snapshots
+{where}
+GROUP BY hour_ts, trading_symbol, option_type, strike
+"""
+
+# Ended hours whose option_snapshots rows are missing from option_strike_hourly,
+# or were aggregated before more rows landed. Found from the tables themselves,
+# so hours written by another process or left behind by a writer that died are
+# picked up by the next refresh
+STRIKE_HOURLY_STALE_SQL = """
+SELECT DISTINCT snapshots.hour_ts FROM (
+    SELECT TIMESTAMP(DATE(bucket_ts), MAKETIME(HOUR(bucket_ts), 0, 0)) AS hour_ts,
+        trading_symbol, option_type, COUNT(*) AS data_points
+    FROM option_snapshots
+    WHERE bucket_ts >= %s AND bucket_ts < %s
+    GROUP BY hour_ts, trading_symbol, option_type
+) AS snapshots
+LEFT JOIN option_strike_hourly AS hourly
+    ON hourly.hour_ts = snapshots.hour_ts
+    AND hourly.trading_symbol = snapshots.trading_symbol
+    AND hourly.option_type = snapshots.option_type
+WHERE hourly.data_points IS NULL OR hourly.data_points <> snapshots.data_points
+ORDER BY snapshots.hour_ts
+"""
+
+# How far back a refresh looks for stale hours; older gaps are still read from
+# option_snapshots by get_strike_analysis
+STRIKE_HOURLY_LOOKBACK = timedelta(days=7)
+
+# Clock hour of the last write that checked for stale hours, so live polls
+# re-aggregate once an hour rather than after every insert
+_strike_hourly_checked_hour = None
+_strike_hourly_lock = threading.Lock()
+
+def _hour_start(timestamp):
+    """Naive IST start of a bucket's hour, the form bucket_ts values are bound in"""
+    return timestamp.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+
+class Snapshot(NamedTuple):
+    """One option_snapshots row, in the INSERT's column order"""
+    bucket_ts: datetime
+    trading_symbol: str
+    option_type: str
+    strike: int
+    ce_oi: int
+    ce_price_close: float
+    pe_oi: int
+    pe_price_close: float
+
+def snapshot_symbol(index_name, strike):
+    """option_snapshots trading_symbol for a strike, e.g. ('NIFTY', 19500.0) -> 'NIFTY19500'"""
+    return f"{index_name}{int(strike)}"
+
+def oi_vector_changed(prev_snapshot, new_snapshot):
+    """
+    Compare two snapshots' OI vectors (see OptionChainFetcher.build_complete_snapshot)
+    
+    Returns:
+        bool: Whether any contract's OI moved, or None if either snapshot has no
+        vector or the contract lists differ (the caller then matches by symbol)
+    """
+    prev_symbols = prev_snapshot.get('symbols')
+    if prev_symbols is None or prev_symbols != new_snapshot.get('symbols'):
+        return None
+    return not np.array_equal(prev_snapshot['oi_vector'], new_snapshot['oi_vector'])
 
 def safe_int(val):
     try:
@@ -35,7 +152,7 @@ class MySQLOptionDataStore:
         self.user = user
         self.password = password
         self.database = database
-        self.ist_tz = pytz.timezone('Asia/Kolkata')
+        self.ist_tz = IST
         
         # Load from environment variables if available
         self.host = os.getenv('MYSQL_HOST', self.host)
@@ -44,19 +161,46 @@ class MySQLOptionDataStore:
         self.database = os.getenv('MYSQL_DATABASE', self.database)
     
     def get_connection(self):
-        """Get MySQL connection"""
+        """
+        Get MySQL connection from the shared pool
+        
+        close() on the returned connection hands it back to the pool. If all
+        POOL_SIZE connections are checked out, a direct connection is opened.
+        """
         try:
-            connection = mysql.connector.connect(
-                host=self.host,
-                user=self.user,
-                password=self.password,
-                database=self.database
-            )
-            return connection
+            try:
+                return self._get_pool().get_connection()
+            except PoolError:
+                logger.warning("⚠️  MySQL pool exhausted - opening a direct connection")
+                return mysql.connector.connect(
+                    host=self.host,
+                    user=self.user,
+                    password=self.password,
+                    database=self.database
+                )
         except Error as e:
-            print(f"❌ Error connecting to MySQL: {e}")
+            logger.error("❌ Error connecting to MySQL: %s", e)
             return None
     
+    def _get_pool(self):
+        """Connection pool for this store's server and database, created on first use"""
+        key = (self.host, self.user, self.database)
+        pool = _pools.get(key)
+        if pool is None:
+            with _pool_lock:
+                pool = _pools.get(key)
+                if pool is None:
+                    pool = pooling.MySQLConnectionPool(
+                        pool_name=f"oi_tracker_{len(_pools)}",
+                        pool_size=POOL_SIZE,
+                        host=self.host,
+                        user=self.user,
+                        password=self.password,
+                        database=self.database
+                    )
+                    _pools[key] = pool
+        return pool
+    
     def get_previous_snapshot(self, index_name, expiry, strike, current_timestamp):
         """Get the previous snapshot for comparison"""
         try:
@@ -90,7 +234,7 @@ class MySQLOptionDataStore:
             return None
             
         except Error as e:
-            print(f"❌ Error getting previous snapshot: {e}")
+            logger.error("❌ Error getting previous snapshot: %s", e)
             return None
     
     def calculate_changes(self, current_data, previous_data):
@@ -288,7 +432,7 @@ class MySQLOptionDataStore:
             processed_records = self.process_option_data(option_data, timestamp)
             
             if not processed_records:
-                print("⚠️  No records to store")
+                logger.warning("⚠️  No records to store")
                 return False
             
             # Connect to database
@@ -329,11 +473,11 @@ class MySQLOptionDataStore:
             connection.commit()
             connection.close()
             
-            print(f"✅ Stored {len(processed_records)} option records in MySQL")
+            logger.info("✅ Stored %s option records in MySQL", len(processed_records))
             return True
             
         except Error as e:
-            print(f"❌ Error storing option data in MySQL: {e}")
+            logger.error("❌ Error storing option data in MySQL: %s", e)
             return False
     
     def create_new_schema(self):
@@ -469,7 +613,7 @@ class MySQLOptionDataStore:
             cursor.execute(create_live_table_query)
             
             # Phase 3: Add performance indexes
-            print("🔧 Adding Phase 3 performance indexes...")
+            logger.info("🔧 Adding Phase 3 performance indexes...")
             def ensure_index(connection, table, index_name, create_sql):
                 with connection.cursor() as cursor:
                     cursor.execute(f"SHOW INDEX FROM {table} WHERE Key_name = %s", (index_name,))
@@ -480,28 +624,84 @@ class MySQLOptionDataStore:
                         except Exception:
                             pass
             ensure_index(connection, 'historical_oi_tracking', 'idx_bucket_index', "ALTER TABLE historical_oi_tracking ADD INDEX idx_bucket_index (bucket_ts, index_name)")
+            # Covering index for the analytics window reads (index_name + bucket_ts range)
+            ensure_index(connection, 'historical_oi_tracking', 'idx_index_bucket_cover', "ALTER TABLE historical_oi_tracking ADD INDEX idx_index_bucket_cover (index_name, bucket_ts, strike, ce_oi, pe_oi, ce_oi_change, pe_oi_change, ce_oi_pct_change, pe_oi_pct_change, ce_ltp_change_pct, pe_ltp_change_pct)")
             ensure_index(connection, 'historical_oi_tracking', 'idx_confidence', "ALTER TABLE historical_oi_tracking ADD INDEX idx_confidence (confidence_score DESC)")
             ensure_index(connection, 'options_raw_data', 'idx_trading_symbol', "ALTER TABLE options_raw_data ADD INDEX idx_trading_symbol (trading_symbol)")
             ensure_index(connection, 'live_oi_tracking', 'idx_live_bucket_ts', "ALTER TABLE live_oi_tracking ADD INDEX idx_live_bucket_ts (bucket_ts)")
             ensure_index(connection, 'live_oi_tracking', 'idx_live_index', "ALTER TABLE live_oi_tracking ADD INDEX idx_live_index (index_name)")
+            self.check_snapshot_layout(connection)
             
             connection.commit()
             connection.close()
             
-            print("✅ Phase 1 schema created successfully with three tables:")
-            print("   - options_raw_data")
-            print("   - historical_oi_tracking") 
-            print("   - live_oi_tracking")
-            print("✅ Phase 3 performance indexes added")
+            logger.info("✅ Phase 1 schema created successfully with three tables:")
+            logger.info("   - options_raw_data")
+            logger.info("   - historical_oi_tracking") 
+            logger.info("   - live_oi_tracking")
+            logger.info("✅ Phase 3 performance indexes added")
             return True
             
         except Error as e:
-            print(f"❌ Error creating Phase 1 schema: {e}")
+            logger.error("❌ Error creating Phase 1 schema: %s", e)
             return False
     
+    def check_snapshot_layout(self, connection):
+        """
+        Warn if option_snapshots is missing any of the v3 layout upgrades
+        
+        The analytics queries read one symbol's series over a bucket_ts range, so
+        the table is clustered by (trading_symbol, bucket_ts) to keep those reads
+        contiguous. Per-index reads filter on the invisible index_prefix column
+        (trading_symbol without its strike, e.g. NIFTY), which only matches
+        integer-strike symbols, and strike analysis reads option_strike_hourly.
+        
+        Rebuilding or rewriting the table blocks it, so these upgrades are left
+        to scripts/migrate_to_v3_schema.py and only a warning is logged here.
+        Symbols are checked on the oldest row, through idx_bucket_symbol.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT COLUMN_NAME FROM information_schema.KEY_COLUMN_USAGE
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'option_snapshots'
+                AND CONSTRAINT_NAME = 'PRIMARY'
+                ORDER BY ORDINAL_POSITION
+            """)
+            primary_key = [row[0] for row in cursor.fetchall()]
+            if not primary_key:
+                return
+            
+            if primary_key != ['trading_symbol', 'bucket_ts']:
+                logger.warning("⚠️  option_snapshots is not clustered by (trading_symbol, bucket_ts) - run scripts/migrate_to_v3_schema.py")
+            
+            cursor.execute("SHOW INDEX FROM option_snapshots WHERE Key_name = 'idx_prefix_bucket'")
+            if not cursor.fetchall():
+                logger.warning("⚠️  option_snapshots has no index_prefix column - run scripts/migrate_to_v3_schema.py")
+            
+            cursor.execute("SELECT trading_symbol FROM option_snapshots ORDER BY bucket_ts LIMIT 1")
+            oldest = cursor.fetchone()
+            if oldest and '.' in oldest[0]:
+                logger.warning("⚠️  option_snapshots has decimal-strike symbols (%s) - run scripts/migrate_to_v3_schema.py", oldest[0])
+            
+            cursor.execute("SHOW TABLES LIKE 'option_strike_hourly'")
+            if not cursor.fetchall():
+                logger.warning("⚠️  option_strike_hourly does not exist - run scripts/migrate_to_v3_schema.py")
+    
     def insert_single_snapshot(self, snapshot_data):
         """Insert a single snapshot using the new schema"""
+        return self.insert_snapshots_bulk([snapshot_data])
+    
+    def insert_snapshots_bulk(self, snapshot_list):
+        """
+        Insert snapshots into option_snapshots with one batched statement
+        
+        Snapshot tuples are passed to the driver as they are; dicts with the
+        same keys are still accepted.
+        """
         try:
+            if not snapshot_list:
+                return False
+            
             connection = self.get_connection()
             if connection is None:
                 return False
@@ -521,27 +721,76 @@ class MySQLOptionDataStore:
                     pe_price_close = VALUES(pe_price_close)
             '''
             
-            values = (
-                snapshot_data['bucket_ts'],
-                snapshot_data['trading_symbol'],
-                snapshot_data['option_type'],
-                snapshot_data['strike'],
-                snapshot_data['ce_oi'],
-                snapshot_data['ce_price_close'],
-                snapshot_data['pe_oi'],
-                snapshot_data['pe_price_close']
-            )
+            values_list = [
+                snapshot_data if isinstance(snapshot_data, tuple)
+                else tuple(snapshot_data[field] for field in Snapshot._fields)
+                for snapshot_data in snapshot_list
+            ]
             
-            cursor.execute(insert_query, values)
+            # Execute batch insert
+            cursor.executemany(insert_query, values_list)
             connection.commit()
             connection.close()
             
+            self._check_strike_hourly()
             return True
             
         except Error as e:
-            print(f"❌ Error inserting snapshot: {e}")
+            logger.error("❌ Error inserting snapshot: %s", e)
             return False
 
+    def _check_strike_hourly(self):
+        """Refresh option_strike_hourly on the first write of each clock hour"""
+        global _strike_hourly_checked_hour
+        current_hour = _hour_start(datetime.now(self.ist_tz))
+        with _strike_hourly_lock:
+            due = current_hour != _strike_hourly_checked_hour
+            _strike_hourly_checked_hour = current_hour
+        if due:
+            self.refresh_strike_hourly()
+    
+    def refresh_strike_hourly(self, include_current=False):
+        """
+        Re-aggregate stale option_snapshots hours into option_strike_hourly
+        
+        Stale hours (see STRIKE_HOURLY_STALE_SQL) are looked up over the last
+        STRIKE_HOURLY_LOOKBACK. Only hours that have ended are aggregated,
+        unless include_current is set for when writing stops (end of a polling
+        session or backfill); the current hour is then checked again once it ends.
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        now = datetime.now(self.ist_tz).replace(tzinfo=None)
+        current_hour = _hour_start(now)
+        end_time = now + timedelta(seconds=1) if include_current else current_hour
+        
+        connection = None
+        try:
+            connection = self.get_connection()
+            if connection is None:
+                return False
+            
+            cursor = connection.cursor()
+            cursor.execute(STRIKE_HOURLY_STALE_SQL, (current_hour - STRIKE_HOURLY_LOOKBACK, end_time))
+            hours = [row[0] for row in cursor.fetchall()]
+            
+            refresh_query = STRIKE_HOURLY_REFRESH_SQL.format(where="WHERE bucket_ts >= %s AND bucket_ts < %s")
+            for hour in hours:
+                cursor.execute(refresh_query, (hour, hour + timedelta(hours=1)))
+            connection.commit()
+            
+            if hours:
+                logger.debug("✅ Aggregated %s hours into option_strike_hourly", len(hours))
+            return True
+            
+        except Error as e:
+            logger.warning("⚠️  Could not refresh option_strike_hourly: %s", e)
+            return False
+        finally:
+            if connection is not None:
+                connection.close()
+    
     def insert_raw_data(self, raw_data_list):
         """Insert raw option data into options_raw_data table using batch inserts"""
         try:
@@ -598,11 +847,11 @@ class MySQLOptionDataStore:
             connection.commit()
             connection.close()
             
-            print(f"✅ Inserted {len(raw_data_list)} raw data records")
+            logger.debug("✅ Inserted %s raw data records", len(raw_data_list))
             return True
             
         except Error as e:
-            print(f"❌ Error inserting raw data: {e}")
+            logger.error("❌ Error inserting raw data: %s", e)
             return False
 
     def insert_historical_data(self, historical_data_list):
@@ -682,11 +931,11 @@ class MySQLOptionDataStore:
             connection.commit()
             connection.close()
             
-            print(f"✅ Inserted {len(historical_data_list)} historical data records")
+            logger.debug("✅ Inserted %s historical data records", len(historical_data_list))
             return True
             
         except Error as e:
-            print(f"❌ Error inserting historical data: {e}")
+            logger.error("❌ Error inserting historical data: %s", e)
             return False
 
     def insert_live_data(self, live_data_list):
@@ -713,8 +962,8 @@ class MySQLOptionDataStore:
                     pcr = VALUES(pcr), oi_quadrant = VALUES(oi_quadrant)
             '''
             
-            for live_data in live_data_list:
-                values = (
+            values_list = [
+                (
                     live_data['bucket_ts'],
                     live_data['trading_symbol'],
                     live_data['strike'],
@@ -726,16 +975,20 @@ class MySQLOptionDataStore:
                     live_data.get('oi_quadrant', 'NEUTRAL'),
                     live_data['index_name']
                 )
-                cursor.execute(insert_query, values)
+                for live_data in live_data_list
+            ]
+            
+            # Execute batch insert
+            cursor.executemany(insert_query, values_list)
             
             connection.commit()
             connection.close()
             
-            print(f"✅ Inserted {len(live_data_list)} live data records")
+            logger.debug("✅ Inserted %s live data records", len(live_data_list))
             return True
             
         except Error as e:
-            print(f"❌ Error inserting live data: {e}")
+            logger.error("❌ Error inserting live data: %s", e)
             return False
 
     def insert_ai_trade_setup(self, setup_data: Dict) -> bool:
@@ -784,7 +1037,7 @@ class MySQLOptionDataStore:
             return True
             
         except Error as e:
-            print(f"❌ Error inserting AI trade setup: {e}")
+            logger.error("❌ Error inserting AI trade setup: %s", e)
             return False
 
     # Phase 2 Methods
@@ -800,11 +1053,11 @@ class MySQLOptionDataStore:
             connection.commit()
             connection.close()
             
-            print("✅ Live tracking table cleared")
+            logger.info("✅ Live tracking table cleared")
             return True
             
         except Error as e:
-            print(f"❌ Error clearing live tracking: {e}")
+            logger.error("❌ Error clearing live tracking: %s", e)
             return False
 
     def is_new_market_day(self):
@@ -843,11 +1096,11 @@ class MySQLOptionDataStore:
                 
                 return last_bucket_date != now.date()
             except Exception as e:
-                print(f"⚠️  Error comparing dates: {e}")
+                logger.warning("⚠️  Error comparing dates: %s", e)
                 return True  # Assume new day on error
             
         except Error as e:
-            print(f"❌ Error checking new market day: {e}")
+            logger.error("❌ Error checking new market day: %s", e)
             return True  # Assume new day on error
 
     def get_existing_buckets(self, start_time, end_time, index_name=None):
@@ -883,7 +1136,7 @@ class MySQLOptionDataStore:
             return existing_buckets
             
         except Error as e:
-            print(f"❌ Error getting existing buckets: {e}")
+            logger.error("❌ Error getting existing buckets: %s", e)
             return set()
 
     def backfill_missing_buckets(self, start_dt, end_dt, index_name=None, fetcher=None):
@@ -900,15 +1153,15 @@ class MySQLOptionDataStore:
             bool: True if successful, False otherwise
         """
         try:
-            print(f"🔄 Starting backfill from {start_dt} to {end_dt}")
+            logger.info("🔄 Starting backfill from %s to %s", start_dt, end_dt)
             
             if not fetcher:
-                print("❌ Fetcher instance required for backfill")
+                logger.error("❌ Fetcher instance required for backfill")
                 return False
             
             # Get existing buckets
             existing_buckets = self.get_existing_buckets(start_dt, end_dt, index_name)
-            print(f"📊 Found {len(existing_buckets)} existing buckets")
+            logger.info("📊 Found %s existing buckets", len(existing_buckets))
             
             # Generate all required buckets
             from utils.market_calendar import MarketCalendar
@@ -917,16 +1170,16 @@ class MySQLOptionDataStore:
             
             # Find missing buckets
             missing_buckets = [b for b in all_buckets if b not in existing_buckets]
-            print(f"📊 Found {len(missing_buckets)} missing buckets to backfill")
+            logger.info("📊 Found %s missing buckets to backfill", len(missing_buckets))
             
             if not missing_buckets:
-                print("✅ No missing buckets to backfill")
+                logger.info("✅ No missing buckets to backfill")
                 return True
             
             success_count = 0
             
             for i, bucket_ts in enumerate(missing_buckets, 1):
-                print(f"🔄 Backfilling {i}/{len(missing_buckets)}: {bucket_ts.strftime('%H:%M:%S')}")
+                logger.info("🔄 Backfilling %s/%s: %s", i, len(missing_buckets), bucket_ts.strftime('%H:%M:%S'))
                 
                 try:
                     # Fetch snapshot for this bucket
@@ -944,26 +1197,26 @@ class MySQLOptionDataStore:
                         if self.insert_raw_data(complete_snapshot['raw_data']):
                             if self.insert_historical_data(complete_snapshot['historical_data']):
                                 success_count += 1
-                                print(f"✅ Backfilled bucket {bucket_ts.strftime('%H:%M:%S')}")
+                                logger.info("✅ Backfilled bucket %s", bucket_ts.strftime('%H:%M:%S'))
                             else:
-                                print(f"❌ Failed to insert historical data for {bucket_ts.strftime('%H:%M:%S')}")
+                                logger.error("❌ Failed to insert historical data for %s", bucket_ts.strftime('%H:%M:%S'))
                         else:
-                            print(f"❌ Failed to insert raw data for {bucket_ts.strftime('%H:%M:%S')}")
+                            logger.error("❌ Failed to insert raw data for %s", bucket_ts.strftime('%H:%M:%S'))
                     else:
-                        print(f"⚠️  No data fetched for {bucket_ts.strftime('%H:%M:%S')}")
+                        logger.warning("⚠️  No data fetched for %s", bucket_ts.strftime('%H:%M:%S'))
                     
                     # Small delay to avoid rate limiting
                     time.sleep(1)
                     
                 except Exception as e:
-                    print(f"❌ Error backfilling {bucket_ts.strftime('%H:%M:%S')}: {str(e)}")
+                    logger.error("❌ Error backfilling %s: %s", bucket_ts.strftime('%H:%M:%S'), e)
                     continue
             
-            print(f"🎉 Backfill completed: {success_count}/{len(missing_buckets)} buckets filled")
+            logger.info("🎉 Backfill completed: %s/%s buckets filled", success_count, len(missing_buckets))
             return success_count > 0
             
         except Exception as e:
-            print(f"❌ Error in backfill_missing_buckets: {str(e)}")
+            logger.error("❌ Error in backfill_missing_buckets: %s", e)
             return False
 
     def get_last_bucket_timestamp(self, index_name=None):
@@ -993,7 +1246,7 @@ class MySQLOptionDataStore:
             return None
             
         except Error as e:
-            print(f"❌ Error getting last bucket timestamp: {e}")
+            logger.error("❌ Error getting last bucket timestamp: %s", e)
             return None
 
     def should_store_snapshot(self, prev_snapshot, new_snapshot, bucket_ts):
@@ -1018,6 +1271,11 @@ class MySQLOptionDataStore:
             if prev_bucket_ts != bucket_ts:
                 return True
             
+            # Same contracts in the same order: one vectorized OI compare
+            oi_changed = oi_vector_changed(prev_snapshot, new_snapshot)
+            if oi_changed is not None:
+                return oi_changed
+            
             # Check for OI changes in any option
             if 'raw_data' in new_snapshot and 'raw_data' in prev_snapshot:
                 new_raw_data = {item['trading_symbol']: item for item in new_snapshot['raw_data']}
@@ -1032,7 +1290,7 @@ class MySQLOptionDataStore:
             return False
             
         except Exception as e:
-            print(f"❌ Error in should_store_snapshot: {str(e)}")
+            logger.error("❌ Error in should_store_snapshot: %s", e)
             return True  # Store on error to be safe 
 
 # Wrapper Functions
@@ -1055,7 +1313,7 @@ def insert_snapshot(snapshot_data):
     Insert a single snapshot into the database using the new schema
     
     Args:
-        snapshot_data: Dictionary containing snapshot data
+        snapshot_data: Snapshot (or dictionary with the same keys)
     
     Returns:
         bool: True if successful, False otherwise
@@ -1063,6 +1321,32 @@ def insert_snapshot(snapshot_data):
     store = MySQLOptionDataStore()
     return store.insert_single_snapshot(snapshot_data)
 
+def insert_snapshots(snapshot_list):
+    """
+    Insert several snapshots into the database in one batch
+    
+    Args:
+        snapshot_list: List of Snapshot tuples (or dictionaries)
+    
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    store = MySQLOptionDataStore()
+    return store.insert_snapshots_bulk(snapshot_list)
+
+def refresh_strike_hourly(include_current=False):
+    """
+    Re-aggregate stale option_snapshots hours into option_strike_hourly
+    
+    Args:
+        include_current: Also aggregate the hour in progress (writing has stopped)
+    
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    store = MySQLOptionDataStore()
+    return store.refresh_strike_hourly(include_current)
+
 def insert_phase1_raw_data(raw_data_list):
     """
     Insert raw data into options_raw_data table
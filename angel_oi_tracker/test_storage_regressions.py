@@ -0,0 +1,232 @@
+"""
+Storage Regression Test Script - OI Tracker v3
+
+This script re-checks storage paths that have broken before:
+1. Snapshots stored from fetched (float) strikes read back by index
+2. OI change deltas when OI falls between buckets
+3. Cached summaries refreshed when new rows are stored
+
+Rows are written under a dummy index (ZZTEST) and removed afterwards.
+
+Always refer to official documentation: https://smartapi.angelone.in/docs
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta
+from utils.market_calendar import IST
+from store_option_data_mysql import MySQLOptionDataStore, Snapshot, snapshot_symbol
+from option_chain_fetcher import OIAnalysis
+from oi_analysis_engine import OIAnalysisEngine
+from market_analysis import MarketDirectionAnalyzer
+
+TEST_INDEX = 'ZZTEST'
+
+# Strikes as they come back from the option chain fetch
+TEST_STRIKES = [25000.0, 25050.0]
+
+class StorageRegressionTester:
+    def __init__(self):
+        self.ist_tz = IST
+        self.datastore = MySQLOptionDataStore()
+        self.oi_analysis = OIAnalysis()
+
+        # Two consecutive 3-minute buckets ending just before now (naive IST)
+        now = datetime.now(self.ist_tz).replace(second=0, microsecond=0, tzinfo=None)
+        self.bucket_ts = now - timedelta(minutes=now.minute % 3)
+        self.prev_bucket_ts = self.bucket_ts - timedelta(minutes=3)
+
+    def store_snapshots(self, bucket_ts, ce_oi, pe_oi):
+        """Store CE/PE snapshot rows for every test strike in one bucket"""
+        snapshots = []
+        for strike in TEST_STRIKES:
+            trading_symbol = snapshot_symbol(TEST_INDEX, strike)
+            for option_type in ('CE', 'PE'):
+                snapshots.append(Snapshot(bucket_ts, trading_symbol, option_type, int(strike),
+                                          ce_oi, 100.0, pe_oi, 100.0))
+        return self.datastore.insert_snapshots_bulk(snapshots)
+
+    def store_history(self, bucket_ts, ce_oi, pe_oi, strikes=TEST_STRIKES):
+        """Store historical_oi_tracking rows for the given test strikes in one bucket"""
+        rows = [{
+            'bucket_ts': bucket_ts,
+            'trading_symbol': snapshot_symbol(TEST_INDEX, strike),
+            'strike': int(strike),
+            'ce_oi': ce_oi,
+            'pe_oi': pe_oi,
+            'total_oi': ce_oi + pe_oi,
+            'index_name': TEST_INDEX,
+            'expiry_date': bucket_ts.date()
+        } for strike in strikes]
+        return self.datastore.insert_historical_data(rows)
+
+    def cleanup(self):
+        """Remove every row written for the test index"""
+        # Aggregate pending hours first so the hourly rows exist to be deleted
+        self.datastore.refresh_strike_hourly(include_current=True)
+
+        connection = self.datastore.get_connection()
+        if connection is None:
+            return
+        try:
+            cursor = connection.cursor()
+            cursor.execute("DELETE FROM option_snapshots WHERE trading_symbol LIKE %s", (f"{TEST_INDEX}%",))
+            cursor.execute("DELETE FROM option_strike_hourly WHERE trading_symbol LIKE %s", (f"{TEST_INDEX}%",))
+            cursor.execute("DELETE FROM historical_oi_tracking WHERE index_name = %s", (TEST_INDEX,))
+            connection.commit()
+        finally:
+            connection.close()
+
+    def test_store_read_by_index(self):
+        """Test that snapshots from float strikes are found by index"""
+        print("🧪 Testing store → read round-trip by index...")
+
+        try:
+            if not self.store_snapshots(self.bucket_ts, 1000, 1500):
+                print("   ❌ Failed to store snapshots")
+                return False
+
+            summary = self.oi_analysis.get_oi_summary(TEST_INDEX, hours_back=1)
+            if not summary:
+                print(f"   ❌ No OI summary for {TEST_INDEX}")
+                return False
+
+            expected_strikes = {int(strike) for strike in TEST_STRIKES}
+            if set(summary['strikes']) != expected_strikes:
+                print(f"   ❌ Summary strikes {sorted(summary['strikes'])} != {sorted(expected_strikes)}")
+                return False
+            print(f"   ✅ OI summary found {len(summary['strikes'])} strikes")
+
+            start_time = datetime.now(self.ist_tz) - timedelta(hours=1)
+            if not self.oi_analysis.get_strike_analysis(TEST_INDEX, start_time):
+                print(f"   ❌ No strike analysis for {TEST_INDEX}")
+                return False
+            print("   ✅ Strike analysis found the stored strikes")
+
+            if not self.oi_analysis.get_ce_pe_ratio_analysis(TEST_INDEX, start_time):
+                print(f"   ❌ No CE/PE ratio analysis for {TEST_INDEX}")
+                return False
+            print("   ✅ CE/PE ratio analysis found the stored strikes")
+
+            return True
+
+        except Exception as e:
+            print(f"   ❌ Round-trip test error: {str(e)}")
+            return False
+
+    def test_falling_oi_deltas(self):
+        """Test that OI changes are negative when OI falls"""
+        print("🧪 Testing OI change deltas with falling OI...")
+
+        try:
+            if not (self.store_snapshots(self.prev_bucket_ts, 1000, 1500)
+                    and self.store_snapshots(self.bucket_ts, 800, 1200)):
+                print("   ❌ Failed to store snapshots")
+                return False
+
+            trading_symbol = snapshot_symbol(TEST_INDEX, TEST_STRIKES[0])
+            changes = self.oi_analysis.get_oi_changes(
+                trading_symbol,
+                self.prev_bucket_ts - timedelta(minutes=1),
+                self.bucket_ts + timedelta(minutes=1)
+            )
+            if not changes:
+                print(f"   ❌ No OI changes for {trading_symbol}")
+                return False
+
+            latest = changes[-1]
+            if latest['ce_oi_change'] != -200 or latest['pe_oi_change'] != -300:
+                print(f"   ❌ Unexpected deltas: CE {latest['ce_oi_change']}, PE {latest['pe_oi_change']}")
+                return False
+
+            print(f"   ✅ CE delta {latest['ce_oi_change']:+,.0f}, PE delta {latest['pe_oi_change']:+,.0f}")
+            return True
+
+        except Exception as e:
+            print(f"   ❌ OI change test error: {str(e)}")
+            return False
+
+    def test_live_bucket_cache_invalidation(self):
+        """Test that cached summaries refresh when new rows are stored"""
+        print("🧪 Testing cache invalidation within a live bucket...")
+
+        try:
+            # Live summary (historical_oi_tracking), refreshed by more rows in the bucket
+            engine = OIAnalysisEngine(self.datastore)
+            self.store_history(self.bucket_ts, 1000, 1000, strikes=TEST_STRIKES[:1])
+            first = engine.generate_live_summary(self.bucket_ts, TEST_INDEX)
+            self.store_history(self.bucket_ts, 1000, 3000, strikes=TEST_STRIKES[1:])
+            second = engine.generate_live_summary(self.bucket_ts, TEST_INDEX)
+
+            if abs(first['pcr'] - 1.0) > 0.01 or abs(second['pcr'] - 2.0) > 0.01:
+                print(f"   ❌ Live summary PCR not refreshed: {first['pcr']:.2f} → {second['pcr']:.2f}")
+                return False
+            print(f"   ✅ Live summary PCR refreshed: {first['pcr']:.2f} → {second['pcr']:.2f}")
+
+            # Market direction OI summary (option_snapshots), refreshed by a new bucket
+            analyzer = MarketDirectionAnalyzer()
+            self.store_snapshots(self.bucket_ts, 1000, 1000)
+            first = analyzer.get_oi_summary(TEST_INDEX, hours_back=1)
+            self.store_snapshots(self.bucket_ts + timedelta(minutes=3), 1000, 3000)
+            second = analyzer.get_oi_summary(TEST_INDEX, hours_back=1)
+
+            if not first or not second or second['total_pe_oi'] == first['total_pe_oi']:
+                print("   ❌ Market direction OI summary not refreshed")
+                return False
+            print(f"   ✅ Market direction PE OI refreshed: {first['total_pe_oi']:,} → {second['total_pe_oi']:,}")
+
+            return True
+
+        except Exception as e:
+            print(f"   ❌ Cache invalidation test error: {str(e)}")
+            return False
+
+    def run_all_tests(self):
+        """Run all storage regression tests"""
+        print("🚀 Starting Storage Regression Tests")
+        print("=" * 60)
+
+        tests = [
+            ("Store/Read Round-Trip by Index", self.test_store_read_by_index),
+            ("Falling OI Deltas", self.test_falling_oi_deltas),
+            ("Live Bucket Cache Invalidation", self.test_live_bucket_cache_invalidation)
+        ]
+
+        passed = 0
+        total = len(tests)
+
+        try:
+            for test_name, test_func in tests:
+                print(f"\n📋 Running: {test_name}")
+                print("-" * 40)
+
+                try:
+                    if test_func():
+                        print(f"✅ {test_name} PASSED")
+                        passed += 1
+                    else:
+                        print(f"❌ {test_name} FAILED")
+                except Exception as e:
+                    print(f"❌ {test_name} ERROR: {str(e)}")
+        finally:
+            self.cleanup()
+
+        print("\n" + "=" * 60)
+        print(f"📊 Test Results: {passed}/{total} tests passed")
+
+        if passed == total:
+            print("🎉 All storage regression tests passed!")
+        else:
+            print("⚠️  Some tests failed. Please review the output above.")
+
+        return passed == total
+
+def main():
+    """Main test runner"""
+    tester = StorageRegressionTester()
+    tester.run_all_tests()
+
+if __name__ == "__main__":
+    main()
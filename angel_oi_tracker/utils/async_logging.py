@@ -0,0 +1,81 @@
+"""
+Queue-Based Logging Setup
+
+This module moves log output off the polling thread. Callers only enqueue
+log records; a background QueueListener thread does the actual stdout/file I/O.
+
+Always refer to official documentation: https://smartapi.angelone.in/docs
+"""
+
+import atexit
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# Records held for the writer thread; beyond this, new records are dropped so a
+# stalled stdout/file never blocks the poller or grows memory without bound
+LOG_QUEUE_SIZE = 10000
+
+_listener = None
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that counts and drops records when the queue is full instead of raising"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class FlushingQueueListener(QueueListener):
+    """QueueListener whose stop() waits for room in a full queue, so shutdown still flushes it"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+def setup_queue_logging(level=logging.INFO):
+    """
+    Route all root logger output through a queue and a background writer thread.
+
+    Any handlers already attached to the root logger (e.g. from basicConfig)
+    are moved behind the listener so they keep their formatting and targets.
+    Safe to call more than once. The queue holds at most LOG_QUEUE_SIZE
+    records; further records are dropped rather than blocking the caller.
+
+    Returns:
+        QueueListener: The running listener
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    for handler in handlers:
+        root.removeHandler(handler)
+
+    if not handlers:
+        # stdout, where the CLI reports went when they were printed
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(logging.Formatter('%(message)s'))
+        handlers = [stream_handler]
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    root.addHandler(DroppingQueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = FlushingQueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    # Flush any queued records on interpreter exit
+    atexit.register(_listener.stop)
+
+    return _listener
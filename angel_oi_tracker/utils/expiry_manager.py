@@ -10,12 +10,12 @@ Always refer to official documentation: https://smartapi.angelone.in/docs
 import os
 import json
 from datetime import datetime, timedelta
-import pytz
+from .market_calendar import IST
 from .scrip_master import load_scrip_master, search_symbols
 
 class ExpiryManager:
     def __init__(self):
-        self.ist_tz = pytz.timezone('Asia/Kolkata')
+        self.ist_tz = IST
         self.cache = {}  # Cache expiry dates to avoid repeated lookups
         
     def get_current_expiry(self, index_name):
@@ -24,8 +24,10 @@ class ExpiryManager:
         Returns the nearest expiry date that hasn't passed yet.
         """
         cache_key = f"{index_name}_current_expiry"
-        if cache_key in self.cache:
-            return self.cache[cache_key]
+        cached = self.cache.get(cache_key)
+        # Reuse the cached expiry until it passes, then look up the next one
+        if cached is not None and cached > datetime.now(self.ist_tz):
+            return cached
         
         try:
             # Get all option contracts for this index
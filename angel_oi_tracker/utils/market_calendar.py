@@ -10,11 +10,15 @@ API Compliance:
 """
 
 from datetime import datetime, timedelta
-import pytz
+from zoneinfo import ZoneInfo
+
+# Shared IST zone (stdlib zoneinfo, C-backed); import this rather than
+# building a new timezone object per class
+IST = ZoneInfo('Asia/Kolkata')
 
 class MarketCalendar:
     def __init__(self):
-        self.ist_tz = pytz.timezone('Asia/Kolkata')
+        self.ist_tz = IST
         
         # Market hours (IST)
         self.MARKET_START_HOUR = 9
@@ -27,14 +31,18 @@ class MarketCalendar:
         self.REFRESH_WINDOW = 30  # seconds (max drift NSE push vs fetch)
         self.BUCKET_INTERVAL = 3  # minutes
     
-    def is_market_live_now(self):
+    def is_market_live_now(self, now=None):
         """
         Check if market is currently live (09:18:00 - 15:30:00 IST on weekdays)
         
+        Args:
+            now: Current IST time, if the caller already read the clock
+            
         Returns:
             bool: True if market is live, False otherwise
         """
-        now = datetime.now(self.ist_tz)
+        if now is None:
+            now = datetime.now(self.ist_tz)
         
         # Check if it's weekend
         if now.weekday() >= 5:  # Saturday = 5, Sunday = 6
@@ -164,7 +172,7 @@ class MarketCalendar:
         
         # Convert to IST if needed
         if last_bucket_ts.tzinfo is None:
-            last_bucket_ts = self.ist_tz.localize(last_bucket_ts)
+            last_bucket_ts = last_bucket_ts.replace(tzinfo=self.ist_tz)
         
         # Check if last bucket was from a different day
         return last_bucket_ts.date() != now.date()
@@ -179,17 +187,13 @@ class MarketCalendar:
         Returns:
             datetime: Floored timestamp
         """
-        # Convert to minutes since midnight, floor to 3-minute intervals
-        minutes_since_midnight = timestamp.hour * 60 + timestamp.minute
-        floored_minutes = (minutes_since_midnight // self.BUCKET_INTERVAL) * self.BUCKET_INTERVAL
-        
-        # Ensure floored_minutes is within valid range (0-59)
-        if floored_minutes >= 60:
-            floored_minutes = 57  # Last valid 3-minute interval
-        
-        # Create new timestamp with floored minutes
-        floored_time = timestamp.replace(minute=floored_minutes, second=0, microsecond=0)
-        return floored_time
+        # BUCKET_INTERVAL divides 60, so buckets align with the hour and only
+        # the minute remainder (plus seconds) needs subtracting
+        return timestamp - timedelta(
+            minutes=timestamp.minute % self.BUCKET_INTERVAL,
+            seconds=timestamp.second,
+            microseconds=timestamp.microsecond
+        )
     
     def generate_bucket_timestamps(self, start_time, end_time):
         """
@@ -228,12 +232,13 @@ class MarketCalendar:
         missing_buckets = all_buckets - existing_buckets
         return sorted(list(missing_buckets))
     
-    def should_poll_now(self, last_poll_time=None):
+    def should_poll_now(self, last_poll_time=None, now=None):
         """
         Check if we should poll now based on polling frequency
         
         Args:
             last_poll_time: Last poll timestamp
+            now: Current IST time, if the caller already read the clock
             
         Returns:
             bool: True if should poll, False otherwise
@@ -241,7 +246,8 @@ class MarketCalendar:
         if last_poll_time is None:
             return True
         
-        now = datetime.now(self.ist_tz)
+        if now is None:
+            now = datetime.now(self.ist_tz)
         time_since_last_poll = (now - last_poll_time).total_seconds()
         
         return time_since_last_poll >= self.POLL_FREQ
@@ -0,0 +1,125 @@
+"""
+SmartAPI Rate Limiting
+
+Angel One enforces per-user request caps on each endpoint (e.g. getMarketData:
+10 requests per second and 500 per minute). This module keeps outgoing calls under those caps
+by making callers wait for a slot instead of getting a rate-limit error back.
+
+Always refer to official documentation: https://smartapi.angelone.in/docs
+API Compliance:
+- Rate Limits: https://smartapi.angelone.in/docs/rate-limits
+"""
+
+import threading
+import time
+from collections import deque
+
+from .retry import RateLimitError, is_rate_limited
+
+# SmartAPI requests allowed in flight at once across all endpoints; worker
+# threads beyond this queue here instead of opening more connections
+MAX_CONCURRENT_REQUESTS = 6
+_in_flight = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+
+
+class RateLimiter:
+    """
+    Sliding-window limiter over per-second and per-minute request caps
+
+    Thread-safe; one instance should be shared by every caller hitting the
+    same endpoint since Angel's limits apply per user, not per connection.
+
+    If Angel still rejects a request for exceeding its rate, call() pauses
+    the limiter with exponential back-off (1 s, 2 s, 4 s, ... up to
+    max_backoff) so every caller on the endpoint holds off together.
+
+    Usage:
+        with limiter:
+            smart_api.getMarketData(...)
+
+        response = limiter.call(smart_api.getMarketData, "FULL", tokens)
+    """
+
+    def __init__(self, per_sec, per_min, max_backoff=8.0):
+        self.per_sec = per_sec
+        self.per_min = per_min
+        self.max_backoff = max_backoff
+        self._second_window = deque()
+        self._minute_window = deque()
+        self._paused_until = 0.0
+        self._backoff = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent, then record it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._second_window and now - self._second_window[0] >= 1:
+                    self._second_window.popleft()
+                while self._minute_window and now - self._minute_window[0] >= 60:
+                    self._minute_window.popleft()
+
+                if (now >= self._paused_until and len(self._second_window) < self.per_sec
+                        and len(self._minute_window) < self.per_min):
+                    self._second_window.append(now)
+                    self._minute_window.append(now)
+                    return
+
+                # Sleep out any back-off pause, then until the oldest request
+                # in a full window expires
+                wait = self._paused_until - now
+                if len(self._second_window) >= self.per_sec:
+                    wait = max(wait, 1 - (now - self._second_window[0]))
+                if len(self._minute_window) >= self.per_min:
+                    wait = max(wait, 60 - (now - self._minute_window[0]))
+
+            time.sleep(wait)
+
+    def back_off(self):
+        """Pause the limiter after a rate-limit rejection, doubling each time"""
+        with self._lock:
+            self._backoff = min(self.max_backoff, self._backoff * 2 or 1.0)
+            self._paused_until = max(self._paused_until, time.monotonic() + self._backoff)
+
+    def call(self, func, *args, **kwargs):
+        """
+        Call func once a slot is free, backing off if Angel rejects it
+
+        SmartAPI reports rate limiting either as a raised error or as an
+        error response whose message says so; both trigger back_off() and
+        are raised as RateLimitError so @retry can try again after the pause.
+        Other responses and errors pass through unchanged. At most
+        MAX_CONCURRENT_REQUESTS calls run at once across all limiters.
+        """
+        with self, _in_flight:
+            try:
+                response = func(*args, **kwargs)
+            except RateLimitError:
+                self.back_off()
+                raise
+            except Exception as e:
+                if is_rate_limited(e):
+                    self.back_off()
+                    raise RateLimitError(str(e)) from e
+                raise
+
+        if isinstance(response, dict) and is_rate_limited(response.get('message', '')):
+            self.back_off()
+            raise RateLimitError(response.get('message'))
+        self._backoff = 0.0
+        return response
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+# Shared across all fetchers in the process (limits are per user, per endpoint)
+MARKET_DATA_LIMITER = RateLimiter(per_sec=10, per_min=500)
+LTP_LIMITER = RateLimiter(per_sec=10, per_min=500)
+CANDLE_LIMITER = RateLimiter(per_sec=3, per_min=180)
+OPTION_GREEK_LIMITER = RateLimiter(per_sec=1, per_min=60)
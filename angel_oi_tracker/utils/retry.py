@@ -0,0 +1,59 @@
+"""
+Retry Helpers for SmartAPI Calls
+
+Transient failures (timeouts, dropped connections, 5xx responses, truncated
+JSON bodies and rate-limit rejections) are retried a few times with
+exponential back-off and jitter so a single hiccup doesn't cost a whole
+polling cycle.
+
+Always refer to official documentation: https://smartapi.angelone.in/docs
+API Compliance:
+- Rate Limits: https://smartapi.angelone.in/docs/rate-limits
+"""
+
+import functools
+import json
+import random
+import time
+
+class RateLimitError(Exception):
+    """Angel rejected a request for exceeding its rate limit"""
+
+
+# requests' exceptions (including HTTPError for 5xx) derive from OSError;
+# truncated bodies raise JSONDecodeError
+TRANSIENT_ERRORS = (OSError, json.JSONDecodeError, RateLimitError)
+
+
+def is_rate_limited(error):
+    """True if an error or response message is Angel's rate-limit rejection"""
+    message = str(error).lower()
+    return 'exceeding access rate' in message or 'too many requests' in message
+
+
+def retry(tries=3, base=0.2, cap=2.0, exceptions=TRANSIENT_ERRORS):
+    """
+    Retry a function on transient errors with capped exponential back-off
+
+    Sleeps min(cap, base * 2**attempt) plus up to 100 ms of jitter between
+    attempts; the final failure is re-raised. Rate-limit rejections are
+    retried too, since RateLimiter.call() pauses the endpoint before raising.
+
+    Args:
+        tries: Total attempts, including the first call
+        base: Back-off for the first retry, in seconds
+        cap: Maximum back-off per retry, in seconds
+        exceptions: Exception types considered transient
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(tries):
+                try:
+                    return func(*args, **kwargs)
+                except exceptions as e:
+                    if attempt == tries - 1:
+                        raise
+                    time.sleep(min(cap, base * 2 ** attempt) + random.random() * 0.1)
+        return wrapper
+    return decorator
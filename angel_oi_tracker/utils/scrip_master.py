@@ -1,9 +1,20 @@
 import os
 import json
+import pickle
+import threading
 import requests
 
 SCRIP_MASTER_URL = "https://margincalculator.angelbroking.com/OpenAPI_File/files/OpenAPIScripMaster.json"
 SCRIP_MASTER_FILE = os.path.join(os.path.dirname(__file__), "OpenAPIScripMaster.json")
+# Pickled symbol -> token index built from SCRIP_MASTER_FILE (rebuilt when the JSON changes)
+SCRIP_INDEX_FILE = SCRIP_MASTER_FILE + ".idx.pickle"
+
+# In-process caches, keyed to the JSON file's mtime so a re-download invalidates them
+_scrips = None
+_scrips_mtime = None
+_token_index = None
+_token_index_mtime = None
+_cache_lock = threading.Lock()
 
 
 def download_scrip_master(force_refresh=False):
@@ -24,11 +35,69 @@ def download_scrip_master(force_refresh=False):
 def load_scrip_master():
     """
     Load the Scrip Master JSON as a list of dicts.
+    The parsed list is kept in memory until the file on disk changes.
+    """
+    global _scrips, _scrips_mtime
+    if not os.path.exists(SCRIP_MASTER_FILE):
+        download_scrip_master()
+    mtime = os.path.getmtime(SCRIP_MASTER_FILE)
+    with _cache_lock:
+        if _scrips is None or _scrips_mtime != mtime:
+            with open(SCRIP_MASTER_FILE, "r", encoding="utf-8") as f:
+                _scrips = json.load(f)
+            _scrips_mtime = mtime
+        return _scrips
+
+
+def _build_token_index(scrips):
+    """
+    Map normalized symbol -> token, per exchange and across all exchanges ("*").
+    The first occurrence wins, matching the order of a linear scan.
+    """
+    index = {"*": {}}
+    for scrip in scrips:
+        symbol = scrip.get("symbol", "").upper().replace(" ", "")
+        token = scrip.get("token")
+        exchange = scrip.get("exch_seg", "").upper()
+        index.setdefault(exchange, {}).setdefault(symbol, token)
+        index["*"].setdefault(symbol, token)
+    return index
+
+
+def load_token_index():
     """
+    Symbol -> token index for the current Scrip Master.
+    Reuses the in-memory copy, then the pickle on disk, and only rebuilds
+    from the JSON when the source file has changed.
+    """
+    global _token_index, _token_index_mtime
     if not os.path.exists(SCRIP_MASTER_FILE):
         download_scrip_master()
-    with open(SCRIP_MASTER_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    mtime = os.path.getmtime(SCRIP_MASTER_FILE)
+    if _token_index is not None and _token_index_mtime == mtime:
+        return _token_index
+
+    index = None
+    try:
+        with open(SCRIP_INDEX_FILE, "rb") as f:
+            cached = pickle.load(f)
+        if cached.get("mtime") == mtime:
+            index = cached["index"]
+    except Exception:
+        index = None
+
+    if index is None:
+        index = _build_token_index(load_scrip_master())
+        try:
+            with open(SCRIP_INDEX_FILE, "wb") as f:
+                pickle.dump({"mtime": mtime, "index": index}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError as e:
+            print(f"⚠️  Could not write Scrip Master index cache: {str(e)}")
+
+    with _cache_lock:
+        _token_index = index
+        _token_index_mtime = mtime
+    return index
 
 
 def get_token_for_symbol(symbol_name, exchange=None):
@@ -36,14 +105,20 @@ def get_token_for_symbol(symbol_name, exchange=None):
     Look up the instrument token for a given symbol name (and optional exchange).
     Returns the token as a string, or None if not found.
     """
-    scrips = load_scrip_master()
+    index = load_token_index()
     symbol_name = symbol_name.upper().replace(" ", "")
-    for scrip in scrips:
-        scrip_symbol = scrip.get("symbol", "").upper().replace(" ", "")
-        if scrip_symbol == symbol_name:
-            if exchange is None or scrip.get("exch_seg", "").upper() == exchange.upper():
-                return scrip.get("token")
-    return None
+    return index.get(exchange.upper() if exchange else "*", {}).get(symbol_name)
+
+
+def get_tokens_with_prefix(prefix, exchange=None):
+    """
+    All symbol -> token entries whose normalized symbol starts with prefix,
+    e.g. every contract of one index expiry for prefix "NIFTY25JUL24".
+    """
+    index = load_token_index()
+    prefix = prefix.upper().replace(" ", "")
+    symbols = index.get(exchange.upper() if exchange else "*", {})
+    return {symbol: token for symbol, token in symbols.items() if symbol.startswith(prefix)}
 
 
 def search_symbols(partial_name):
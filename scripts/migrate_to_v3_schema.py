@@ -10,15 +10,22 @@ New Schema:
 - trading_symbol VARCHAR(25) (e.g., NIFTY19500)
 - option_type CHAR(2) (CE/PE)
 - strike INT
-- ce_oi BIGINT, ce_price_close DECIMAL(10,2)
-- pe_oi BIGINT, pe_price_close DECIMAL(10,2)
+- ce_oi INT UNSIGNED, ce_price_close DECIMAL(10,2)
+- pe_oi INT UNSIGNED, pe_price_close DECIMAL(10,2)
+- index_prefix (invisible, generated: trading_symbol without the strike)
 """
 
 import mysql.connector
 from mysql.connector import Error
 import os
+import sys
 from datetime import datetime
 
+# Add parent directory to path for imports
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'angel_oi_tracker'))
+
+from store_option_data_mysql import INDEX_PREFIX_COLUMN, STRIKE_HOURLY_TABLE_SQL, STRIKE_HOURLY_REFRESH_SQL
+
 class V3SchemaMigrator:
     def __init__(self, host='localhost', user='root', password='YourNewPassword', database='options_analytics'):
         self.host = host
@@ -148,29 +155,32 @@ class V3SchemaMigrator:
             cursor = connection.cursor()
             
             # Create new v3 schema
-            create_table_query = """
+            create_table_query = f"""
             CREATE TABLE option_snapshots (
                 bucket_ts TIMESTAMP NOT NULL,
                 trading_symbol VARCHAR(25) NOT NULL,
                 option_type CHAR(2) NOT NULL,
                 strike INT NOT NULL,
-                ce_oi BIGINT DEFAULT 0,
+                ce_oi INT UNSIGNED DEFAULT 0,
                 ce_price_close DECIMAL(10,2) DEFAULT 0,
-                pe_oi BIGINT DEFAULT 0,
+                pe_oi INT UNSIGNED DEFAULT 0,
                 pe_price_close DECIMAL(10,2) DEFAULT 0,
-                PRIMARY KEY(bucket_ts, trading_symbol)
+                {INDEX_PREFIX_COLUMN},
+                PRIMARY KEY(trading_symbol, bucket_ts)
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+              ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8
             """
             
             print("🔧 Creating new v3 schema...")
             cursor.execute(create_table_query)
             
-            # Create indexes
+            # Create indexes (the primary key already serves trading_symbol lookups;
+            # rows are clustered per symbol in bucket order, so range reads of one
+            # symbol's series touch contiguous compressed pages)
             indexes = [
-                "CREATE INDEX idx_bucket_ts ON option_snapshots(bucket_ts)",
-                "CREATE INDEX idx_trading_symbol ON option_snapshots(trading_symbol)",
                 "CREATE INDEX idx_strike ON option_snapshots(strike)",
-                "CREATE INDEX idx_bucket_symbol ON option_snapshots(bucket_ts, trading_symbol)"
+                "CREATE INDEX idx_bucket_symbol ON option_snapshots(bucket_ts, trading_symbol)",
+                "CREATE INDEX idx_prefix_bucket ON option_snapshots(index_prefix, bucket_ts)"
             ]
             
             for index_query in indexes:
@@ -190,6 +200,134 @@ class V3SchemaMigrator:
             print(f"❌ Error creating new schema: {e}")
             return False
     
+    def layout_upgrades(self):
+        """
+        In-place upgrades an existing option_snapshots table still needs
+        
+        Returns:
+            list: (description, [SQL statements]) per pending step, or None on error
+        """
+        try:
+            connection = self.get_connection()
+            if connection is None:
+                return None
+            
+            cursor = connection.cursor()
+            upgrades = []
+            
+            # Rows clustered per symbol in bucket order; tables created before
+            # this were keyed on (bucket_ts, trading_symbol)
+            cursor.execute("""
+                SELECT COLUMN_NAME FROM information_schema.KEY_COLUMN_USAGE
+                WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'option_snapshots'
+                AND CONSTRAINT_NAME = 'PRIMARY'
+                ORDER BY ORDINAL_POSITION
+            """, (self.database,))
+            primary_key = [row[0] for row in cursor.fetchall()]
+            if primary_key and primary_key != ['trading_symbol', 'bucket_ts']:
+                cursor.execute("SHOW INDEX FROM option_snapshots WHERE Key_name = 'idx_bucket_symbol'")
+                add_bucket_index = "" if cursor.fetchall() else "ADD INDEX idx_bucket_symbol (bucket_ts, trading_symbol), "
+                upgrades.append((
+                    "Re-cluster option_snapshots by (trading_symbol, bucket_ts) on compressed pages",
+                    ["ALTER TABLE option_snapshots DROP PRIMARY KEY, ADD PRIMARY KEY (trading_symbol, bucket_ts), "
+                     f"{add_bucket_index}ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8"]
+                ))
+            
+            # Symbols written from float strikes (NIFTY19500.0) don't match the
+            # index_prefix expression; where the integer symbol already exists
+            # for a bucket, the decimal duplicate is dropped
+            cursor.execute("SELECT 1 FROM option_snapshots WHERE trading_symbol LIKE '%.%' LIMIT 1")
+            if cursor.fetchone():
+                upgrades.append((
+                    "Rewrite decimal-strike symbols (NIFTY19500.0 -> NIFTY19500)",
+                    ["UPDATE IGNORE option_snapshots SET trading_symbol = SUBSTRING_INDEX(trading_symbol, '.', 1) WHERE trading_symbol LIKE '%.%'",
+                     "DELETE FROM option_snapshots WHERE trading_symbol LIKE '%.%'"]
+                ))
+            
+            # OI fits in 4 bytes (contract OI is far below 2^32); BIGINT doubled the column width
+            cursor.execute("""
+                SELECT DATA_TYPE FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'option_snapshots'
+                AND COLUMN_NAME = 'ce_oi'
+            """, (self.database,))
+            oi_type = cursor.fetchone()
+            if oi_type and oi_type[0].lower() == 'bigint':
+                upgrades.append((
+                    "Narrow ce_oi/pe_oi from BIGINT to INT UNSIGNED",
+                    ["ALTER TABLE option_snapshots MODIFY ce_oi INT UNSIGNED DEFAULT 0, MODIFY pe_oi INT UNSIGNED DEFAULT 0"]
+                ))
+            
+            # Generated index name, so per-index reads filter on equality
+            cursor.execute("SHOW INDEX FROM option_snapshots WHERE Key_name = 'idx_prefix_bucket'")
+            if not cursor.fetchall():
+                upgrades.append((
+                    "Add the index_prefix column and idx_prefix_bucket index",
+                    [f"ALTER TABLE option_snapshots ADD COLUMN {INDEX_PREFIX_COLUMN}, ADD INDEX idx_prefix_bucket (index_prefix, bucket_ts)"]
+                ))
+            
+            # Hourly strike aggregates, seeded from every existing snapshot; the
+            # tracker keeps them current from then on
+            cursor.execute("SHOW TABLES LIKE 'option_strike_hourly'")
+            if not cursor.fetchall():
+                upgrades.append((
+                    "Create option_strike_hourly and aggregate existing snapshots into it",
+                    [STRIKE_HOURLY_TABLE_SQL, STRIKE_HOURLY_REFRESH_SQL.format(where="")]
+                ))
+            
+            connection.close()
+            return upgrades
+            
+        except Error as e:
+            print(f"❌ Error checking table layout: {e}")
+            return None
+    
+    def upgrade_layout(self, upgrades):
+        """Apply the steps returned by layout_upgrades()"""
+        try:
+            connection = self.get_connection()
+            if connection is None:
+                return False
+            
+            cursor = connection.cursor()
+            
+            for description, statements in upgrades:
+                print(f"🔧 {description}...")
+                for statement in statements:
+                    cursor.execute(statement)
+                connection.commit()
+                print(f"✅ {description}")
+            
+            connection.close()
+            return True
+            
+        except Error as e:
+            print(f"❌ Error upgrading table layout: {e}")
+            return False
+    
+    def run_layout_upgrades(self):
+        """List pending layout upgrades and apply them after confirmation"""
+        upgrades = self.layout_upgrades()
+        if upgrades is None:
+            return False
+        
+        if not upgrades:
+            print("✅ Table layout is up to date. No upgrades needed.")
+            return True
+        
+        print("\n📋 Pending layout upgrades:")
+        for description, _ in upgrades:
+            print(f"   - {description}")
+        
+        print("\n⚠️  These rebuild option_snapshots in place and block it while they run.")
+        print("   Stop the tracker before continuing.")
+        response = input("   Continue with upgrades? (y/N): ")
+        
+        if response.lower() != 'y':
+            print("❌ Layout upgrade cancelled.")
+            return False
+        
+        return self.upgrade_layout(upgrades)
+    
     def verify_migration(self):
         """Verify that the migration was successful"""
         try:
@@ -259,8 +397,8 @@ class V3SchemaMigrator:
             return False
         
         if not schema_info['needs_migration']:
-            print("✅ Schema is already v3. No migration needed.")
-            return True
+            print("✅ Schema is already v3. Checking table layout...")
+            return self.run_layout_upgrades()
         
         if schema_info['table_exists']:
             print(f"📋 Current columns: {len(schema_info['column_names'])}")
@@ -303,6 +441,12 @@ class V3SchemaMigrator:
             print("❌ Migration verification failed.")
             return False
         
+        # Tables alongside the new (empty) option_snapshots, e.g. option_strike_hourly
+        upgrades = self.layout_upgrades()
+        if upgrades is None or not self.upgrade_layout(upgrades):
+            print("❌ Failed to create supporting tables. Migration failed.")
+            return False
+        
         print("\n" + "=" * 60)
         print("🎉 MIGRATION TO v3 COMPLETED SUCCESSFULLY!")
         print("=" * 60)
@@ -311,7 +455,7 @@ class V3SchemaMigrator:
         print("   - bucket_ts for 3-minute bucket timestamps")
         print("   - trading_symbol for easy identification")
         print("   - ce_price_close and pe_price_close from getCandleData")
-        print("   - Primary key on (bucket_ts, trading_symbol)")
+        print("   - Primary key on (trading_symbol, bucket_ts)")
         print("\n📋 Next steps:")
         print("   1. Test the new adaptive polling system")
         print("   2. Run the test script: python test_adaptive_system.py")